@@ -1,8 +1,11 @@
 # ルービックキューブを描画するPythonスクリプト
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-import numpy as np
+# matplotlib は描画する関数の中で import する（state_to_facelets だけを使うときに読み込まないため）
 import argparse
+import struct
+import zlib
+from functools import lru_cache
+
+import numpy as np
 
 # 完成状態の値。上からcp, co, ep, eo
 solved = (
@@ -52,9 +55,196 @@ def _make_solved_facelets():
     return faces
 
 
+# README に合わせたコーナー -> (face, r, c) の対応（各 corner の orientation=0 の時に
+# U/D 側の色が最初に来るように (UD, other1, other2) の順で指定）
+"""
+コーナーピースの各インデックスに対応するシール座標 (corner_facelet_pos) を定義
+- 0〜7 番コーナーそれぞれについて (faceIndex, row, col) のタプルを3つずつ持つ。
+- 配列順は (U/D 方向の色, その他1, その他2) になるよう並べている。これは向き計算（回転）を簡単にするため。
+
+最初の数字は色の番号
+# 顔の順序: U, D, R, L, F, B
+FACE_NAMES = ["U", "D", "R", "L", "F", "B"]
+
+(row, col)
+その面の正面から見て上か下か
+row = 0 上段
+row = 1 中段
+row = 2 下段
+
+その面を正面から見たときに左か右か
+col = 0 左列
+col = 1 
+col = 2 右列
+"""
+corner_facelet_pos = [
+    ((0, 0, 0), (3, 0, 0), (5, 0, 2)),
+    ((0, 0, 2), (5, 0, 0), (2, 0, 2)),
+    ((0, 2, 2), (2, 0, 0), (4, 0, 2)),
+    ((0, 2, 0), (4, 0, 0), (3, 0, 2)),
+    ((1, 2, 0), (5, 2, 2), (3, 2, 0)),
+    ((1, 2, 2), (2, 2, 2), (5, 2, 0)),
+    ((1, 0, 2), (4, 2, 2), (2, 2, 0)),
+    ((1, 0, 0), (3, 2, 2), (4, 2, 0)),
+]
+
+"""
+エッジピースの各インデックスに対応するシール座標 (edge_facelet_pos) を定義
+- 0〜11 番エッジそれぞれについて (faceIndex, row, col) のタプルを2つ。
+- 定義順が内部ロジックの“エッジ番号”になる（README との対応に注意が必要）。
+
+(row, col)
+その面を正面から見て上中下のどこか
+row = 0 上段
+row = 1 中段
+row = 2 下段
+
+その面を正面から見たときに左か中央か右か
+col = 0 左列
+col = 1 中央列
+col = 2 右列
+"""
+edge_facelet_pos = [
+    # 0 : B-L
+    ((5, 1, 2), (3, 1, 0)),
+    # 1 : B-R
+    ((5, 1, 0), (2, 1, 2)),
+    # 2 : F-R
+    ((4, 1, 2), (2, 1, 0)),
+    # 3 : F-L
+    ((4, 1, 0), (3, 1, 2)),
+    # 4 : U-B
+    ((0, 0, 1), (5, 0, 1)),
+    # 5 : U-R
+    ((0, 1, 2), (2, 0, 1)),
+    # 6 : U-F
+    ((0, 2, 1), (4, 0, 1)),
+    # 7 : U-L
+    ((0, 1, 0), (3, 0, 1)),
+    # 8 : D-B
+    ((1, 0, 1), (5, 2, 1)),
+    # 9 : D-R
+    ((1, 1, 2), (2, 2, 1)),
+    # 10: D-F
+    ((1, 2, 1), (4, 2, 1)),
+    # 11: D-L
+    ((1, 1, 0), (3, 2, 1)),
+]
+
+"""
+バッチ変換用の gather インデックス
+
+ステッカーは face * 9 + row * 3 + col の 54 要素に平坦化し、値は色の番号（FACE_NAMES の順）にする。
+- _CORNER_FACELET[pos, idx]: 位置 pos のコーナーの idx 番目のシールの平坦化インデックス
+- _CORNER_COLOR[cubie, orient, idx]: cubie が向き orient で置かれたとき idx 番目のシールに来る色
+  （完成図では各シールの色 = そのシールがある面の番号）
+エッジも同様。向き 1 のときは 2 色が入れ替わる。
+"""
+_CORNER_FACELET = np.array([[f * 9 + r * 3 + c for (f, r, c) in trip] for trip in corner_facelet_pos])
+_EDGE_FACELET = np.array([[f * 9 + r * 3 + c for (f, r, c) in pair] for pair in edge_facelet_pos])
+_CENTER_FACELET = np.arange(6) * 9 + 4
+_CORNER_HOME = np.array([[f for (f, _, _) in trip] for trip in corner_facelet_pos], dtype=np.uint8)
+_EDGE_HOME = np.array([[f for (f, _, _) in pair] for pair in edge_facelet_pos], dtype=np.uint8)
+_CORNER_COLOR = np.array([[[home[(idx - orient) % 3] for idx in range(3)] for orient in range(3)]
+                          for home in _CORNER_HOME], dtype=np.uint8)
+_EDGE_COLOR = np.array([[[home[(idx + flip) % 2] for idx in range(2)] for flip in range(2)]
+                        for home in _EDGE_HOME], dtype=np.uint8)
+
+# 逆変換用: 色の組（home の順）-> cubie 番号。エッジは色の組 -> cubie * 2 + flip。該当なしは -1
+_CORNER_LOOKUP = np.full(6 ** 3, -1, dtype=np.int64)
+for _cubie, _home in enumerate(_CORNER_HOME):
+    _CORNER_LOOKUP[_home[0] * 36 + _home[1] * 6 + _home[2]] = _cubie
+_EDGE_LOOKUP = np.full(6 ** 2, -1, dtype=np.int64)
+for _cubie, _home in enumerate(_EDGE_HOME):
+    _EDGE_LOOKUP[_home[0] * 6 + _home[1]] = _cubie * 2
+    _EDGE_LOOKUP[_home[1] * 6 + _home[0]] = _cubie * 2 + 1
+
+
+def states_to_facelets(cp, co, ep, eo):
+    """
+    N 個の状態をまとめてステッカー配列に変換する。
+
+    入力:
+      cp: (N, 8) の配列
+      co: (N, 8) の配列
+      ep: (N, 12) の配列
+      eo: (N, 12) の配列
+    出力:
+      (N, 54) の uint8 配列。要素 face * 9 + row * 3 + col が色の番号（FACE_NAMES の順）
+    """
+    cp = np.asarray(cp, dtype=np.intp)
+    co = np.asarray(co, dtype=np.intp)
+    ep = np.asarray(ep, dtype=np.intp)
+    eo = np.asarray(eo, dtype=np.intp)
+    facelets = np.empty((cp.shape[0], 54), dtype=np.uint8)
+    facelets[:, _CENTER_FACELET] = np.arange(6, dtype=np.uint8)
+    facelets[:, _CORNER_FACELET] = _CORNER_COLOR[cp, co % 3]
+    facelets[:, _EDGE_FACELET] = _EDGE_COLOR[ep, eo % 2]
+    return facelets
+
+
+def facelets_one_hot(facelets):
+    """
+    (N, 54) のステッカー配列を (N, 54, 6) の one-hot 配列に変換する（ニューラルネットの入力向け）。
+    """
+    return np.eye(6, dtype=np.uint8)[np.asarray(facelets, dtype=np.intp)]
+
+
+def facelets_to_states(facelets):
+    """
+    states_to_facelets の逆変換。(N, 54) のステッカー配列から (cp, co, ep, eo) を返す。
+
+    実在しないピースの色の組み合わせ、ピースの重複、センターの色の違い、
+    向きの和やパリティが合わない（実際のキューブでは作れない）状態が含まれていれば ValueError を送出する。
+    """
+    facelets = np.asarray(facelets, dtype=np.intp)
+    if facelets.ndim != 2 or facelets.shape[1] != 54:
+        raise ValueError(f"facelets の形は (N, 54) である必要があります: {facelets.shape}")
+    n = facelets.shape[0]
+    bad = np.any(facelets[:, _CENTER_FACELET] != np.arange(6), axis=1)
+    bad |= np.any(facelets > 5, axis=1) | np.any(facelets < 0, axis=1)
+    # 範囲外の色は表を引く前に 0..5 に収める（負の値で表の末尾を引かないように）
+    facelets = np.clip(facelets, 0, 5)
+
+    # コーナー: U/D の色があるシールの位置が向き。home の順に並べ直して cubie を引く
+    colors = facelets[:, _CORNER_FACELET]
+    is_ud = colors <= 1
+    bad |= is_ud.sum(axis=2).max(axis=1) != 1
+    bad |= is_ud.sum(axis=2).min(axis=1) != 1
+    co = np.argmax(is_ud, axis=2)
+    home = np.take_along_axis(colors, (np.arange(3) + co[..., None]) % 3, axis=2)
+    cp = _CORNER_LOOKUP[home[..., 0] * 36 + home[..., 1] * 6 + home[..., 2]]
+
+    # エッジ: 色の組から cubie と向きを引く
+    colors = facelets[:, _EDGE_FACELET]
+    code = _EDGE_LOOKUP[colors[..., 0] * 6 + colors[..., 1]]
+    ep = code // 2
+    eo = code % 2
+
+    bad |= np.any(cp < 0, axis=1) | np.any(code < 0, axis=1)
+    bad |= np.any(np.sort(cp, axis=1) != np.arange(8), axis=1)
+    bad |= np.any(np.sort(ep, axis=1) != np.arange(12), axis=1)
+    bad |= co.sum(axis=1) % 3 != 0
+    bad |= eo.sum(axis=1) % 2 != 0
+    bad |= _parity(cp) != _parity(ep)
+    if np.any(bad):
+        raise ValueError(f"不正なステッカー配列があります: 行 {np.flatnonzero(bad).tolist()}")
+    return cp, co, ep, eo
+
+
+def _parity(perm):
+    """
+    (N, n) の順列の偶奇（転倒数 mod 2）を返す。
+    """
+    n = perm.shape[1]
+    inversions = (perm[:, :, None] > perm[:, None, :]) & np.triu(np.ones((n, n), dtype=bool), 1)
+    return inversions.sum(axis=(1, 2)) % 2
+
+
 def state_to_facelets(cp, co, ep, eo):
     """
     cp/co/ep/eo から faces (6 x 3 x 3) のステッカー配列に変換する。
+    states_to_facelets を 1 状態で呼ぶ薄いラッパー。
 
     入力:
       cp: list length 8
@@ -62,252 +252,271 @@ def state_to_facelets(cp, co, ep, eo):
       ep: list length 12
       eo: list length 12
     出力:
-      faces: list of 6 faces, each is 3x3 list of色名またはインデックス
-    """
-    # ベースは完成図の facelets（色名）を使用して、各コーナー/エッジが持つ "固有色" を取得する
-    # 立体の完成図を取得
-    base_faces = _make_solved_facelets()
-
-    # ヘルパ: faces を mutable に作る
-    # 描画用の配列 , 初期化
-    faces = [[ [None for _ in range(3)] for _ in range(3)] for _ in range(6)]
-
-    # README に合わせたコーナー -> (face, r, c) の対応（各 corner の orientation=0 の時に
-    # U/D 側の色が最初に来るように (UD, other1, other2) の順で指定）
-    """
-    コーナーピースの各インデックスに対応するシール座標 (corner_facelet_pos) を定義
-    - 0〜7 番コーナーそれぞれについて (faceIndex, row, col) のタプルを3つずつ持つ。
-    - 配列順は (U/D 方向の色, その他1, その他2) になるよう並べている。これは向き計算（回転）を簡単にするため。
-    
-    最初の数字は色の番号
-    # 顔の順序: U, D, R, L, F, B
-    FACE_NAMES = ["U", "D", "R", "L", "F", "B"]
-    
-    (row, col)
-    その面の正面から見て上か下か
-    row = 0 上段
-    row = 1 中段
-    row = 2 下段
-    
-    その面を正面から見たときに左か右か
-    col = 0 左列
-    col = 1 
-    col = 2 右列
-    """
-    corner_facelet_pos = [
-        ((0, 0, 0), (3, 0, 0), (5, 0, 2)),
-        ((0, 0, 2), (5, 0, 0), (2, 0, 2)),
-        ((0, 2, 2), (2, 0, 0), (4, 0, 2)),
-        ((0, 2, 0), (4, 0, 0), (3, 0, 2)),
-        ((1, 2, 0), (5, 2, 2), (3, 2, 0)),
-        ((1, 2, 2), (2, 2, 2), (5, 2, 0)),
-        ((1, 0, 2), (4, 2, 2), (2, 2, 0)),
-        ((1, 0, 0), (3, 2, 2), (4, 2, 0)),
-    ]
-
-    """
-    エッジピースの各インデックスに対応するシール座標 (edge_facelet_pos) を定義
-    - 0〜11 番エッジそれぞれについて (faceIndex, row, col) のタプルを2つ。
-    - 定義順が内部ロジックの“エッジ番号”になる（README との対応に注意が必要）。
-    
-    (row, col)
-    その面を正面から見て上中下のどこか
-    row = 0 上段
-    row = 1 中段
-    row = 2 下段
-    
-    その面を正面から見たときに左か中央か右か
-    col = 0 左列
-    col = 1 中央列
-    col = 2 右列
-    """
-    edge_facelet_pos = [
-        # 0 : B-L
-        ((5, 1, 2), (3, 1, 0)),
-        # 1 : B-R
-        ((5, 1, 0), (2, 1, 2)),
-        # 2 : F-R
-        ((4, 1, 2), (2, 1, 0)),
-        # 3 : F-L
-        ((4, 1, 0), (3, 1, 2)),
-        # 4 : U-B
-        ((0, 0, 1), (5, 0, 1)),
-        # 5 : U-R
-        ((0, 1, 2), (2, 0, 1)),
-        # 6 : U-F
-        ((0, 2, 1), (4, 0, 1)),
-        # 7 : U-L
-        ((0, 1, 0), (3, 0, 1)),
-        # 8 : D-B
-        ((1, 0, 1), (5, 2, 1)),
-        # 9 : D-R
-        ((1, 1, 2), (2, 2, 1)),
-        # 10: D-F
-        ((1, 2, 1), (4, 2, 1)),
-        # 11: D-L
-        ((1, 1, 0), (3, 2, 1)),
-    ]
-
-    # solved (home) colors for each corner/edge index (取っておく)
-    corner_home_colors = []
-    for ci in range(8):
-        # 完成状態のコーナー情報を取得
-        trip = corner_facelet_pos[ci]
-        # その3つの位置から色を取得
-        """
-        変数としてはこの部分 (関数の最初の方に定義されている)
-        base_faces = _make_solved_facelets()
-        
-        corner 0 の trip = ((0,0,0), (5,0,2), (3,0,0))
-        → colors = [ base_faces[0][0][0], base_faces[5][0][2], base_faces[3][0][0] ] 
-        → 例えば STANDARD_COLORS の設定なら ['white', 'blue', 'orange']
-        """
-        colors = [ base_faces[f][r][c] for (f,r,c) in trip ]
-        # corner_home_colorsに追加
-        corner_home_colors.append(colors)
-
-    edge_home_colors = []
-    for ei in range(12):
-        # コーナーと似たことしている
-        a,b = edge_facelet_pos[ei]
-        colors = [ base_faces[a[0]][a[1]][a[2]], base_faces[b[0]][b[1]][b[2]] ]
-        edge_home_colors.append(colors)
-
-    # corners を配置
-    for pos in range(8):
-        cubie = cp[pos]
-        orient = co[pos] % 3
-        home_colors = corner_home_colors[cubie]
-        placed_colors = [ home_colors[(i - orient) % 3] for i in range(3) ]
-        # 置く位置の facelets
-        trip = corner_facelet_pos[pos]
-        for (idx, (f,r,c)) in enumerate(trip):
-            faces[f][r][c] = placed_colors[idx]
-
-    # edges を配置
-    """
-    エッジの配置ループ
-    for pos in range(12):
-    - cubie = ep[pos] でその位置にあるエッジピース番号。
-    - home = edge_home_colors[cubie] → 2色セット。
-    - flip = eo[pos] % 2 → 反転なら順番を入れ替える。
-    - placed = [home[0], home[1]] if flip==0 else [home[1], home[0]]
-    - edge_facelet_pos[pos] の2座標へ書き込む。    
-    """
-    for pos in range(12):
-        cubie = ep[pos]
-        flip = eo[pos] % 2
-        home = edge_home_colors[cubie]
-        if flip == 0:
-            placed = [ home[0], home[1] ]
-        else:
-            placed = [ home[1], home[0] ]
-        a,b = edge_facelet_pos[pos]
-        faces[a[0]][a[1]][a[2]] = placed[0]
-        faces[b[0]][b[1]][b[2]] = placed[1]
-
-    # 中央は各面センターの色（変わらない）を埋める
-    for fi, name in enumerate(FACE_NAMES):
-        faces[fi][1][1] = STANDARD_COLORS[name]
+      faces: list of 6 faces, each is 3x3 list of色名
+    """
+    facelets = states_to_facelets([cp], [co], [ep], [eo])[0].reshape(6, 3, 3)
+    names = [STANDARD_COLORS[name] for name in FACE_NAMES]
+    return [[[names[c] for c in row] for row in face] for face in facelets.tolist()]
+
+
+# 各面ごとの中心位置と平面上の基底ベクトル（右方向, 下方向）を定義
+# 座標系: x 右, y 上, z 前
+_FACE_DEF = {
+    "U": ([0, 1.0, 0], [1.0, 0, 0], [0, 0, -1.0]),  # top: right=x, down=-z
+    "D": ([0, -1.0, 0], [1.0, 0, 0], [0, 0, 1.0]),  # bottom: right=x, down=+z
+    "F": ([0, 0, 1.0], [1.0, 0, 0], [0, -1.0, 0]),  # front: right=x, down=-y
+    "B": ([0, 0, -1.0], [-1.0, 0, 0], [0, -1.0, 0]),  # back: right=-x to keep orientation
+    "R": ([1.0, 0, 0], [0, 0, -1.0], [0, -1.0, 0]),  # right: right=-z, down=-y
+    "L": ([-1.0, 0, 0], [0, 0, 1.0], [0, -1.0, 0]),  # left: right=+z, down=-y
+}
+STICKER_SIZE = 2.0 / 3.0  # キューブの一辺を [-1,1] としたときのステッカーサイズ
 
-    return faces
+# 2D 展開図・アニメーション用の RGB（STANDARD_COLORS の Matplotlib 名と同じ色）
+FACE_RGB = np.array([
+    (255, 255, 255),  # U: white
+    (255, 255, 0),  # D: yellow
+    (255, 0, 0),  # R: red
+    (255, 165, 0),  # L: orange
+    (0, 128, 0),  # F: green
+    (0, 0, 255),  # B: blue
+], dtype=np.uint8)
 
+# 展開図 (3 段 x 4 列の面) の中で各面を置く位置 (段, 列)。README のナンバリング図と同じ配置
+_NET_POS = {"U": (0, 1), "L": (1, 0), "F": (1, 1), "R": (1, 2), "B": (1, 3), "D": (2, 1)}
 
-def draw_cube(value=None, figsize=(6, 6), save_path=None):
-    """
-    ルービックキューブを3Dで描画する。
 
-    引数:
-    - value: 6要素のリストまたはタプル。各要素は3x3の配列（色名または色インデックス）。
-             None の場合は完成状態を描画する。
-             (cp, co, ep, eo) のような状態タプルは自動で facelets に変換して描画する。
-    - figsize: matplotlib figure サイズ
-    - save_path: 指定すると画像を保存し、show は行わない（ヘッドレス実行向け）。
-
-    返り値: matplotlib.figure.Figure
+@lru_cache(maxsize=1)
+def _sticker_quads():
+    """
+    54 枚のステッカーの四隅の座標 (54, 4, 3) を返す（1 回だけ計算する）。
+    並びは faces[fi][r][c] の順（fi * 9 + r * 3 + c）。
+    """
+    center = np.array([_FACE_DEF[name][0] for name in FACE_NAMES])[:, None, None, :]
+    right = np.array([_FACE_DEF[name][1] for name in FACE_NAMES])[:, None, None, :]
+    down = np.array([_FACE_DEF[name][2] for name in FACE_NAMES])[:, None, None, :]
+    offset = np.arange(3)[None, :, None, None] - 1.0  # 行 r
+    col = np.arange(3)[None, None, :, None] - 1.0  # 列 c
+    sticker_center = center + STICKER_SIZE * (col * right + offset * down)
+    half = STICKER_SIZE / 2.0
+    corners = np.stack([
+        sticker_center - half * right - half * down,
+        sticker_center + half * right - half * down,
+        sticker_center + half * right + half * down,
+        sticker_center - half * right + half * down,
+    ], axis=3)
+    return corners.reshape(54, 4, 3)
+
+
+def _value_to_colors(value):
+    """
+    draw_cube の value（None / (cp, co, ep, eo) / 6 x 3 x 3 の面配列 / 長さ 54 の色番号配列）を
+    54 個の Matplotlib の色のリストに変換する。
     """
-    # value の解釈
     if value is None:
         faces = _make_solved_facelets()
+    elif isinstance(value, np.ndarray) and value.shape == (54,):
+        return [STANDARD_COLORS[FACE_NAMES[c]] for c in value.tolist()]
+    # もしタプル長4なら cp/co/ep/eo が渡された可能性が高い
+    elif isinstance(value, (list, tuple)) and len(value) == 4 and all(isinstance(v, list) for v in value):
+        faces = state_to_facelets(*value)
     else:
-        # もしタプル長4なら cp/co/ep/eo が渡された可能性が高い
-        if isinstance(value, (list, tuple)) and len(value) == 4 and all(isinstance(v, list) for v in value):
-            cp, co, ep, eo = value
-            faces = state_to_facelets(cp, co, ep, eo)
-        else:
-            # 想定: value == list/tuple of 6 faces, each face is 3x3 list
-            if not (isinstance(value, (list, tuple)) and len(value) == 6):
-                raise ValueError("value は None か、6 要素のステッカー配列である必要があります")
-            faces = value
-
-    # 各ステッカーを 3D の平面上に配置する準備
-    fig = plt.figure(figsize=figsize)
-    ax = fig.add_subplot(111, projection="3d")
-
-    # 軸の表示を整える
-    ax.set_box_aspect([1, 1, 1])
-    ax.axis("off")
-
-    sticker_size = 2.0 / 3.0  # キューブの一辺を [-1,1] としたときのステッカーサイズ
-
-    # 各面ごとの中心位置と平面上の基底ベクトル（右方向, 下方向）を定義
-    # 座標系: x 右, y 上, z 前
-    face_def = {
-        "U": (np.array([0, 1.0, 0]), np.array([1.0, 0, 0]), np.array([0, 0, -1.0])),  # top: right=x, down=-z
-        "D": (np.array([0, -1.0, 0]), np.array([1.0, 0, 0]), np.array([0, 0, 1.0])),  # bottom: right=x, down=+z
-        "F": (np.array([0, 0, 1.0]), np.array([1.0, 0, 0]), np.array([0, -1.0, 0])),  # front: right=x, down=-y
-        "B": (np.array([0, 0, -1.0]), np.array([-1.0, 0, 0]), np.array([0, -1.0, 0])), # back: right=-x to keep orientation
-        "R": (np.array([1.0, 0, 0]), np.array([0, 0, -1.0]), np.array([0, -1.0, 0])),  # right: right=-z, down=-y
-        "L": (np.array([-1.0, 0, 0]), np.array([0, 0, 1.0]), np.array([0, -1.0, 0])),  # left: right=+z, down=-y
-    }
-
-    patches = []
+        # 想定: value == list/tuple of 6 faces, each face is 3x3 list
+        if not (isinstance(value, (list, tuple)) and len(value) == 6):
+            raise ValueError("value は None か、6 要素のステッカー配列である必要があります")
+        faces = value
     colors = []
-
-    for fi, name in enumerate(FACE_NAMES):
-        center, right_vec, down_vec = face_def[name]
-        face = faces[fi]
-        # 各 face が 3x3 であることを期待
+    for face in faces:
         for r in range(3):
             for c in range(3):
-                # row r: 0..2 (top..bottom), col c: 0..2 (left..right)
-                # 紙面上の中心オフセットを計算
-                offset = ((c - 1) * sticker_size * 1.0) * right_vec + ((r - 1) * sticker_size * 1.0) * down_vec
-                sticker_center = center + offset
-
-                # 四隅を求める
-                half = sticker_size / 2.0
-                corners = [
-                    sticker_center - half * right_vec - half * down_vec,
-                    sticker_center + half * right_vec - half * down_vec,
-                    sticker_center + half * right_vec + half * down_vec,
-                    sticker_center - half * right_vec + half * down_vec,
-                ]
-                patches.append(corners)
                 col = face[r][c]
                 # カラーがインデックス（0..5）の場合には FACE_NAMES にマップ
-                if isinstance(col, int):
+                if isinstance(col, (int, np.integer)):
                     col = STANDARD_COLORS[FACE_NAMES[col]]
                 colors.append(col)
+    return colors
 
-    poly = Poly3DCollection(patches, linewidths=0.5, edgecolors="black")
-    poly.set_facecolor(colors)
-    ax.add_collection3d(poly)
 
+def _setup_axes(ax):
+    """
+    3D 軸の見た目を draw_cube と同じに整える。
+    """
+    ax.set_box_aspect([1, 1, 1])
+    ax.axis("off")
     # 軸範囲を揃える
     ax.set_xlim(-1.2, 1.2)
     ax.set_ylim(-1.2, 1.2)
     ax.set_zlim(-1.2, 1.2)
-
     # 軸の向きを見やすくするための初期ビュー
     ax.view_init(elev=20, azim=30)
 
+
+def _add_cube(ax, colors):
+    from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+
+    poly = Poly3DCollection(_sticker_quads(), linewidths=0.5, edgecolors="black")
+    poly.set_facecolor(colors)
+    ax.add_collection3d(poly)
+    return poly
+
+
+def draw_cube(value=None, figsize=(6, 6), save_path=None):
+    """
+    ルービックキューブを3Dで描画する。
+
+    引数:
+    - value: 6要素のリストまたはタプル。各要素は3x3の配列（色名または色インデックス）。
+             None の場合は完成状態を描画する。
+             (cp, co, ep, eo) のような状態タプルは自動で facelets に変換して描画する。
+    - figsize: matplotlib figure サイズ
+    - save_path: 指定すると画像を保存し、show は行わない（ヘッドレス実行向け）。
+
+    返り値: matplotlib.figure.Figure
+
+    大量の状態を画像にするときは、figure を使い回す CubeRenderer の方が速い。
+    """
+    import matplotlib.pyplot as plt
+
+    colors = _value_to_colors(value)
+    fig = plt.figure(figsize=figsize)
+    ax = fig.add_subplot(111, projection="3d")
+    _setup_axes(ax)
+    _add_cube(ax, colors)
+
     if save_path:
         fig.savefig(save_path, dpi=200)
         plt.close(fig)
     return fig
 
 
+class CubeRenderer:
+    """
+    1 つの figure とステッカーの Poly3DCollection を使い回して、多数の状態を高速に画像にする。
+    状態ごとに変えるのは面の色だけ。pyplot を使わないので GUI の無い環境でも動く。
+    """
+    def __init__(self, figsize=(6, 6), dpi=100):
+        """
+        :param figsize: figure サイズ
+        :param dpi: 保存する画像の dpi
+        """
+        from matplotlib.figure import Figure
+
+        self.dpi = dpi
+        self.fig = Figure(figsize=figsize)
+        ax = self.fig.add_subplot(111, projection="3d")
+        _setup_axes(ax)
+        self.poly = _add_cube(ax, _value_to_colors(None))
+
+    def render(self, value, save_path):
+        """
+        value（draw_cube と同じ形式）の色に塗り替えて save_path に保存する。
+        """
+        self.poly.set_facecolor(_value_to_colors(value))
+        self.fig.savefig(save_path, dpi=self.dpi)
+
+    def render_many(self, values, path_format):
+        """
+        values を順に描画し、path_format.format(i) に保存したパスのリストを返す。
+        """
+        paths = []
+        for i, value in enumerate(values):
+            path = path_format.format(i)
+            self.render(value, path)
+            paths.append(path)
+        return paths
+
+
+def _as_facelet_batch(values):
+    """
+    (N, 54) の配列、または (cp, co, ep, eo) のリストを (N, 54) の色番号配列にそろえる。
+    """
+    if isinstance(values, np.ndarray):
+        return values.reshape(-1, 54)
+    return states_to_facelets(*[list(v) for v in zip(*values)])
+
+
+def render_nets(facelets, sticker_px=20, border_px=1):
+    """
+    (N, 54) の色番号配列を 2D 展開図の RGB 画像 (N, 9 * sticker_px, 12 * sticker_px, 3) に変換する。
+    matplotlib は使わず、NumPy の配列演算だけで描く。
+    """
+    facelets = np.asarray(facelets, dtype=np.intp).reshape(-1, 6, 3, 3)
+    # 展開図のマス目ごとの色番号（何も無いマスは 6 = 背景）
+    grid = np.full((facelets.shape[0], 9, 12), 6, dtype=np.intp)
+    for fi, name in enumerate(FACE_NAMES):
+        row, col = _NET_POS[name]
+        grid[:, row * 3:row * 3 + 3, col * 3:col * 3 + 3] = facelets[:, fi]
+    palette = np.concatenate([FACE_RGB, np.array([[40, 40, 40]], dtype=np.uint8)])
+    image = palette[np.repeat(np.repeat(grid, sticker_px, axis=1), sticker_px, axis=2)]
+    # ステッカーの境界線
+    edge = (np.arange(sticker_px) < border_px) | (np.arange(sticker_px) >= sticker_px - border_px)
+    image[:, np.tile(edge, 9)] = 0
+    image[:, :, np.tile(edge, 12)] = 0
+    return image
+
+
+def write_png(path, rgb):
+    """
+    (H, W, 3) の uint8 配列を PNG ファイルとして書き出す（zlib だけを使う）。
+    """
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    height, width, _ = rgb.shape
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    # 各行の先頭にフィルタ種別 0 (None) を付ける
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgb.reshape(height, width * 3)], axis=1)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def save_nets(values, path_format, sticker_px=20):
+    """
+    values（(N, 54) の色番号配列か (cp, co, ep, eo) のリスト）の展開図を
+    path_format.format(i) に PNG で保存し、パスのリストを返す。
+    """
+    images = render_nets(_as_facelet_batch(values), sticker_px)
+    paths = []
+    for i, image in enumerate(images):
+        path = path_format.format(i)
+        write_png(path, image)
+        paths.append(path)
+    return paths
+
+
+def export_animation(values, save_path, fps=4, figsize=(6, 6), dpi=100):
+    """
+    状態の列（解く手順の各局面など）を 3D のアニメーションとして保存する。
+    拡張子が .gif なら Pillow、.mp4 なら ffmpeg で書き出す。
+    artist は 1 度だけ作り、フレームごとに面の色だけを差し替える。
+
+    引数:
+    - values: (N, 54) の色番号配列、または (cp, co, ep, eo) のリスト
+    - save_path: 出力ファイルパス（.gif / .mp4）
+    """
+    from matplotlib.animation import FFMpegWriter, FuncAnimation, PillowWriter
+    from matplotlib.figure import Figure
+
+    facelets = _as_facelet_batch(values)
+    frames = [_value_to_colors(f) for f in facelets]
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot(111, projection="3d")
+    _setup_axes(ax)
+    poly = _add_cube(ax, frames[0])
+
+    def update(i):
+        poly.set_facecolor(frames[i])
+        return (poly,)
+
+    animation = FuncAnimation(fig, update, frames=len(frames), blit=False)
+    writer = PillowWriter(fps=fps) if save_path.lower().endswith(".gif") else FFMpegWriter(fps=fps)
+    animation.save(save_path, writer=writer, dpi=dpi)
+    return save_path
+
+
 if __name__ == "__main__":
     # 完成状態からR
     test_R = (
@@ -328,6 +537,8 @@ if __name__ == "__main__":
         draw_cube(faces, save_path=args.save)
         print(f"Saved demo image to {args.save}")
     else:
+        import matplotlib.pyplot as plt
+
         draw_cube(value=test_R)
         plt.show()
     
\ No newline at end of file
@@ -1,2 +1,102 @@
 # ルービックキューブの値をテストするコード
-# 値がどこまで来ているか確認用
\ No newline at end of file
+# 値がどこまで来ているか確認用
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from drawing_cube import (FACE_NAMES, FACE_RGB, STANDARD_COLORS, CubeRenderer, export_animation, facelets_one_hot,
+                          facelets_to_states, render_nets, save_nets, solved, state_to_facelets, states_to_facelets,
+                          test_value)
+
+
+def test_solved_facelets():
+    facelets = states_to_facelets(*[[v] for v in solved])
+    assert (facelets.reshape(6, 9) == np.arange(6)[:, None]).all()
+    faces = state_to_facelets(*solved)
+    assert all(faces[f][r][c] == STANDARD_COLORS[FACE_NAMES[f]] for f in range(6) for r in range(3) for c in range(3))
+
+
+def test_round_trip_and_one_hot():
+    states = [solved, test_value]
+    facelets = states_to_facelets(*[list(v) for v in zip(*states)])
+    assert facelets.shape == (2, 54)
+    assert facelets_one_hot(facelets).shape == (2, 54, 6)
+    for got, want in zip(facelets_to_states(facelets), zip(*states)):
+        assert (got == np.array(want)).all()
+
+
+def test_invalid_facelets():
+    facelets = states_to_facelets(*[[v] for v in solved])
+    # コーナーを 1 つだけひねった状態は作れない
+    twisted = states_to_facelets([solved[0]], [[1, 0, 0, 0, 0, 0, 0, 0]], [solved[2]], [solved[3]])
+    # エッジのシールを 1 枚だけ別の色にした状態は存在しない
+    broken = facelets.copy()
+    broken[0, 1] = 1
+    # 負の色は範囲外（表の末尾に回り込んで正しい色として扱われてはいけない）
+    negative = facelets.astype(np.int64)
+    negative[0, 50] = -1
+    for bad in (twisted, broken, negative):
+        with pytest.raises(ValueError):
+            facelets_to_states(bad)
+
+
+def test_render_nets_and_png(tmp_path):
+    facelets = states_to_facelets(*[list(v) for v in zip(solved, test_value)])
+    images = render_nets(facelets, sticker_px=4, border_px=0)
+    assert images.shape == (2, 36, 48, 3)
+    # 完成状態の展開図の F 面（2 段目の 2 列目）は緑
+    assert (images[0, 12:24, 12:24] == FACE_RGB[FACE_NAMES.index("F")]).all()
+    path = save_nets(facelets, str(tmp_path / "net-{}.png"))[1]
+    with open(path, "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+
+
+def _png_size(path):
+    # PNG の IHDR から (幅, 高さ) を読む
+    with open(path, "rb") as f:
+        header = f.read(24)
+    assert header[:8] == b"\x89PNG\r\n\x1a\n"
+    return int.from_bytes(header[16:20], "big"), int.from_bytes(header[20:24], "big")
+
+
+def test_renderer_png_and_render_many(tmp_path):
+    renderer = CubeRenderer(figsize=(2, 2), dpi=50)
+    path = str(tmp_path / "cube.png")
+    renderer.render(test_value, path)
+    assert _png_size(path) == (100, 100)
+    assert os.path.getsize(path) > 1000
+
+    facelets = states_to_facelets(*[list(v) for v in zip(solved, test_value, solved)])
+    paths = renderer.render_many(list(facelets), str(tmp_path / "many-{}.png"))
+    assert paths == [str(tmp_path / f"many-{i}.png") for i in range(3)]
+    assert all(_png_size(p) == (100, 100) for p in paths)
+    # 同じ状態は同じ画像になり、違う状態は違う画像になる
+    with open(paths[0], "rb") as a, open(paths[1], "rb") as b, open(paths[2], "rb") as c:
+        first, second, third = a.read(), b.read(), c.read()
+    assert first == third and first != second
+
+
+def test_export_animation_gif(tmp_path):
+    pytest.importorskip("PIL")
+    path = str(tmp_path / "solve.gif")
+    assert export_animation([solved, test_value], path, figsize=(2, 2), dpi=30) == path
+    with open(path, "rb") as f:
+        assert f.read(6) in (b"GIF87a", b"GIF89a")
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg がインストールされていない")
+def test_export_animation_mp4(tmp_path):
+    path = str(tmp_path / "solve.mp4")
+    export_animation([solved, test_value], path, figsize=(2, 2), dpi=32)
+    with open(path, "rb") as f:
+        assert f.read(12)[4:8] == b"ftyp"
+
+
+def test_import_does_not_load_matplotlib():
+    # ステッカー配列の変換だけを使うときは matplotlib を読み込まない
+    code = "import sys, drawing_cube; assert 'matplotlib' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
@@ -1,47 +1,87 @@
 """models dataset."""
 
+import os
+import sys
+
+import numpy as np
 import tensorflow_datasets as tfds
 
+# rubik-scube はパッケージ名として import できないので、パスを通して読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rubik-scube'))
+import scramble_dataset  # noqa: E402
+from scramble_dataset import SplitSpec  # noqa: E402
+
+
+class ScrambleConfig(tfds.core.BuilderConfig):
+  """BuilderConfig for the scramble dataset."""
+
+  def __init__(self, *, splits, seed=0, examples_per_shard=1 << 20, **kwargs):
+    """
+    splits: {split 名: SplitSpec(num_examples, min_depth, max_depth)}
+    seed: シャードごとの乱数の種の元
+    examples_per_shard: 1 シャードあたりの例の数
+    """
+    super().__init__(**kwargs)
+    self.splits = splits
+    self.seed = seed
+    self.examples_per_shard = examples_per_shard
+
 
 class Builder(tfds.core.GeneratorBasedBuilder):
   """DatasetBuilder for models dataset."""
 
-  VERSION = tfds.core.Version('1.0.0')
+  VERSION = tfds.core.Version('2.0.0')
   RELEASE_NOTES = {
       '1.0.0': 'Initial release.',
+      '2.0.0': 'Random-walk scrambles of SOLVED_STATE labelled with depth.',
   }
+  BUILDER_CONFIGS = [
+      ScrambleConfig(
+          name='depth_1_30',
+          description='100M train / 100k test examples, depth 1-30.',
+          splits={
+              'train': SplitSpec(100_000_000, 1, 30),
+              'test': SplitSpec(100_000, 1, 30),
+          },
+      ),
+      ScrambleConfig(
+          name='fake',
+          description='Tiny config for tests: train depth 1-20, test depth 21-30.',
+          splits={
+              'train': SplitSpec(3, 1, 20),
+              'test': SplitSpec(1, 21, 30),
+          },
+      ),
+  ]
 
   def _info(self) -> tfds.core.DatasetInfo:
     """Returns the dataset metadata."""
-    # TODO(models): Specifies the tfds.core.DatasetInfo object
     return self.dataset_info_from_configs(
         features=tfds.features.FeaturesDict({
-            # These are the features of your dataset like images, labels ...
-            'image': tfds.features.Image(shape=(None, None, 3)),
-            'label': tfds.features.ClassLabel(names=['no', 'yes']),
+            # batch の列レイアウト: cp(8), co(8), ep(12), eo(12)
+            'state': tfds.features.Tensor(shape=(scramble_dataset.STATE_WIDTH,), dtype=np.uint8),
+            'depth': tfds.features.Scalar(dtype=np.int32),
         }),
-        # If there's a common (input, target) tuple from the
-        # features, specify them here. They'll be used if
-        # `as_supervised=True` in `builder.as_dataset`.
-        supervised_keys=('image', 'label'),  # Set to `None` to disable
-        homepage='https://dataset-homepage/',
+        supervised_keys=('state', 'depth'),
+        homepage='https://github.com/Cell1729/solid-octo-fiesta',
     )
 
   def _split_generators(self, dl_manager: tfds.download.DownloadManager):
     """Returns SplitGenerators."""
-    # TODO(models): Downloads the data and defines the splits
-    path = dl_manager.download_and_extract('https://todo-data-url')
-
-    # TODO(models): Returns the Dict[split names, Iterator[Key, Example]]
-    return {
-        'train': self._generate_examples(path / 'train_imgs'),
-    }
+    # ダウンロードの代わりにシャードを生成する（生成済みのシャードは再利用される）
+    out_dir = os.path.join(dl_manager.download_dir, 'scrambles', self.builder_config.name)
+    paths = scramble_dataset.write_dataset(
+        out_dir,
+        self.builder_config.splits,
+        seed=self.builder_config.seed,
+        examples_per_shard=self.builder_config.examples_per_shard,
+    )
+    return {split: self._generate_examples(split_paths) for split, split_paths in paths.items()}
 
-  def _generate_examples(self, path):
+  def _generate_examples(self, paths):
     """Yields examples."""
-    # TODO(models): Yields (key, example) tuples from the dataset
-    for f in path.glob('*.jpeg'):
-      yield 'key', {
-          'image': f,
-          'label': 'yes',
+    for key, state, depth in scramble_dataset.iter_records(paths):
+      yield key, {
+          'state': state,
+          'depth': depth,
       }
@@ -0,0 +1,195 @@
+"""
+複数のルービックキューブの状態を NumPy 配列でまとめて管理する。
+
+N 個の状態を 1 つの (N, 40) の整数配列として持ち、列は以下のように詰める。
+  - 0:8   cp
+  - 8:16  co
+  - 16:28 ep
+  - 28:40 eo
+
+1 手の適用は「列の gather + 向きの加算 + 剰余の表引き」だけで行うので、
+Python のリスト内包表記を 1 状態ずつ回すよりも桁違いに速い。
+"""
+from typing import Iterable, List, Sequence, Union
+
+import numpy as np
+
+from state import RubiksCubeState
+from operation import build_moves
+
+# 列のレイアウト
+CP = slice(0, 8)
+CO = slice(8, 16)
+EP = slice(16, 28)
+EO = slice(28, 40)
+STATE_WIDTH = 40
+STATE_DTYPE = np.uint8
+
+# 剰余を % を使わずに表引きで求めるためのテーブル
+# co は最大 2 + 2 = 4、eo は最大 1 + 1 = 2 までしか足されない
+_MOD3 = np.array([0, 1, 2, 0, 1, 2], dtype=STATE_DTYPE)
+_MOD2 = np.array([0, 1, 0, 1], dtype=STATE_DTYPE)
+
+
+def state_to_row(state: RubiksCubeState) -> np.ndarray:
+    """
+    RubiksCubeState を長さ 40 の 1 次元配列に詰める。
+    """
+    return np.array(list(state.cp) + list(state.co) + list(state.ep) + list(state.eo), dtype=STATE_DTYPE)
+
+
+def row_to_state(row: np.ndarray) -> RubiksCubeState:
+    """
+    長さ 40 の 1 次元配列を RubiksCubeState に戻す。
+    """
+    values = [int(v) for v in row]
+    return RubiksCubeState(values[CP], values[CO], values[EP], values[EO])
+
+
+def _build_move_tables():
+    """
+    build_moves() の 18 手から gather 用の列インデックスと向きの加算値を作る。
+    戻り値: (move_names, gather (18, 40), add (18, 40))
+    """
+    moves, move_names = build_moves()
+    gather = np.zeros((len(move_names), STATE_WIDTH), dtype=np.intp)
+    add = np.zeros((len(move_names), STATE_WIDTH), dtype=STATE_DTYPE)
+    for mi, name in enumerate(move_names):
+        move = moves[name]
+        mcp = np.array(move.cp)
+        mep = np.array(move.ep)
+        # new_cp[i] = cp[move.cp[i]], new_co[i] = co[move.cp[i]] + move.co[i]
+        gather[mi, CP] = CP.start + mcp
+        gather[mi, CO] = CO.start + mcp
+        gather[mi, EP] = EP.start + mep
+        gather[mi, EO] = EO.start + mep
+        add[mi, CO] = move.co
+        add[mi, EO] = move.eo
+    return move_names, gather, add
+
+
+MOVE_NAMES, _GATHER, _ADD = _build_move_tables()
+MOVE_INDEX = {name: i for i, name in enumerate(MOVE_NAMES)}
+NUM_MOVES = len(MOVE_NAMES)
+
+
+def _reduce(out: np.ndarray) -> np.ndarray:
+    """
+    加算後の向きを表引きで 3 / 2 の剰余に戻す（in-place）。
+    """
+    out[..., CO] = _MOD3[out[..., CO]]
+    out[..., EO] = _MOD2[out[..., EO]]
+    return out
+
+
+def move_to_index(move: Union[str, int]) -> int:
+    """
+    手の名前（'R' など）または番号を MOVE_NAMES 上の番号に変換する。
+    """
+    if isinstance(move, str):
+        if move not in MOVE_INDEX:
+            raise KeyError(f"Unknown move name: {move}")
+        return MOVE_INDEX[move]
+    return int(move)
+
+
+def apply_move_array(states: np.ndarray, move: Union[str, int, Sequence[int], np.ndarray]) -> np.ndarray:
+    """
+    (N, 40) の状態配列に手を適用した新しい配列を返す。
+
+    引数:
+    - states: (N, 40) の状態配列
+    - move: 全行に同じ手を適用するなら手の名前か番号。
+            行ごとに違う手を適用するなら長さ N の手番号の配列。
+    """
+    if isinstance(move, (str, int, np.integer)):
+        mi = move_to_index(move)
+        return _reduce(states[:, _GATHER[mi]] + _ADD[mi])
+    mi = np.asarray(move, dtype=np.intp)
+    if mi.shape != (states.shape[0],):
+        raise ValueError("行ごとの手は (N,) の配列で指定してください")
+    out = np.take_along_axis(states, _GATHER[mi], axis=1) + _ADD[mi]
+    return _reduce(out)
+
+
+def expand_array(states: np.ndarray) -> np.ndarray:
+    """
+    (N, 40) の各状態に 18 手すべてを適用した (N * 18, 40) の配列を返す。
+    行 i * 18 + m が、状態 i に MOVE_NAMES[m] を適用した子になる。
+    """
+    out = states[:, _GATHER] + _ADD
+    return _reduce(out).reshape(-1, STATE_WIDTH)
+
+
+class BatchCubeState:
+    """
+    N 個のルービックキューブの状態をまとめて表すクラス。
+    状態は (N, 40) の uint8 配列 `array` に連続して格納する。
+    """
+    def __init__(self, array: np.ndarray):
+        """
+        :param array: (N, 40) の状態配列。列のレイアウトはモジュールの docstring を参照。
+        """
+        array = np.ascontiguousarray(array, dtype=STATE_DTYPE)
+        if array.ndim != 2 or array.shape[1] != STATE_WIDTH:
+            raise ValueError(f"array の形は (N, {STATE_WIDTH}) である必要があります: {array.shape}")
+        self.array = array
+
+    @classmethod
+    def solved(cls, n: int) -> "BatchCubeState":
+        """
+        完成状態を n 個並べたバッチを返す。
+        """
+        row = np.concatenate([np.arange(8), np.zeros(8), np.arange(12), np.zeros(12)]).astype(STATE_DTYPE)
+        return cls(np.tile(row, (n, 1)))
+
+    @classmethod
+    def from_states(cls, states: Iterable[RubiksCubeState]) -> "BatchCubeState":
+        """
+        RubiksCubeState の列からバッチを作る。
+        """
+        rows = [state_to_row(s) for s in states]
+        if not rows:
+            return cls(np.zeros((0, STATE_WIDTH), dtype=STATE_DTYPE))
+        return cls(np.stack(rows))
+
+    def to_states(self) -> List[RubiksCubeState]:
+        """
+        バッチを RubiksCubeState のリストに戻す。
+        """
+        return [row_to_state(row) for row in self.array]
+
+    def __len__(self):
+        return self.array.shape[0]
+
+    def __getitem__(self, i) -> RubiksCubeState:
+        return row_to_state(self.array[i])
+
+    @property
+    def cp(self) -> np.ndarray:
+        return self.array[:, CP]
+
+    @property
+    def co(self) -> np.ndarray:
+        return self.array[:, CO]
+
+    @property
+    def ep(self) -> np.ndarray:
+        return self.array[:, EP]
+
+    @property
+    def eo(self) -> np.ndarray:
+        return self.array[:, EO]
+
+    def apply_move(self, move: Union[str, int, Sequence[int], np.ndarray]) -> "BatchCubeState":
+        """
+        全状態に手を適用し、新しいバッチを返す。
+        move には手の名前・番号、または行ごとの手番号の配列を渡せる。
+        """
+        return BatchCubeState(apply_move_array(self.array, move))
+
+    def expand(self) -> np.ndarray:
+        """
+        全状態の 18 手分の子を (N * 18, 40) の配列で返す。
+        """
+        return expand_array(self.array)
@@ -0,0 +1,210 @@
+"""
+ファイルか標準入力から 1 行 1 問のスクランブルを読み、プロセスプールの 2 フェーズ法で解いて
+入力と同じ順に JSON Lines で書き出す。
+
+    python batch_solve.py scrambles.txt -o solutions.jsonl -p 8 --time-limit 0.5
+    cat scrambles.txt | python batch_solve.py > solutions.jsonl
+
+入力の行:
+  - スクランブル文字列（空行と # で始まる行は読み飛ばす）
+  - または {"id": ..., "scramble": "..."} の JSON。id はそのまま出力に付ける（無ければ入力の通し番号）
+
+出力の行:
+  {"id": 0, "scramble": "R U", "status": "solved", "solution": "U' R'", "length": 2, "nodes": 3, "elapsed": 0.0001}
+  status は two_phase.TwoPhaseSolver.solve と同じ（'solved', 'time_limit', 'not_found'）か、
+  スクランブルが読めないときの 'error'（"error" に理由が入る）。
+
+- 各ワーカーは初期化のときに 1 回だけ two_phase.get_solver で表を読み込む。
+  表は coord が .npy から mmap で読むもので、親プロセスで先に読み込んでおくので fork で起動したワーカーは
+  親のページをそのまま共有し、表の作成が複数のワーカーで重なることもない
+- 入力は chunk_size 問ずつワーカーに渡し、結果を待っているチャンクは window 個までにする。
+  入力がどれだけ大きくても、メモリに載るのは window * chunk_size 問分だけ
+- 1 問あたりの時間の上限（--time-limit）はソルバーの締め切りとして渡すので、時間切れの問題も
+  その時点で最良の解（無ければ null）を返してワーカーは次の問題に進む
+- 進み具合と処理速度は標準エラー出力に表示する
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import two_phase
+
+# (id, スクランブル, 読めなかった理由)。id は入力で指定が無ければ通し番号。理由は読めた行なら None
+Item = Tuple[object, str, Optional[str]]
+
+
+def read_items(lines: Iterable[str]) -> Iterator[Item]:
+    """
+    入力の行を (id, スクランブル, 読めなかった理由) にする。空行と # で始まる行は読み飛ばす。
+    JSON が壊れている行や scramble の無い行も止まらずに返し、出力では status 'error' になる。
+    """
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield index, line, f"JSON が読めません: {e}"
+            else:
+                if not isinstance(record, dict):
+                    yield index, line, "JSON のオブジェクトではありません"
+                elif not isinstance(record.get("scramble"), str):
+                    yield record.get("id", index), line, "scramble がありません"
+                else:
+                    yield record.get("id", index), record["scramble"], None
+        else:
+            yield index, line, None
+        index += 1
+
+
+def _chunks(items: Iterator[Item], size: int) -> Iterator[List[Item]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def solve_item(solver: two_phase.TwoPhaseSolver, item: Item, time_limit: Optional[float] = None,
+               target_length: Optional[int] = 22, max_length: int = 30) -> dict:
+    """
+    1 問を解いて出力の 1 行分の dict を返す。
+    """
+    item_id, scramble, error = item
+    if error is not None:
+        return {"id": item_id, "scramble": scramble, "status": "error", "error": error}
+    try:
+        result = solver.solve(scramble, time_limit=time_limit, target_length=target_length, max_length=max_length)
+    except KeyError as e:
+        return {"id": item_id, "scramble": scramble, "status": "error", "error": e.args[0]}
+    solution = result.solution
+    return {"id": item_id, "scramble": scramble, "status": result.status,
+            "solution": " ".join(solution) if solution is not None else None,
+            "length": len(solution) if solution is not None else None,
+            "nodes": result.nodes, "elapsed": round(result.elapsed, 6)}
+
+
+def _init_worker(table_dir: Optional[str]) -> None:
+    two_phase.get_solver(table_dir)
+
+
+def _solve_chunk(chunk: List[Item], time_limit: Optional[float], target_length: Optional[int],
+                 max_length: int) -> List[dict]:
+    solver = two_phase.get_solver()
+    return [solve_item(solver, item, time_limit, target_length, max_length) for item in chunk]
+
+
+class Progress:
+    """
+    解いた問題の数と処理速度を interval 秒ごとに stream に表示する。
+    """
+    def __init__(self, stream: TextIO = sys.stderr, interval: float = 1.0):
+        self.stream = stream
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self.done = 0
+        self.solved = 0
+        self.total_length = 0
+
+    def update(self, record: dict) -> None:
+        self.done += 1
+        if record.get("length") is not None:
+            self.solved += 1
+            self.total_length += record["length"]
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        mean = self.total_length / self.solved if self.solved else 0.0
+        end = "\n" if final else "\r"
+        self.stream.write(f"{self.done} done, {self.solved} solved, {rate:.1f} cubes/s, "
+                          f"mean length {mean:.2f}, {elapsed:.1f} s{end}")
+        self.stream.flush()
+
+
+def solve_stream(lines: Iterable[str], processes: Optional[int] = None, time_limit: Optional[float] = 1.0,
+                 target_length: Optional[int] = 22, max_length: int = 30, chunk_size: int = 16,
+                 window: Optional[int] = None, table_dir: Optional[str] = None,
+                 progress: Optional[Progress] = None) -> Iterator[dict]:
+    """
+    入力の行を解いた結果の dict を入力と同じ順に返すジェネレータ。
+
+    引数:
+    - processes: ワーカーの数。0 ならメインプロセスで解く。None なら CPU コア数
+    - time_limit: 1 問あたりの探索時間の上限（秒）
+    - target_length / max_length: TwoPhaseSolver.solve と同じ
+    - chunk_size: 1 回にワーカーへ渡す問題の数
+    - window: 結果を待つチャンクの最大数。None ならワーカー数の 4 倍
+    - table_dir: 移動表と枝刈り表のディレクトリ
+    - progress: 進み具合を表示する Progress
+    """
+    # ワーカーより先に表を読み込む（無ければここで 1 回だけ作る）
+    solver = two_phase.get_solver(table_dir)
+    items = read_items(lines)
+
+    def emit(records: List[dict]) -> Iterator[dict]:
+        for record in records:
+            if progress is not None:
+                progress.update(record)
+            yield record
+
+    if processes == 0:
+        for item in items:
+            yield from emit([solve_item(solver, item, time_limit, target_length, max_length)])
+        return
+
+    processes = processes or multiprocessing.cpu_count() or 1
+    window = window or processes * 4
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(table_dir,)) as pool:
+        pending = deque()
+        for chunk in _chunks(items, chunk_size):
+            pending.append(pool.apply_async(_solve_chunk, (chunk, time_limit, target_length, max_length)))
+            if len(pending) >= window:
+                yield from emit(pending.popleft().get())
+        while pending:
+            yield from emit(pending.popleft().get())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="スクランブルをプロセスプールで解き、JSON Lines で書き出す")
+    parser.add_argument("input", nargs="?", help="1 行 1 問のスクランブルのファイル（省略すると標準入力）")
+    parser.add_argument("--output", "-o", help="出力先（省略すると標準出力）")
+    parser.add_argument("--processes", "-p", type=int, default=None, help="ワーカーの数（0 ならメインプロセスで解く）")
+    parser.add_argument("--time-limit", type=float, default=1.0, help="1 問あたりの探索時間の上限（秒）")
+    parser.add_argument("--target-length", type=int, default=22, help="この手数以下の解で探索を終える")
+    parser.add_argument("--max-length", type=int, default=30)
+    parser.add_argument("--chunk-size", type=int, default=16, help="1 回にワーカーへ渡す問題の数")
+    parser.add_argument("--window", type=int, default=None, help="結果を待つチャンクの最大数")
+    parser.add_argument("--table-dir", default=None)
+    parser.add_argument("--quiet", "-q", action="store_true", help="進み具合を表示しない")
+    args = parser.parse_args()
+
+    source = open(args.input) if args.input else sys.stdin
+    out = open(args.output, "w") if args.output else sys.stdout
+    progress = None if args.quiet else Progress()
+    try:
+        for record in solve_stream(source, args.processes, args.time_limit, args.target_length, args.max_length,
+                                   args.chunk_size, args.window, args.table_dir, progress):
+            out.write(json.dumps(record) + "\n")
+    finally:
+        if progress is not None:
+            progress.report(final=True)
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
@@ -0,0 +1,50 @@
+# バッチで解く CLI のテスト
+import io
+import json
+import subprocess
+import sys
+
+import batch_solve
+import two_phase
+from operation import scramble2state
+from solver import is_solved
+
+
+def _check(records):
+    for record in records:
+        assert record["status"] == "solved"
+        assert is_solved(scramble2state(record["solution"], scramble2state(record["scramble"])))
+
+
+def test_solve_stream_keeps_input_order():
+    scrambles = two_phase.random_scrambles(20, seed=3)
+    lines = ["# comment", ""] + scrambles[:10] + [json.dumps({"id": "x", "scramble": "R U"}), "R Q"] + scrambles[10:]
+    progress = batch_solve.Progress(io.StringIO())
+    records = list(batch_solve.solve_stream(lines, processes=2, chunk_size=3, window=2, progress=progress))
+    assert [r["id"] for r in records] == list(range(10)) + ["x", 11] + list(range(12, 22))
+    assert [r["scramble"] for r in records] == scrambles[:10] + ["R U", "R Q"] + scrambles[10:]
+    assert records[11]["status"] == "error"
+    _check(records[:11] + records[12:])
+    assert progress.done == 22 and progress.solved == 21
+
+    inline = list(batch_solve.solve_stream(scrambles[:3], processes=0, time_limit=0.0, target_length=None))
+    assert [r["status"] for r in inline] == ["time_limit"] * 3
+
+
+def test_cli(tmp_path):
+    path = tmp_path / "scrambles.txt"
+    path.write_text("R U R' U'\nF2 D\n")
+    out = subprocess.run([sys.executable, "batch_solve.py", str(path), "-p", "1"], capture_output=True, text=True,
+                         check=True, cwd=batch_solve.__file__.rsplit("/", 1)[0])
+    records = [json.loads(line) for line in out.stdout.splitlines()]
+    assert len(records) == 2
+    _check(records)
+    assert "2 done" in out.stderr
+
+
+def test_unreadable_lines_become_error_records():
+    lines = ["R U", "{not json", json.dumps({"id": 7}), "[1, 2]", json.dumps({"id": "y", "scramble": "F"})]
+    records = list(batch_solve.solve_stream(lines, processes=0))
+    assert [r["id"] for r in records] == [0, 1, 7, 3, "y"]
+    assert [r["status"] for r in records] == ["solved", "error", "error", "error", "solved"]
+    assert all(r["error"] for r in records[1:4])
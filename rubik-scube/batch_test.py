@@ -0,0 +1,49 @@
+# バッチ版の状態管理がスカラー版の apply_move と一致するかのテスト
+import random
+
+import numpy as np
+
+from batch import BatchCubeState, MOVE_NAMES, NUM_MOVES, state_to_row
+from operation import build_moves, scramble2state
+
+
+def _random_states(n, seed=0):
+    rng = random.Random(seed)
+    return [scramble2state(" ".join(rng.choice(MOVE_NAMES) for _ in range(20))) for _ in range(n)]
+
+
+def test_apply_single_move_matches_scalar():
+    moves, _ = build_moves()
+    states = _random_states(16)
+    batch = BatchCubeState.from_states(states)
+    for name in MOVE_NAMES:
+        got = batch.apply_move(name).array
+        want = np.stack([state_to_row(s.apply_move(moves[name])) for s in states])
+        assert np.array_equal(got, want)
+
+
+def test_apply_per_row_moves_matches_scalar():
+    moves, _ = build_moves()
+    states = _random_states(32, seed=1)
+    batch = BatchCubeState.from_states(states)
+    move_idx = np.arange(32) % NUM_MOVES
+    got = batch.apply_move(move_idx).array
+    want = np.stack([state_to_row(s.apply_move(moves[MOVE_NAMES[m]])) for s, m in zip(states, move_idx)])
+    assert np.array_equal(got, want)
+
+
+def test_expand_children_order():
+    moves, _ = build_moves()
+    states = _random_states(4, seed=2)
+    children = BatchCubeState.from_states(states).expand()
+    assert children.shape == (4 * NUM_MOVES, 40)
+    for i, s in enumerate(states):
+        for m, name in enumerate(MOVE_NAMES):
+            assert np.array_equal(children[i * NUM_MOVES + m], state_to_row(s.apply_move(moves[name])))
+
+
+def test_round_trip():
+    states = _random_states(3, seed=3)
+    back = BatchCubeState.from_states(states).to_states()
+    for a, b in zip(states, back):
+        assert (a.cp, a.co, a.ep, a.eo) == (b.cp, b.co, b.ep, b.eo)
@@ -0,0 +1,382 @@
+"""
+状態エンジン・変換・描画・探索の再現可能なベンチマーク。
+
+各ケースは固定シードで入力を作り、
+  - ops_per_sec: 1 秒あたりの処理数（unit の単位。手の適用回数、ノード数、例の数など）
+  - peak_kib: 1 回の実行で tracemalloc が記録したメモリのピーク（KiB）
+を測る。結果はコミットやマシンの情報と一緒に JSON で書き出すので、
+保存したベースライン（bench_baseline.json）と --compare で比べれば性能の低下を検出できる。
+
+    python bench.py --output ../bench_output.txt
+    python bench.py --compare bench_baseline.json
+    python bench.py -k scramble2state -k two_phase
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "bench_baseline.json")
+SEED = 0
+# ベースラインより ops_per_sec がこの割合を下回ったら低下とみなす
+DEFAULT_TOLERANCE = 0.8
+
+
+class Case(NamedTuple):
+    """
+    1 つのベンチマーク。
+    - setup: 固定シードで入力を作り、(1 回分の処理, 1 回あたりの unit の数) を返す
+    - unit: ops_per_sec の単位
+    """
+    name: str
+    setup: Callable[[], Tuple[Callable[[], object], int]]
+    unit: str
+
+
+def _random_scramble(rng: random.Random, length: int) -> str:
+    from batch import MOVE_NAMES
+    return " ".join(rng.choice(MOVE_NAMES) for _ in range(length))
+
+
+def _apply_move():
+    from operation import SOLVED_STATE, get_moves
+    moves, names = get_moves()
+    rng = random.Random(SEED)
+    sequence = [moves[rng.choice(names)] for _ in range(1000)]
+
+    def run():
+        state = SOLVED_STATE
+        for move in sequence:
+            state = state.apply_move(move)
+        return state
+    return run, len(sequence)
+
+
+def _packed_apply_move():
+    from packed import MOVE_NAMES, PACKED_MOVES, PACKED_SOLVED
+    rng = random.Random(SEED)
+    sequence = [PACKED_MOVES[rng.choice(MOVE_NAMES)] for _ in range(1000)]
+
+    def run():
+        state = PACKED_SOLVED
+        for move in sequence:
+            state = state.apply_move(move)
+        return state
+    return run, len(sequence)
+
+
+def _scramble2state(length: int):
+    def setup():
+        from operation import compile_scramble, scramble2state
+        rng = random.Random(SEED)
+        scrambles = [_random_scramble(rng, length) for _ in range(100)]
+
+        def run():
+            # 同じスクランブルの合成結果はキャッシュされるので、毎回空にして実際の変換を測る
+            compile_scramble.cache_clear()
+            for scramble in scrambles:
+                scramble2state(scramble)
+        return run, len(scrambles)
+    return setup
+
+
+def _build_moves():
+    from operation import build_moves
+    return build_moves, 1
+
+
+def _batch_expand():
+    from batch import NUM_MOVES, expand_array
+    from scramble_dataset import random_walk
+    states, _ = random_walk(1000, 20, 20, np.random.default_rng(SEED))
+    return (lambda: expand_array(states)), states.shape[0] * NUM_MOVES
+
+
+def _random_states(n: int):
+    from scramble_dataset import random_walk
+    states, _ = random_walk(n, 20, 20, np.random.default_rng(SEED))
+    return states[:, 0:8], states[:, 8:16], states[:, 16:28], states[:, 28:40]
+
+
+def _import_drawing_cube():
+    path = os.path.join(os.path.dirname(HERE), "drawing-cube")
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    import drawing_cube
+    return drawing_cube
+
+
+def _state_to_facelets():
+    drawing_cube = _import_drawing_cube()
+    cp, co, ep, eo = (a.tolist() for a in _random_states(100))
+
+    def run():
+        for args in zip(cp, co, ep, eo):
+            drawing_cube.state_to_facelets(*args)
+    return run, len(cp)
+
+
+def _states_to_facelets():
+    drawing_cube = _import_drawing_cube()
+    states = _random_states(10000)
+    return (lambda: drawing_cube.states_to_facelets(*states)), states[0].shape[0]
+
+
+def _draw_cube(tmp_dir: str):
+    def setup():
+        drawing_cube = _import_drawing_cube()
+        value = tuple(a[0].tolist() for a in _random_states(1))
+        path = os.path.join(tmp_dir, "bench_draw_cube.png")
+        return (lambda: drawing_cube.draw_cube(value, save_path=path)), 1
+    return setup
+
+
+def _render_nets(tmp_dir: str):
+    def setup():
+        drawing_cube = _import_drawing_cube()
+        facelets = drawing_cube.states_to_facelets(*_random_states(100))
+        path = os.path.join(tmp_dir, "bench_net_{}.png")
+        return (lambda: drawing_cube.save_nets(facelets, path)), facelets.shape[0]
+    return setup
+
+
+def _random_walk():
+    from scramble_dataset import random_walk
+    rng = np.random.default_rng(SEED)
+    n = 1 << 14
+    return (lambda: random_walk(n, 1, 30, rng)), n
+
+
+def _move_trie():
+    from move_trie import MoveTrie
+    from packed import MOVE_NAMES
+    rng = random.Random(SEED)
+    paths = [[rng.choice(MOVE_NAMES) for _ in range(20)] for _ in range(50)]
+    # 探索の経路の 1 手の延長をすべて評価する
+    sequences = [path + [m] for path in paths for m in MOVE_NAMES]
+    return (lambda: MoveTrie().evaluate_many(sequences)), len(sequences)
+
+
+def _uniform_random_states():
+    from random_state import random_states
+    rng = np.random.default_rng(SEED)
+    n = 1 << 16
+    return (lambda: random_states(n, rng)), n
+
+
+def _is_solvable():
+    from random_state import is_solvable_rows, random_states
+    states = random_states(1 << 18, np.random.default_rng(SEED))
+    return (lambda: is_solvable_rows(states)), states.shape[0]
+
+
+def _counting(run_solver):
+    """
+    ソルバーの結果のノード数を unit にする。ノード数は入力が固定なら毎回同じなので、1 回目の結果を使う。
+    """
+    results = run_solver()
+    return run_solver, sum(r.nodes for r in results)
+
+
+def _ida_star(table_dir: Optional[str]):
+    import solver
+    heuristic = solver.CoordinateHeuristic(table_dir)
+    rng = random.Random(SEED)
+    scrambles = [_random_scramble(rng, 7) for _ in range(3)]
+    return _counting(lambda: [solver.solve(s, heuristic) for s in scrambles])
+
+
+def _two_phase(table_dir: Optional[str]):
+    import two_phase
+    two_phase_solver = two_phase.TwoPhaseSolver(table_dir)
+    scrambles = two_phase.random_scrambles(10, seed=SEED)
+    return _counting(lambda: two_phase_solver.solve_batch(scrambles))
+
+
+def _bwas():
+    import bwas
+    rng = random.Random(SEED)
+    scrambles = [_random_scramble(rng, 6) for _ in range(3)]
+    return _counting(lambda: [bwas.solve(s, node_limit=20000) for s in scrambles])
+
+
+def _bidirectional():
+    import bidirectional
+    rng = random.Random(SEED)
+    scrambles = [_random_scramble(rng, 8) for _ in range(3)]
+    return _counting(lambda: [bidirectional.solve(s) for s in scrambles])
+
+
+def build_cases(tmp_dir: str, table_dir: Optional[str] = None) -> List[Case]:
+    """
+    すべてのケースを返す。tmp_dir には描画のケースが画像を書き出し、
+    table_dir は探索のケースが移動表と枝刈り表を読み書きするディレクトリ（None なら coord.TABLE_DIR）。
+    """
+    return [
+        Case("apply_move", _apply_move, "moves"),
+        Case("packed_apply_move", _packed_apply_move, "moves"),
+        Case("scramble2state_20", _scramble2state(20), "scrambles"),
+        Case("scramble2state_100", _scramble2state(100), "scrambles"),
+        Case("scramble2state_1000", _scramble2state(1000), "scrambles"),
+        Case("build_moves", _build_moves, "calls"),
+        Case("batch_expand", _batch_expand, "children"),
+        Case("state_to_facelets", _state_to_facelets, "states"),
+        Case("states_to_facelets", _states_to_facelets, "states"),
+        Case("draw_cube", _draw_cube(tmp_dir), "images"),
+        Case("save_nets", _render_nets(tmp_dir), "images"),
+        Case("random_walk", _random_walk, "examples"),
+        Case("move_trie", _move_trie, "sequences"),
+        Case("random_states", _uniform_random_states, "states"),
+        Case("is_solvable", _is_solvable, "states"),
+        Case("ida_star", lambda: _ida_star(table_dir), "nodes"),
+        Case("two_phase", lambda: _two_phase(table_dir), "nodes"),
+        Case("bwas", _bwas, "nodes"),
+        Case("bidirectional", _bidirectional, "nodes"),
+    ]
+
+
+def measure(case: Case, repeat: int = 3, min_time: float = 0.2) -> Dict[str, object]:
+    """
+    case を測る。1 回の計測では min_time 秒以上になるまで処理を繰り返し、repeat 回のうち最速の値を使う。
+    メモリのピークは計測とは別に 1 回だけ tracemalloc を有効にして実行する
+    （tracemalloc は処理を遅くするので速度の計測には含めない）。
+    """
+    run, units = case.setup()
+    run()  # ウォームアップ（遅延 import や表の読み込みを計測から外す）
+    best = float("inf")
+    loops = 0
+    for _ in range(repeat):
+        loops = 0
+        t0 = time.perf_counter()
+        while True:
+            run()
+            loops += 1
+            elapsed = time.perf_counter() - t0
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / loops)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "unit": case.unit,
+        "units_per_call": units,
+        "seconds_per_call": best,
+        "ops_per_sec": units / best,
+        "peak_kib": peak / 1024,
+        "loops": loops,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def environment() -> Dict[str, object]:
+    """
+    結果を比べるときに必要な実行環境の情報。
+    """
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": os.cpu_count(),
+        "seed": SEED,
+    }
+
+
+def run_benchmarks(keywords: Optional[List[str]] = None, repeat: int = 3, min_time: float = 0.2,
+                   tmp_dir: Optional[str] = None, verbose: bool = False,
+                   table_dir: Optional[str] = None) -> Dict[str, object]:
+    """
+    keywords のどれかを名前に含むケース（None ならすべて）を測り、環境情報と合わせた dict を返す。
+    """
+    tmp_dir = tmp_dir or tempfile.mkdtemp(prefix="rubik-bench-")
+    results = {}
+    for case in build_cases(tmp_dir, table_dir):
+        if keywords and not any(k in case.name for k in keywords):
+            continue
+        results[case.name] = measure(case, repeat, min_time)
+        if verbose:
+            r = results[case.name]
+            print(f"{case.name:<22} {r['ops_per_sec']:>14,.1f} {r['unit']}/s  peak {r['peak_kib']:>10,.1f} KiB",
+                  file=sys.stderr)
+    return {"environment": environment(), "results": results}
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[Tuple[str, float]]:
+    """
+    ベースラインと比べて、ops_per_sec の比（現在 / ベースライン）が tolerance を下回ったケースを返す。
+    片方にしか無いケースは比べない。
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["ops_per_sec"] / base["ops_per_sec"]
+        if ratio < tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="状態エンジン・変換・描画・探索のベンチマーク")
+    parser.add_argument("-k", "--keyword", action="append", help="名前にこの文字列を含むケースだけを測る（複数指定可）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.2, help="1 回の計測の最短時間（秒）")
+    parser.add_argument("--output", "-o", help="結果の JSON を書き出すパス（省略すると標準出力）")
+    parser.add_argument("--compare", help="比べるベースラインの JSON")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="ベースライン比がこの値を下回ったら終了コード 1 にする")
+    parser.add_argument("--save-baseline", action="store_true", help=f"結果を {BASELINE_PATH} に保存する")
+    parser.add_argument("--table-dir", default=None, help="移動表と枝刈り表のディレクトリ")
+    args = parser.parse_args()
+
+    # draw_cube は pyplot で描くので、GUI の無い環境でも動くように画面に出さない backend を使う
+    import matplotlib
+    matplotlib.use("Agg")
+
+    report = run_benchmarks(args.keyword, args.repeat, args.min_time, verbose=True, table_dir=args.table_dir)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for name, result in report["results"].items():
+            base = baseline["results"].get(name)
+            if base is not None:
+                print(f"{name:<22} x{result['ops_per_sec'] / base['ops_per_sec']:.2f}", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        for name, ratio in regressions:
+            print(f"regression: {name} is {ratio:.2f}x the baseline", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
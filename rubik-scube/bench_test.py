@@ -0,0 +1,30 @@
+# ベンチマークの出力形式とベースラインとの比較のテスト
+import json
+
+from bench import build_cases, compare, run_benchmarks
+
+
+def test_run_benchmarks_report(tmp_path):
+    report = run_benchmarks(["apply_move", "build_moves"], repeat=1, min_time=0.0, tmp_dir=str(tmp_path))
+    assert set(report["results"]) == {"apply_move", "packed_apply_move", "build_moves"}
+    assert report["environment"]["seed"] == 0
+    result = report["results"]["apply_move"]
+    assert result["unit"] == "moves" and result["ops_per_sec"] > 0 and result["peak_kib"] >= 0
+    # 機械可読な出力としてそのまま JSON にできる
+    json.dumps(report)
+
+
+def test_compare_reports_only_slow_cases():
+    baseline = {"results": {"a": {"ops_per_sec": 100.0}, "b": {"ops_per_sec": 100.0}}}
+    current = {"results": {"a": {"ops_per_sec": 50.0}, "b": {"ops_per_sec": 95.0}, "c": {"ops_per_sec": 1.0}}}
+    assert compare(current, baseline, tolerance=0.8) == [("a", 0.5)]
+
+
+def test_every_case_runs_once(tmp_path):
+    # 表はソースツリーの tables ではなく一時ディレクトリに作る
+    table_dir = tmp_path / "tables"
+    for case in build_cases(str(tmp_path), str(table_dir)):
+        run, units = case.setup()
+        run()
+        assert units > 0, case.name
+    assert any(table_dir.iterdir())
@@ -0,0 +1,308 @@
+"""
+短いスクランブル（12 手程度まで）向けの双方向幅優先探索（meet-in-the-middle）による最適解ソルバー。
+
+スクランブルされた状態と完成状態の両方から 1 段ずつ幅優先探索を進め、
+2 つのフロンティアが出会ったら半分ずつの手順をつなぐ。
+
+- 状態は packed の 100 bit の key（int）で持ち、各段は key -> その状態に来た手番号 の dict にする
+- 段 d の子は段 d - 1, d, d + 1 のどれかにしか無いので、重複の確認には直近の 2 段だけあればよい
+- メモリ上の状態数（dict の段と、作っている途中の次の段の合計）は max_states を超えない
+  - 段を展開する前に、メモリ上の状態数が max_states の半分以下になるまで古い段から順に
+    key でソートした配列としてディスクに書き出す（フロンティアとその 1 つ前の段も含む）。
+    書き出した段は mmap で読み、重複や出会いの確認は二分探索、展開は先頭から少しずつ読んで行う
+  - 作っている次の段が残りの枠を超えたら、ソートした塊（run）として書き出し、
+    段を作り終えたら run をマージして重複を除いた 1 つの段にする
+
+前向き: target に手 a を順に適用した状態、後ろ向き: 完成状態に手 b を順に適用した状態。
+target・a = b で出会ったら target・a・b^-1 = 完成状態 なので、解は a のあとに b の逆手順を続けたもの。
+"""
+import argparse
+import heapq
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+import instrument
+from operation import scramble2state
+from packed import KEY_BYTES, MOVE_NAMES, PACKED_SOLVED, PackedCubeState
+from solver import MOVE_FACE, SolveResult
+from state import RubiksCubeState
+
+# 手番号 m の逆の手（MOVE_NAMES は面ごとに X, X2, X' の順）
+INVERSE_MOVE = [m - m % 3 + 2 - m % 3 for m in range(len(MOVE_NAMES))]
+KEY_DTYPE = np.dtype(f"S{KEY_BYTES}")
+
+
+# ディスクに書き出した段を先頭から読むときの 1 回の行数
+READ_CHUNK = 1 << 16
+
+
+def _key_bytes(key: int) -> bytes:
+    # NumPy の S 型は末尾の 0 バイトを落として持つので、比べる側も落とす
+    return key.to_bytes(KEY_BYTES, "big").rstrip(b"\0")
+
+
+class _SpilledLayer:
+    """
+    ディスクに書き出した 1 段分の (key, 手番号)。key は to_bytes の順（= 数値の順）にソートしてある。
+    """
+    def __init__(self, keys: np.ndarray, moves: np.ndarray, path: str):
+        self.keys = keys
+        self.moves = moves
+        self.path = path
+
+    @classmethod
+    def write(cls, layer: Dict[int, int], path: str) -> "_SpilledLayer":
+        """
+        dict の段をソートして path に書き出す。
+        """
+        keys = sorted(layer)
+        np.save(f"{path}-keys.npy", np.array([_key_bytes(k) for k in keys], dtype=KEY_DTYPE))
+        np.save(f"{path}-moves.npy", np.array([layer[k] for k in keys], dtype=np.int8))
+        return cls(np.load(f"{path}-keys.npy", mmap_mode="r"), np.load(f"{path}-moves.npy", mmap_mode="r"), path)
+
+    @classmethod
+    def merge(cls, runs: List["_SpilledLayer"], path: str) -> "_SpilledLayer":
+        """
+        ソート済みの run をマージし、同じ key は 1 つにして path に書き出す。run のファイルは消す。
+        """
+        total = sum(len(run) for run in runs)
+        keys = np.lib.format.open_memmap(f"{path}-keys.npy", mode="w+", dtype=KEY_DTYPE, shape=(total,))
+        moves = np.lib.format.open_memmap(f"{path}-moves.npy", mode="w+", dtype=np.int8, shape=(total,))
+        n = 0
+        chunk_keys: List[bytes] = []
+        chunk_moves: List[int] = []
+        last = None
+        for key, move in heapq.merge(*(run.items() for run in runs)):
+            if key == last:
+                continue
+            last = key
+            chunk_keys.append(_key_bytes(key))
+            chunk_moves.append(move)
+            if len(chunk_keys) == READ_CHUNK:
+                keys[n:n + READ_CHUNK], moves[n:n + READ_CHUNK] = chunk_keys, chunk_moves
+                n += READ_CHUNK
+                chunk_keys, chunk_moves = [], []
+        keys[n:n + len(chunk_keys)], moves[n:n + len(chunk_keys)] = chunk_keys, chunk_moves
+        n += len(chunk_keys)
+        keys.flush()
+        moves.flush()
+        for run in runs:
+            run.remove()
+        return cls(keys[:n], moves[:n], path)
+
+    def remove(self) -> None:
+        self.keys = self.moves = None
+        for suffix in ("keys", "moves"):
+            os.remove(f"{self.path}-{suffix}.npy")
+
+    def __len__(self):
+        return self.keys.shape[0]
+
+    def _find(self, key: int) -> int:
+        data = _key_bytes(key)
+        i = int(np.searchsorted(self.keys, data))
+        return i if i < self.keys.shape[0] and self.keys[i] == data else -1
+
+    def __contains__(self, key: int) -> bool:
+        return self._find(key) >= 0
+
+    def __getitem__(self, key: int) -> int:
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return int(self.moves[i])
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """
+        (key, 手番号) を key の順に READ_CHUNK 行ずつ読みながら返す。
+        """
+        for start in range(0, len(self), READ_CHUNK):
+            keys = self.keys[start:start + READ_CHUNK].tolist()
+            moves = self.moves[start:start + READ_CHUNK].tolist()
+            for data, move in zip(keys, moves):
+                yield int.from_bytes(data.ljust(KEY_BYTES, b"\0"), "big"), move
+
+
+class _Side:
+    """
+    片側の探索。layers[d] は深さ d の状態の key -> その状態に来た手番号（深さ 0 は -1）。
+    """
+    def __init__(self, start: PackedCubeState):
+        self.layers: List[Union[Dict[int, int], _SpilledLayer]] = [{start.key: -1}]
+
+    @property
+    def depth(self) -> int:
+        return len(self.layers) - 1
+
+    @property
+    def frontier(self) -> Dict[int, int]:
+        return self.layers[-1]
+
+    def in_memory(self) -> int:
+        """
+        メモリ上に置いている状態の数（書き出した段は数えない）。
+        """
+        return sum(len(layer) for layer in self.layers if not isinstance(layer, _SpilledLayer))
+
+    def path_to(self, key: int, depth: int) -> List[int]:
+        """
+        開始状態から深さ depth の key に至る手番号の列。
+        """
+        moves = []
+        for d in range(depth, 0, -1):
+            m = self.layers[d][key]
+            moves.append(m)
+            key = PackedCubeState.from_key(key).apply_move(MOVE_NAMES[INVERSE_MOVE[m]]).key
+        return moves[::-1]
+
+
+class _Timeout(Exception):
+    pass
+
+
+def solve(target: Union[RubiksCubeState, str], max_depth: int = 12, max_states: int = 20_000_000,
+          spill_dir: Optional[str] = None, time_limit: Optional[float] = None) -> SolveResult:
+    """
+    双方向幅優先探索で target の最短手順を探す。
+
+    引数:
+    - target: RubiksCubeState またはスクランブル文字列
+    - max_depth: 探索する最大の手数（両側の深さの和）
+    - max_states: メモリ上に置く状態数の上限。超えないように段をディスクに書き出す
+    - spill_dir: 段を書き出すディレクトリ（None なら一時ディレクトリ）。終了時に削除する
+    - time_limit: 探索時間の上限（秒）
+
+    status は 'solved'、max_depth 以内に無ければ 'not_found'、時間切れなら 'time_limit'。
+    nodes は展開した状態の数。
+    """
+    if isinstance(target, str):
+        target = scramble2state(target)
+    start = time.perf_counter()
+    deadline = start + time_limit if time_limit is not None else None
+    forward = _Side(PackedCubeState.from_state(target))
+    backward = _Side(PACKED_SOLVED)
+    nodes = 0
+    tmp_dir = None
+    rec = instrument.current()
+
+    def spill_path(name: str) -> str:
+        nonlocal tmp_dir
+        if tmp_dir is None:
+            if spill_dir is not None:
+                os.makedirs(spill_dir, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(prefix="bidirectional-", dir=spill_dir)
+        return os.path.join(tmp_dir, name)
+
+    def in_memory() -> int:
+        return forward.in_memory() + backward.in_memory()
+
+    def expand(side: _Side, other: _Side) -> Optional[int]:
+        """
+        side を 1 段進める。other のフロンティアと出会った key を返す（出会わなければ None）。
+        """
+        nonlocal nodes
+        previous = side.layers[-2] if side.depth > 0 else {}
+        current = side.frontier
+        goal = other.frontier
+        name = f"{'forward' if side is forward else 'backward'}-{side.depth + 1}"
+        base = in_memory()
+        # 作っている段をメモリに置ける状態数。超えたら run として書き出す
+        room = max(1, max_states - base)
+        new: Dict[int, int] = {}
+        runs: List[_SpilledLayer] = []
+        met = None
+        expanded_before = nodes
+        for key, last in current.items():
+            nodes += 1
+            if deadline is not None and nodes & 0xFFF == 0 and time.perf_counter() > deadline:
+                raise _Timeout()
+            state = PackedCubeState.from_key(key)
+            last_face = MOVE_FACE[last] if last >= 0 else -1
+            for m, move_name in enumerate(MOVE_NAMES):
+                # 同じ面を続けて回すと、より浅い段か同じ段の状態にしかならない
+                if MOVE_FACE[m] == last_face:
+                    continue
+                child = state.apply_move(move_name).key
+                if child in new or child in current or child in previous:
+                    continue
+                new[child] = m
+                if met is None and child in goal:
+                    met = child
+                if len(new) >= room:
+                    runs.append(_SpilledLayer.write(new, spill_path(f"{name}-run{len(runs)}")))
+                    new = {}
+            if met is not None:
+                break
+        peak = base + (room if runs else len(new))
+        if runs:
+            if new:
+                runs.append(_SpilledLayer.write(new, spill_path(f"{name}-run{len(runs)}")))
+            side.layers.append(_SpilledLayer.merge(runs, spill_path(name)))
+        else:
+            side.layers.append(new)
+        if rec is not None:
+            # 初手は 18 手、それ以降は直前と同じ面を除く 15 手を適用している
+            rec.count("move_applications", 15 * (nodes - expanded_before) + (3 if side.depth == 1 else 0))
+            rec.observe("forward_depth" if side is forward else "backward_depth", side.depth, len(side.frontier))
+            rec.observe("in_memory_states", peak)
+        return met
+
+    def spill() -> None:
+        # 次の段を作る枠を残すため、メモリ上の状態数が max_states の半分以下になるまで浅い段から書き出す
+        layers = sorted(((d, name, side) for name, side in (("forward", forward), ("backward", backward))
+                         for d in range(len(side.layers))), key=lambda t: t[0])
+        for d, name, side in layers:
+            if in_memory() <= max_states // 2:
+                return
+            layer = side.layers[d]
+            if isinstance(layer, _SpilledLayer) or not layer:
+                continue
+            side.layers[d] = _SpilledLayer.write(layer, spill_path(f"{name}-{d}"))
+
+    status = "not_found"
+    solution = None
+    try:
+        met = forward.frontier.keys() & backward.frontier.keys()
+        met = next(iter(met)) if met else None
+        while met is None and forward.depth + backward.depth < max_depth:
+            spill()
+            # フロンティアの小さい側を進める（同じ大きさなら交互になる）
+            if len(forward.frontier) <= len(backward.frontier):
+                met = expand(forward, backward)
+            else:
+                met = expand(backward, forward)
+            if not forward.frontier or not backward.frontier:
+                break
+        if met is not None:
+            moves = forward.path_to(met, forward.depth)
+            moves += [INVERSE_MOVE[m] for m in reversed(backward.path_to(met, backward.depth))]
+            solution = [MOVE_NAMES[m] for m in moves]
+            status = "solved"
+    except _Timeout:
+        status = "time_limit"
+    finally:
+        if rec is not None:
+            rec.count("node_expansions", nodes)
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return SolveResult(solution, status, nodes, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="双方向幅優先探索で短いスクランブルの最短解を探す")
+    parser.add_argument("scramble", help="スクランブル文字列（例: \"R U R' U'\"）")
+    parser.add_argument("--max-depth", type=int, default=12)
+    parser.add_argument("--max-states", type=int, default=20_000_000, help="メモリ上に置く状態数の上限")
+    parser.add_argument("--spill-dir", default=None, help="段を書き出すディレクトリ")
+    parser.add_argument("--time-limit", type=float, default=None)
+    args = parser.parse_args()
+
+    result = solve(args.scramble, args.max_depth, args.max_states, args.spill_dir, args.time_limit)
+    print("status   :", result.status)
+    print("solution :", " ".join(result.solution) if result.solution is not None else None)
+    print(f"nodes    : {result.nodes} ({result.nodes_per_sec:.0f} nodes/s, {result.elapsed:.3f} s)")
@@ -0,0 +1,79 @@
+# 双方向幅優先探索のテスト
+import random
+
+import pytest
+
+import bidirectional
+import instrument
+import solver
+from batch import MOVE_NAMES
+from operation import scramble2state
+
+
+def _check(scramble, result):
+    assert result.status == "solved"
+    assert solver.is_solved(scramble2state(" ".join(result.solution), scramble2state(scramble)))
+
+
+def test_solves_random_scrambles():
+    rng = random.Random(0)
+    for length in range(8):
+        scramble = " ".join(rng.choice(MOVE_NAMES) for _ in range(length))
+        result = bidirectional.solve(scramble)
+        _check(scramble, result)
+        assert len(result.solution) <= length
+
+
+@pytest.mark.parametrize("scramble, optimal", [
+    ("R U R' U'", 4),
+    ("R2 U2 R2 U2 R2 U2", 6),
+    ("F R U R' U' F'", 6),
+])
+def test_optimal_length(scramble, optimal):
+    result = bidirectional.solve(scramble)
+    _check(scramble, result)
+    assert len(result.solution) == optimal
+
+
+def test_spill_to_disk(tmp_path):
+    # 状態数の上限を小さくして古い段をディスクに書き出させても、同じ長さの解が見つかる
+    scramble = "R U F' L2 D B'"
+    result = bidirectional.solve(scramble, max_states=10, spill_dir=str(tmp_path))
+    _check(scramble, result)
+    assert len(result.solution) == 6
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spilled_layer(tmp_path):
+    layer = {5: 0, 1 << 90: 17, 3: 4}
+    spilled = bidirectional._SpilledLayer.write(layer, str(tmp_path / "layer"))
+    assert len(spilled) == 3
+    assert {key: spilled[key] for key in layer} == layer
+    with pytest.raises(KeyError):
+        spilled[4]
+    side = bidirectional._Side(bidirectional.PACKED_SOLVED)
+    side.layers += [layer, spilled, {}]
+    # 書き出した段はメモリ上の状態数に数えない
+    assert side.in_memory() == 1 + 3
+    # run のマージでは同じ key を 1 つにする
+    other = bidirectional._SpilledLayer.write({3: 4, 7: 1}, str(tmp_path / "other"))
+    merged = bidirectional._SpilledLayer.merge([spilled, other], str(tmp_path / "merged"))
+    assert list(merged.items()) == [(3, 4), (5, 0), (7, 1), (1 << 90, 17)]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["merged-keys.npy", "merged-moves.npy"]
+
+
+def test_memory_stays_within_max_states(tmp_path):
+    # フロンティアも含めてディスクに書き出すので、メモリ上の状態数は max_states を超えない
+    scramble = "R U F' L2 D B' R2"
+    with instrument.recording() as rec:
+        result = bidirectional.solve(scramble, max_states=500, spill_dir=str(tmp_path))
+    _check(scramble, result)
+    assert len(result.solution) == 7
+    assert max(rec.histograms["in_memory_states"]) <= 500
+    assert list(tmp_path.iterdir()) == []
+    # 上限が十分なら書き出さずに同じ長さの解が見つかる
+    assert len(bidirectional.solve(scramble).solution) == 7
+
+
+def test_not_found():
+    assert bidirectional.solve("R U F' L2 D B'", max_depth=4).status == "not_found"
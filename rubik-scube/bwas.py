@@ -0,0 +1,197 @@
+"""
+学習した価値関数で動かすバッチ重み付き A*（DeepCubeA の BWAS）。
+
+- open リストから f の小さい順に K 個まとめて取り出す
+- K 個の子（K * 18 個）を batch.expand_array でまとめて作る
+- 新しい子の h をヒューリスティックの 1 回の呼び出しでまとめて求める
+- f = λ * g + h
+
+状態は batch の 40 バイトの行をそのまま bytes にしたものをキーにする。
+探索本体は「h を求めたい状態の配列を yield し、h の配列を send で受け取る」ジェネレータなので、
+同期的に回すこと（solve）も、複数の探索の評価をまとめて行うこともできる。
+"""
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, Generator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+import instrument
+from batch import MOVE_NAMES, NUM_MOVES, STATE_WIDTH, STATE_DTYPE, BatchCubeState, expand_array, state_to_row
+from operation import scramble2state
+from state import RubiksCubeState
+
+BatchHeuristic = Callable[[np.ndarray], np.ndarray]
+
+SOLVED_ROW = BatchCubeState.solved(1).array[0]
+SOLVED_KEY = SOLVED_ROW.tobytes()
+
+
+class BWASResult(NamedTuple):
+    """
+    探索の結果。
+    - solution: 解の手順。見つからなければ None
+    - status: 'solved', 'not_found', 'node_limit', 'time_limit' のどれか
+    - nodes: 展開したノード数
+    - heuristic_calls: ヒューリスティックの呼び出し回数
+    - elapsed: 経過時間（秒）
+    """
+    solution: Optional[List[str]]
+    status: str
+    nodes: int
+    heuristic_calls: int
+    elapsed: float
+
+    @property
+    def nodes_per_sec(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def misplaced_heuristic(states: np.ndarray) -> np.ndarray:
+    """
+    学習済みモデルが無いときの簡易ヒューリスティック。
+    位置か向きが揃っていないピースの数を 8 で割ったもの（許容的ではない）。
+    """
+    corners = (states[:, 0:8] != SOLVED_ROW[0:8]) | (states[:, 8:16] != 0)
+    edges = (states[:, 16:28] != SOLVED_ROW[16:28]) | (states[:, 28:40] != 0)
+    return (corners.sum(axis=1) + edges.sum(axis=1)) / 8.0
+
+
+def _path(closed: Dict[bytes, Tuple[int, Optional[bytes], int]], key: bytes) -> List[str]:
+    """
+    closed を親方向にたどって手順を復元する。
+    """
+    moves = []
+    while True:
+        _, parent, move = closed[key]
+        if parent is None:
+            break
+        moves.append(MOVE_NAMES[move])
+        key = parent
+    return moves[::-1]
+
+
+def search_steps(start: np.ndarray, weight: float = 0.6, batch_size: int = 1000, max_open: int = 10_000_000,
+                 node_limit: Optional[int] = None, deadline: Optional[float] = None
+                 ) -> Generator[np.ndarray, np.ndarray, BWASResult]:
+    """
+    BWAS の探索本体。h を求めたい (M, 40) の状態配列を yield し、(M,) の h を send で受け取る。
+    終了すると StopIteration.value として BWASResult を返す。
+
+    引数:
+    - start: 長さ 40 の開始状態
+    - weight: g にかける重み λ
+    - batch_size: 1 回に展開するノード数 K
+    - max_open: open リストの上限。超えたら f の大きいノードから捨てる
+    - node_limit: 展開ノード数の上限
+    - deadline: 打ち切る時刻（time.perf_counter() の値）
+    """
+    t0 = time.perf_counter()
+    rec = instrument.current()
+    start = np.ascontiguousarray(start, dtype=STATE_DTYPE).reshape(STATE_WIDTH)
+    start_key = start.tobytes()
+    # closed: キー -> (g, 親のキー, 親からの手番号)
+    closed: Dict[bytes, Tuple[int, Optional[bytes], int]] = {start_key: (0, None, -1)}
+    nodes = 0
+    calls = 0
+    if start_key == SOLVED_KEY:
+        return BWASResult([], "solved", 0, 0, time.perf_counter() - t0)
+
+    counter = itertools.count()
+    # open: (f, 通し番号, g, キー)
+    open_heap: List[Tuple[float, int, int, bytes]] = [(0.0, next(counter), 0, start_key)]
+    status = "not_found"
+    while open_heap:
+        if node_limit is not None and nodes >= node_limit:
+            status = "node_limit"
+            break
+        if deadline is not None and time.perf_counter() > deadline:
+            status = "time_limit"
+            break
+
+        # f の小さい順に K 個取り出す（より小さい g で取り出し済みのものは飛ばす）
+        popped = []
+        while open_heap and len(popped) < batch_size:
+            _, _, g, key = heapq.heappop(open_heap)
+            if closed[key][0] < g:
+                continue
+            popped.append((g, key))
+        if not popped:
+            break
+        nodes += len(popped)
+        if rec is not None:
+            rec.count("node_expansions", len(popped))
+            rec.count("move_applications", len(popped) * NUM_MOVES)
+            for g, _ in popped:
+                rec.observe("bwas_g", g)
+
+        parents = np.frombuffer(b"".join(key for _, key in popped), dtype=STATE_DTYPE).reshape(-1, STATE_WIDTH)
+        children = expand_array(parents)
+
+        # 新しい子（または g が改善した子）だけを残す
+        new_rows = []
+        new_entries = []
+        for i, (g, parent_key) in enumerate(popped):
+            child_g = g + 1
+            for m in range(NUM_MOVES):
+                row = i * NUM_MOVES + m
+                key = children[row].tobytes()
+                seen = closed.get(key)
+                if seen is not None and seen[0] <= child_g:
+                    continue
+                closed[key] = (child_g, parent_key, m)
+                if key == SOLVED_KEY:
+                    return BWASResult(_path(closed, key), "solved", nodes, calls, time.perf_counter() - t0)
+                new_rows.append(row)
+                new_entries.append((child_g, key))
+        if not new_rows:
+            continue
+
+        # 新しい子の h を 1 回の呼び出しでまとめて求める
+        t1 = time.perf_counter()
+        h = np.asarray((yield children[new_rows]), dtype=np.float64).reshape(-1)
+        calls += 1
+        if rec is not None:
+            rec.add_time("heuristic", time.perf_counter() - t1)
+            rec.count("heuristic_evals", len(new_rows))
+        for (child_g, key), hv in zip(new_entries, h):
+            heapq.heappush(open_heap, (weight * child_g + float(hv), next(counter), child_g, key))
+
+        # メモリの上限: f の大きいノードを捨てる（親をたどる closed は残す）
+        if len(open_heap) > max_open:
+            open_heap = heapq.nsmallest(int(max_open * 0.9), open_heap)
+            heapq.heapify(open_heap)
+
+    return BWASResult(None, status, nodes, calls, time.perf_counter() - t0)
+
+
+def _start_row(target: Union[RubiksCubeState, str, np.ndarray]) -> np.ndarray:
+    if isinstance(target, str):
+        target = scramble2state(target)
+    if isinstance(target, RubiksCubeState):
+        return state_to_row(target)
+    return np.asarray(target, dtype=STATE_DTYPE)
+
+
+def solve(target: Union[RubiksCubeState, str, np.ndarray], heuristic: Optional[BatchHeuristic] = None,
+          weight: float = 0.6, batch_size: int = 1000, max_open: int = 10_000_000,
+          node_limit: Optional[int] = None, time_limit: Optional[float] = None) -> BWASResult:
+    """
+    BWAS で target を解く。
+
+    引数:
+    - target: RubiksCubeState、スクランブル文字列、または長さ 40 の状態配列
+    - heuristic: (M, 40) の状態配列 -> (M,) の推定手数。None なら misplaced_heuristic
+    - weight / batch_size / max_open / node_limit: search_steps を参照
+    - time_limit: 探索時間の上限（秒）
+    """
+    heuristic = heuristic or misplaced_heuristic
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    steps = search_steps(_start_row(target), weight, batch_size, max_open, node_limit, deadline)
+    try:
+        batch = next(steps)
+        while True:
+            batch = steps.send(heuristic(batch))
+    except StopIteration as stop:
+        return stop.value
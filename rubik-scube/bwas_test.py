@@ -0,0 +1,38 @@
+# バッチ重み付き A* のテスト
+import numpy as np
+
+import bwas
+from operation import scramble2state
+from solver import is_solved
+
+
+def test_solves_short_scramble():
+    scramble = "R U F' L2 D"
+    result = bwas.solve(scramble, batch_size=100)
+    assert result.status == "solved"
+    assert is_solved(scramble2state(" ".join(result.solution), scramble2state(scramble)))
+    # ヒューリスティックの呼び出しはバッチ単位なので、ノード数よりずっと少ない
+    assert result.heuristic_calls < result.nodes
+
+
+def test_heuristic_receives_batches():
+    sizes = []
+
+    def heuristic(states):
+        assert states.ndim == 2 and states.shape[1] == 40
+        sizes.append(states.shape[0])
+        return bwas.misplaced_heuristic(states)
+
+    bwas.solve("R U R' U'", heuristic, batch_size=50)
+    assert max(sizes) > 18
+
+
+def test_node_limit_and_memory_cap():
+    result = bwas.solve("R U F' L2 D B R2 U' F L'", batch_size=10, max_open=100, node_limit=200)
+    assert result.status == "node_limit"
+    assert result.solution is None
+
+
+def test_solved_start():
+    result = bwas.solve(np.array(bwas.SOLVED_ROW))
+    assert result.solution == []
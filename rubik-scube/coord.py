@@ -0,0 +1,418 @@
+"""
+ルービックキューブの状態を座標（整数のインデックス）に変換し、
+座標ごとの移動表（coordinate_size x 18）を作る。
+
+探索コードは cp/co/ep/eo のリストを動かす代わりに、
+  next_coord = MOVE_TABLE[coord, move_index]
+の表引き 1 回で手を適用できる。
+
+座標の一覧:
+  - co           : コーナーの向き 3^7 = 2187
+  - eo           : エッジの向き 2^11 = 2048
+  - cp           : コーナーの位置 8! = 40320
+  - ud_slice     : 中層エッジ(0〜3番)が入っている位置の組合せ C(12, 4) = 495
+  - slice_perm   : 中層の位置 0〜3 にある中層エッジの並び 4! = 24
+  - ud_edge_perm : 位置 4〜11 にある U/D 面エッジの並び 8! = 40320
+
+slice_perm と ud_edge_perm は <U, D, R2, L2, F2, B2> (G1) の中でだけ意味を持つので、
+G1 から外れる手の列には INVALID を入れる。
+
+移動表は初回に作ってディスクに .npy で保存し、2 回目以降は mmap で読み込む。
+"""
+import itertools
+import math
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from batch import MOVE_NAMES, NUM_MOVES, _GATHER, _ADD, CP, CO, EP, EO
+
+# 移動表の値の型。最大の座標サイズ 40320 が収まり、ファイルも小さくなる
+TABLE_DTYPE = np.uint16
+# G1 の外に出る手など、表引きできない組合せを表す値
+INVALID = np.iinfo(TABLE_DTYPE).max
+
+# 移動表の保存先。環境変数 RUBIK_TABLE_DIR で変更できる
+TABLE_DIR = os.environ.get("RUBIK_TABLE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables"))
+
+# <U, D, R2, L2, F2, B2> を生成する 10 手
+G1_MOVES = ["U", "U2", "U'", "D", "D2", "D'", "L2", "R2", "F2", "B2"]
+G1_MOVE_INDICES = [MOVE_NAMES.index(name) for name in G1_MOVES]
+
+# 中層（E スライス）のエッジ番号
+SLICE_EDGES = (0, 1, 2, 3)
+
+# 各手の cp/ep の gather と co/eo の加算値（batch の表から切り出す）
+_MOVE_CP = _GATHER[:, CP] - CP.start
+_MOVE_CO = _ADD[:, CO].astype(np.int64)
+_MOVE_EP = _GATHER[:, EP] - EP.start
+_MOVE_EO = _ADD[:, EO].astype(np.int64)
+
+_POW3 = 3 ** np.arange(6, -1, -1)
+_POW2 = 2 ** np.arange(10, -1, -1)
+_SLICE_COMBOS = list(itertools.combinations(range(12), 4))
+_BINOM = np.array([[math.comb(p, k) for k in range(6)] for p in range(12)], dtype=np.int64)
+
+
+def _as_int(result):
+    """
+    0 次元の結果は Python の int にして返す。
+    """
+    if np.ndim(result) == 0:
+        return int(result)
+    return result
+
+
+# ------------------------------------------------------------
+# 汎用の順列ランク
+# ------------------------------------------------------------
+def perm_to_index(perm) -> int:
+    """
+    順列を辞書順のランク（Lehmer code）に変換する。
+    perm は (..., n) の配列で、値は 0..n-1 の並べ替え。
+    """
+    perm = np.asarray(perm, dtype=np.int64)
+    if perm.ndim == 1:
+        # 1 状態だけなら Python のループの方が NumPy の呼び出しより速い
+        values = perm.tolist()
+        n = len(values)
+        index = 0
+        for i, v in enumerate(values):
+            index = index * (n - i) + sum(1 for w in values[i + 1:] if w < v)
+        return index
+    n = perm.shape[-1]
+    # smaller[..., i, j] = perm[j] < perm[i] かつ j > i
+    smaller = (perm[..., None, :] < perm[..., :, None]) & np.triu(np.ones((n, n), dtype=bool), 1)
+    digits = smaller.sum(axis=-1)
+    weights = np.array([math.factorial(n - 1 - i) for i in range(n)], dtype=np.int64)
+    return _as_int(digits @ weights)
+
+
+def index_to_perm(index, n: int) -> np.ndarray:
+    """
+    perm_to_index の逆変換。index はスカラーか (N,) の配列。
+    """
+    index = np.array(index, dtype=np.int64)
+    scalar = index.ndim == 0
+    index = index.reshape(-1)
+    available = np.ones((index.shape[0], n), dtype=bool)
+    perm = np.zeros((index.shape[0], n), dtype=np.int64)
+    rows = np.arange(index.shape[0])
+    for i in range(n):
+        f = math.factorial(n - 1 - i)
+        digit = index // f
+        index = index % f
+        # 残っている要素のうち digit 番目に小さいものを選ぶ
+        choice = np.argmax((np.cumsum(available, axis=1) == digit[:, None] + 1) & available, axis=1)
+        perm[:, i] = choice
+        available[rows, choice] = False
+    return perm[0] if scalar else perm
+
+
+# ------------------------------------------------------------
+# 各座標のランク / アンランク
+# ------------------------------------------------------------
+def co_to_index(co) -> int:
+    """
+    コーナーの向き（長さ 8）を 0..2186 に変換する。8 個目は残り 7 個から決まる。
+    """
+    co = np.asarray(co, dtype=np.int64)
+    return _as_int(co[..., :7] @ _POW3)
+
+
+def index_to_co(index) -> np.ndarray:
+    """
+    co_to_index の逆変換。
+    """
+    index = np.asarray(index, dtype=np.int64)
+    digits = (index[..., None] // _POW3) % 3
+    last = (-digits.sum(axis=-1)) % 3
+    return np.concatenate([digits, last[..., None]], axis=-1)
+
+
+def eo_to_index(eo) -> int:
+    """
+    エッジの向き（長さ 12）を 0..2047 に変換する。12 個目は残り 11 個から決まる。
+    """
+    eo = np.asarray(eo, dtype=np.int64)
+    return _as_int(eo[..., :11] @ _POW2)
+
+
+def index_to_eo(index) -> np.ndarray:
+    """
+    eo_to_index の逆変換。
+    """
+    index = np.asarray(index, dtype=np.int64)
+    digits = (index[..., None] // _POW2) % 2
+    last = digits.sum(axis=-1) % 2
+    return np.concatenate([digits, last[..., None]], axis=-1)
+
+
+def cp_to_index(cp) -> int:
+    """
+    コーナーの位置（長さ 8）を 0..40319 に変換する。
+    """
+    return perm_to_index(cp)
+
+
+def index_to_cp(index) -> np.ndarray:
+    """
+    cp_to_index の逆変換。
+    """
+    return index_to_perm(index, 8)
+
+
+def ud_slice_to_index(ep) -> int:
+    """
+    中層エッジ 4 本が入っている位置の組合せを 0..494 に変換する。
+    完成状態（位置 0〜3 に中層エッジ）が 0 になる。
+    """
+    ep = np.asarray(ep, dtype=np.int64)
+    if ep.ndim == 1:
+        index = 0
+        k = 0
+        for p, e in enumerate(ep.tolist()):
+            if e < len(SLICE_EDGES):
+                k += 1
+                index += math.comb(p, k)
+        return index
+    mask = ep < len(SLICE_EDGES)
+    # 組合せ数体系: 小さい順に並べた位置 p_k について sum C(p_k, k + 1)
+    rank = np.cumsum(mask, axis=-1)
+    terms = np.where(mask, _BINOM[np.arange(12), np.minimum(rank, 5)], 0)
+    return _as_int(terms.sum(axis=-1))
+
+
+def index_to_ud_slice(index) -> np.ndarray:
+    """
+    ud_slice_to_index の逆変換。中層エッジ（0〜3番）を小さい番号から順に、
+    それ以外の位置に U/D エッジ（4〜11番）を順に置いた ep を返す。
+    """
+    index = np.asarray(index, dtype=np.int64)
+    return _SLICE_EP[index]
+
+
+def _build_slice_ep() -> np.ndarray:
+    table = np.zeros((len(_SLICE_COMBOS), 12), dtype=np.int64)
+    for combo in _SLICE_COMBOS:
+        ep = np.zeros(12, dtype=np.int64)
+        others = [p for p in range(12) if p not in combo]
+        ep[list(combo)] = SLICE_EDGES
+        ep[others] = range(4, 12)
+        table[ud_slice_to_index(ep)] = ep
+    return table
+
+
+_SLICE_EP = _build_slice_ep()
+
+
+def slice_perm_to_index(ep) -> int:
+    """
+    位置 0〜3 にある中層エッジの並びを 0..23 に変換する（G1 内でのみ有効）。
+    """
+    ep = np.asarray(ep, dtype=np.int64)
+    return perm_to_index(ep[..., :4])
+
+
+def index_to_slice_perm(index) -> np.ndarray:
+    """
+    slice_perm_to_index の逆変換。位置 4〜11 は完成状態のままの ep を返す。
+    """
+    perm = index_to_perm(index, 4)
+    rest = np.broadcast_to(np.arange(4, 12), perm.shape[:-1] + (8,))
+    return np.concatenate([perm, rest], axis=-1)
+
+
+def ud_edge_perm_to_index(ep) -> int:
+    """
+    位置 4〜11 にある U/D 面エッジの並びを 0..40319 に変換する（G1 内でのみ有効）。
+    """
+    ep = np.asarray(ep, dtype=np.int64)
+    return perm_to_index(ep[..., 4:] - 4)
+
+
+def index_to_ud_edge_perm(index) -> np.ndarray:
+    """
+    ud_edge_perm_to_index の逆変換。位置 0〜3 は完成状態のままの ep を返す。
+    """
+    perm = index_to_perm(index, 8) + 4
+    head = np.broadcast_to(np.arange(4), perm.shape[:-1] + (4,))
+    return np.concatenate([head, perm], axis=-1)
+
+
+# ------------------------------------------------------------
+# 移動表
+# ------------------------------------------------------------
+def _co_table() -> np.ndarray:
+    co = index_to_co(np.arange(3 ** 7))
+    table = np.empty((3 ** 7, NUM_MOVES), dtype=TABLE_DTYPE)
+    for m in range(NUM_MOVES):
+        table[:, m] = co_to_index((co[:, _MOVE_CP[m]] + _MOVE_CO[m]) % 3)
+    return table
+
+
+def _eo_table() -> np.ndarray:
+    eo = index_to_eo(np.arange(2 ** 11))
+    table = np.empty((2 ** 11, NUM_MOVES), dtype=TABLE_DTYPE)
+    for m in range(NUM_MOVES):
+        table[:, m] = eo_to_index((eo[:, _MOVE_EP[m]] + _MOVE_EO[m]) % 2)
+    return table
+
+
+def _cp_table() -> np.ndarray:
+    cp = index_to_cp(np.arange(math.factorial(8)))
+    table = np.empty((cp.shape[0], NUM_MOVES), dtype=TABLE_DTYPE)
+    for m in range(NUM_MOVES):
+        table[:, m] = cp_to_index(cp[:, _MOVE_CP[m]])
+    return table
+
+
+def _ud_slice_table() -> np.ndarray:
+    ep = index_to_ud_slice(np.arange(len(_SLICE_COMBOS)))
+    table = np.empty((ep.shape[0], NUM_MOVES), dtype=TABLE_DTYPE)
+    for m in range(NUM_MOVES):
+        table[:, m] = ud_slice_to_index(ep[:, _MOVE_EP[m]])
+    return table
+
+
+def _g1_edge_table(size: int, unrank, rank) -> np.ndarray:
+    ep = unrank(np.arange(size))
+    table = np.full((size, NUM_MOVES), INVALID, dtype=TABLE_DTYPE)
+    for m in G1_MOVE_INDICES:
+        table[:, m] = rank(ep[:, _MOVE_EP[m]])
+    return table
+
+
+# 座標名 -> (座標のサイズ, 移動表を作る関数)
+COORDINATES = {
+    "co": (3 ** 7, _co_table),
+    "eo": (2 ** 11, _eo_table),
+    "cp": (math.factorial(8), _cp_table),
+    "ud_slice": (len(_SLICE_COMBOS), _ud_slice_table),
+    "slice_perm": (math.factorial(4),
+                   lambda: _g1_edge_table(math.factorial(4), index_to_slice_perm, slice_perm_to_index)),
+    "ud_edge_perm": (math.factorial(8),
+                     lambda: _g1_edge_table(math.factorial(8), index_to_ud_edge_perm, ud_edge_perm_to_index)),
+}
+
+
+def build_move_table(name: str) -> np.ndarray:
+    """
+    座標 name の移動表 (coordinate_size, 18) を作って返す（ディスクには保存しない）。
+    """
+    if name not in COORDINATES:
+        raise KeyError(f"Unknown coordinate: {name}")
+    _, builder = COORDINATES[name]
+    return builder()
+
+
+def save_table(table: np.ndarray, path: str) -> None:
+    """
+    表を .npy で保存する。書きかけのファイルを読まないよう、一時ファイルに書いてから置き換える。
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, table)
+    os.replace(tmp_path, path)
+
+
+def load_or_build(path: str, shape, builder) -> np.ndarray:
+    """
+    path の .npy を mmap で読み込む。無いか形が違う場合は builder() で作って保存する。
+    """
+    if os.path.exists(path):
+        table = np.load(path, mmap_mode="r")
+        if table.shape == tuple(shape):
+            return table
+    save_table(builder(), path)
+    return np.load(path, mmap_mode="r")
+
+
+def load_move_table(name: str, table_dir: Optional[str] = None) -> np.ndarray:
+    """
+    座標 name の移動表を返す。初回は作って保存し、以降は mmap で読み込む。
+    """
+    if name not in COORDINATES:
+        raise KeyError(f"Unknown coordinate: {name}")
+    size, _ = COORDINATES[name]
+    path = os.path.join(table_dir or TABLE_DIR, f"move_{name}.npy")
+    return load_or_build(path, (size, NUM_MOVES), lambda: build_move_table(name))
+
+
+def load_move_tables(table_dir: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    すべての座標の移動表を {座標名: 表} で返す。
+    """
+    return {name: load_move_table(name, table_dir) for name in COORDINATES}
+
+
+# 座標名 -> RubiksCubeState から座標を求める関数
+STATE_COORDINATES = {
+    "co": lambda s: co_to_index(s.co),
+    "eo": lambda s: eo_to_index(s.eo),
+    "cp": lambda s: cp_to_index(s.cp),
+    "ud_slice": lambda s: ud_slice_to_index(s.ep),
+    "slice_perm": lambda s: slice_perm_to_index(s.ep),
+    "ud_edge_perm": lambda s: ud_edge_perm_to_index(s.ep),
+}
+
+
+def state_to_coord(name: str, state) -> int:
+    """
+    RubiksCubeState から座標 name の値を求める。
+    """
+    if name not in STATE_COORDINATES:
+        raise KeyError(f"Unknown coordinate: {name}")
+    return STATE_COORDINATES[name](state)
+
+
+# ------------------------------------------------------------
+# 枝刈り表（座標の組に対する最短手数）
+# ------------------------------------------------------------
+def build_pruning_table(names: Sequence[str], moves: Optional[Sequence[int]] = None,
+                        table_dir: Optional[str] = None) -> np.ndarray:
+    """
+    座標の組 names の直積上で、完成状態からの最短手数を幅優先探索で求めた表を返す。
+    インデックスは names[0] * size(names[1]) * ... + names[-1] の混合基数で、
+    到達できない組は -1 になる。
+
+    引数:
+    - names: 座標名のリスト（例: ['co', 'ud_slice']）
+    - moves: 使う手番号のリスト。None なら 18 手すべて
+    - table_dir: 移動表の保存先
+    """
+    tables = [load_move_table(name, table_dir) for name in names]
+    sizes = [COORDINATES[name][0] for name in names]
+    moves = list(range(NUM_MOVES)) if moves is None else list(moves)
+    dist = np.full(int(np.prod(sizes)), -1, dtype=np.int8)
+    dist[0] = 0
+    frontier = np.array([0], dtype=np.int64)
+    depth = 0
+    while frontier.shape[0]:
+        coords = np.unravel_index(frontier, sizes)
+        children = []
+        for m in moves:
+            children.append(np.ravel_multi_index([t[c, m] for t, c in zip(tables, coords)], sizes))
+        children = np.unique(np.concatenate(children))
+        frontier = children[dist[children] < 0]
+        depth += 1
+        dist[frontier] = depth
+    return dist
+
+
+def load_pruning_table(names: Sequence[str], moves: Optional[Sequence[int]] = None,
+                       table_dir: Optional[str] = None) -> np.ndarray:
+    """
+    build_pruning_table の結果を返す。初回は作って保存し、以降は mmap で読み込む。
+    """
+    if moves is None:
+        suffix = ""
+    elif list(moves) == G1_MOVE_INDICES:
+        suffix = "_g1"
+    else:
+        suffix = "_" + "".join(f"{m:02d}" for m in moves)
+    size = int(np.prod([COORDINATES[name][0] for name in names]))
+    path = os.path.join(table_dir or TABLE_DIR, f"prune_{'_'.join(names)}{suffix}.npy")
+    return load_or_build(path, (size,), lambda: build_pruning_table(names, moves, table_dir))
@@ -0,0 +1,53 @@
+# 座標のランク / アンランクと移動表のテスト
+import random
+
+import numpy as np
+
+import coord
+from batch import MOVE_NAMES
+from operation import SOLVED_STATE, build_moves, scramble2state
+
+
+def test_rank_unrank_round_trip():
+    idx = np.arange(0, 40320, 7)
+    assert np.array_equal(coord.cp_to_index(coord.index_to_cp(idx)), idx)
+    assert np.array_equal(coord.co_to_index(coord.index_to_co(np.arange(2187))), np.arange(2187))
+    assert np.array_equal(coord.eo_to_index(coord.index_to_eo(np.arange(2048))), np.arange(2048))
+    assert np.array_equal(coord.ud_slice_to_index(coord.index_to_ud_slice(np.arange(495))), np.arange(495))
+
+
+def test_solved_is_zero():
+    for name in coord.COORDINATES:
+        assert coord.state_to_coord(name, SOLVED_STATE) == 0
+
+
+def test_move_tables_match_apply_move(tmp_path):
+    moves, _ = build_moves()
+    tables = coord.load_move_tables(str(tmp_path))
+    rng = random.Random(0)
+    for _ in range(20):
+        state = scramble2state(" ".join(rng.choice(MOVE_NAMES) for _ in range(15)))
+        for m, name in enumerate(MOVE_NAMES):
+            child = state.apply_move(moves[name])
+            for cname in ("co", "eo", "cp", "ud_slice"):
+                assert tables[cname][coord.state_to_coord(cname, state), m] == coord.state_to_coord(cname, child)
+
+
+def test_g1_tables(tmp_path):
+    moves, _ = build_moves()
+    rng = random.Random(1)
+    state = scramble2state(" ".join(rng.choice(coord.G1_MOVES) for _ in range(30)))
+    for cname in ("slice_perm", "ud_edge_perm"):
+        table = coord.load_move_table(cname, str(tmp_path))
+        for m, name in enumerate(MOVE_NAMES):
+            got = table[coord.state_to_coord(cname, state), m]
+            if name in coord.G1_MOVES:
+                assert got == coord.state_to_coord(cname, state.apply_move(moves[name]))
+            else:
+                assert got == coord.INVALID
+
+
+def test_tables_are_memory_mapped(tmp_path):
+    coord.load_move_table("co", str(tmp_path))
+    table = coord.load_move_table("co", str(tmp_path))
+    assert isinstance(table, np.memmap)
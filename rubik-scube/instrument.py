@@ -0,0 +1,132 @@
+"""
+探索と手の適用の計測（カウンタ・段ごとのタイマー・深さごとのヒストグラム・フック）。
+
+計測は recording() の with ブロックの中だけ有効になる。
+各モジュールは処理の始めに current() を 1 回だけ呼び、None なら何もしない。
+無効なときのコストは「ローカル変数が None かどうか」の比較だけなので、本番でも入れたままにできる。
+有効な Recorder は ContextVar に持つので、別のスレッドや asyncio のタスクで並行に動く探索の計測は混ざらない
+（スレッドは空のコンテキストで始まるので、recording() はそのスレッドの中で使う）。
+
+    with instrument.recording("solves.jsonl") as rec:
+        two_phase.solve("R U R' U'")
+    print(rec.summary())  # ブロックを抜けると solves.jsonl に JSON を 1 行追記する
+
+カウンタの名前:
+  - move_applications : 手の適用（operation の関数、解の途中の状態の計算など）
+  - node_expansions   : 探索で展開したノード
+  - heuristic_evals   : ヒューリスティック（価値関数）で評価した状態
+  - cache_hits / cache_misses : solution_cache の参照
+"""
+import contextvars
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+_current: "contextvars.ContextVar[Optional[Recorder]]" = contextvars.ContextVar("instrument_recorder", default=None)
+
+
+def current() -> Optional["Recorder"]:
+    """
+    有効な Recorder を返す。計測していなければ None。
+    """
+    return _current.get()
+
+
+class Recorder:
+    """
+    1 回の計測の結果を集める。
+    """
+    def __init__(self, histograms: bool = True, hook: Optional[Callable[["Recorder", str], None]] = None,
+                 hook_every: int = 100_000):
+        """
+        :param histograms: 深さごとのヒストグラムを集める
+        :param hook: hook(recorder, event) を呼ぶ。event は段の終わりなら 'phase:<名前>'、
+                     カウンタが hook_every 増えるごとに 'sample'（サンプリングのプロファイラなどに使う）
+        :param hook_every: 'sample' を呼ぶ間隔（全カウンタの増分の合計）
+        """
+        self.counters: Dict[str, int] = Counter()
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = Counter()
+        self.histograms: Optional[Dict[str, Dict[int, int]]] = defaultdict(Counter) if histograms else None
+        self.hook = hook
+        self.hook_every = hook_every
+        self._next_sample = hook_every
+        self._events = 0
+        self.started = time.perf_counter()
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+        if self.hook is not None:
+            self._events += n
+            if self._events >= self._next_sample:
+                self._next_sample = self._events + self.hook_every
+                self.hook(self, "sample")
+
+    def observe(self, name: str, value: int, n: int = 1) -> None:
+        """
+        ヒストグラム name の value に n を足す（histograms=False なら何もしない）。
+        """
+        if self.histograms is not None:
+            self.histograms[name][int(value)] += n
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.seconds[name] += seconds
+        self.calls[name] += 1
+        if self.hook is not None:
+            self.hook(self, f"phase:{name}")
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        with ブロックの時間を段 name の時間に足す。
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t0)
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        """
+        fn を呼ぶたびにカウンタ name を 1 増やす関数を返す。
+        """
+        def wrapped(*args, **kwargs):
+            self.count(name)
+            return fn(*args, **kwargs)
+        return wrapped
+
+    def summary(self) -> dict:
+        """
+        JSON にできる dict で結果を返す。
+        """
+        summary = {
+            "elapsed": time.perf_counter() - self.started,
+            "counters": dict(self.counters),
+            "phases": {name: {"seconds": self.seconds[name], "calls": self.calls[name]} for name in self.seconds},
+        }
+        if self.histograms is not None:
+            summary["histograms"] = {name: {str(k): v for k, v in sorted(h.items())}
+                                     for name, h in self.histograms.items()}
+        return summary
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), sort_keys=True)
+
+
+@contextmanager
+def recording(path: Optional[str] = None, **kwargs) -> Iterator[Recorder]:
+    """
+    with ブロックの中で計測を有効にする。path を渡すと、抜けるときに summary を JSON で 1 行追記する。
+    kwargs は Recorder に渡す。入れ子にすると内側のブロックの間は内側の Recorder だけに記録する。
+    """
+    recorder = Recorder(**kwargs)
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+        if path is not None:
+            with open(path, "a") as f:
+                f.write(recorder.to_json() + "\n")
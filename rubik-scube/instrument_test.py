@@ -0,0 +1,90 @@
+# 計測のテスト
+import asyncio
+import json
+import threading
+
+import bidirectional
+import bwas
+import instrument
+import solver
+from operation import scramble2state
+from solution_cache import SolutionCache
+
+
+def test_disabled_by_default():
+    assert instrument.current() is None
+    with instrument.recording() as rec:
+        assert instrument.current() is rec
+    assert instrument.current() is None
+
+
+def test_counters_and_json_dump(tmp_path):
+    path = tmp_path / "solves.jsonl"
+    for scramble in ("R U", "F2 D'"):
+        with instrument.recording(str(path)) as rec:
+            result = bidirectional.solve(scramble)
+        assert rec.counters["node_expansions"] == result.nodes
+        assert rec.counters["move_applications"] > 0
+        assert sum(rec.histograms["forward_depth"].values()) > 0
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 2 and all("counters" in line and "phases" in line for line in lines)
+
+
+def test_search_hooks():
+    events = []
+    with instrument.recording(hook=lambda r, event: events.append(event), hook_every=10) as rec:
+        result = bwas.solve("R U F", batch_size=10)
+    assert result.status == "solved"
+    assert rec.counters["heuristic_evals"] > 0
+    assert rec.counters["node_expansions"] == result.nodes
+    assert "sample" in events and "phase:heuristic" in events
+
+    with instrument.recording() as rec:
+        with SolutionCache() as cache:
+            cache.get("R")
+            cache.put("R", ["R'"])
+            cache.get("R")
+    assert rec.counters["cache_hits"] == 1 and rec.counters["cache_misses"] == 1
+
+
+def test_ida_star_histogram(tmp_path):
+    heuristic = solver.CoordinateHeuristic(str(tmp_path))
+    with instrument.recording() as rec:
+        result = solver.solve("R U R' U'", heuristic)
+    assert rec.counters["node_expansions"] == result.nodes
+    assert sum(rec.histograms["ida_depth"].values()) == result.nodes
+
+
+def test_scramble2state_counts_cached_scrambles():
+    with instrument.recording() as rec:
+        scramble2state("R U F")
+        # 2 回目は compile_scramble のキャッシュに当たるが、同じように数える
+        scramble2state("R U F")
+    assert rec.counters["move_applications"] == 6
+
+
+def test_recorders_are_isolated_between_threads_and_tasks():
+    def in_thread(results):
+        with instrument.recording() as rec:
+            bidirectional.solve("R U")
+        results.append(rec.counters["node_expansions"])
+
+    results = []
+    with instrument.recording() as outer:
+        thread = threading.Thread(target=in_thread, args=(results,))
+        thread.start()
+        thread.join()
+    assert results[0] > 0 and "node_expansions" not in outer.counters
+
+    async def task(scramble):
+        with instrument.recording() as rec:
+            await asyncio.sleep(0)
+            bidirectional.solve(scramble)
+            await asyncio.sleep(0)
+        return rec.counters["node_expansions"], bidirectional.solve(scramble).nodes
+
+    async def main():
+        return await asyncio.gather(task("R U"), task("R U F D"))
+
+    for counted, nodes in asyncio.run(main()):
+        assert counted == nodes
@@ -0,0 +1,116 @@
+"""
+手順（build_moves の表記: 'R', 'R2', "R'" など）の状態を、接頭辞ごとに覚えておくトライ木。
+
+手順をたどる途中の各接頭辞の状態をノードに持つので、
+探索の経路のすべての延長や、アルゴリズム集のように接頭辞を共有する手順をまとめて評価するとき、
+共有する部分の手は 1 回しか適用しない。状態は PackedCubeState で持つ。
+
+メモリは max_nodes 個のノードまでに抑え、超えたら最も長く使われていない葉から捨てる。
+ノードを使うときは葉の側から根の側へ順に「最近使った」印を付けるので、
+親は常に子より新しく、最も古いノードは必ず葉になる（枝の途中が先に消えることは無い）。
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import instrument
+from packed import PACKED_SOLVED, PackedCubeState
+
+MoveSequence = Union[str, Sequence[str]]
+
+
+class _Node:
+    __slots__ = ("state", "children", "parent", "move")
+
+    def __init__(self, state: PackedCubeState, parent: Optional["_Node"], move: Optional[str]):
+        self.state = state
+        self.children: Dict[str, "_Node"] = {}
+        self.parent = parent
+        self.move = move
+
+
+class MoveTrie:
+    """
+    接頭辞の状態を覚えて手順を評価するトライ木。
+    """
+    def __init__(self, base: PackedCubeState = PACKED_SOLVED, max_nodes: int = 1_000_000):
+        """
+        :param base: 手順を適用する最初の状態（根の状態）
+        :param max_nodes: 根以外に持つノードの最大数
+        """
+        self.base = base
+        self.max_nodes = max_nodes
+        self._root = _Node(base, None, None)
+        # 根以外のノードを古い順に並べる
+        self._lru: "OrderedDict[_Node, None]" = OrderedDict()
+        self.applied = 0
+        self.reused = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._lru)
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """
+        {'applied': 実際に適用した手の数, 'reused': 覚えていた状態で済んだ手の数, 'evictions': 捨てたノードの数}
+        """
+        return {"applied": self.applied, "reused": self.reused, "evictions": self.evictions}
+
+    def clear(self) -> None:
+        self._root = _Node(self.base, None, None)
+        self._lru.clear()
+
+    def evaluate(self, sequence: MoveSequence) -> PackedCubeState:
+        """
+        base に sequence を適用した状態を返す。途中の状態はすべて覚えておく。
+        知らない手があれば KeyError を送出する。
+        """
+        moves = sequence.split() if isinstance(sequence, str) else sequence
+        node = self._root
+        path = []
+        applied = 0
+        try:
+            for move in moves:
+                child = node.children.get(move)
+                if child is None:
+                    # 知らない手なら木を変える前に apply_move が KeyError を送出する
+                    child = _Node(node.state.apply_move(move), node, move)
+                    node.children[move] = child
+                    applied += 1
+                node = child
+                path.append(node)
+        finally:
+            # 途中で失敗しても、木に付けたノードはすべて LRU に入れて max_nodes の対象にする
+            self.applied += applied
+            self.reused += len(path) - applied
+            rec = instrument.current()
+            if rec is not None:
+                rec.count("move_applications", applied)
+
+            # 葉の側から印を付けて、親が子より新しくなるようにする
+            lru = self._lru
+            for visited in reversed(path):
+                lru[visited] = None
+                lru.move_to_end(visited)
+            self._evict()
+        return node.state
+
+    def evaluate_many(self, sequences: Iterable[MoveSequence]) -> List[PackedCubeState]:
+        """
+        複数の手順の最後の状態をまとめて返す。接頭辞を共有する手順が続くように辞書順に並べてから評価し、
+        結果は入力の順に戻す（評価の途中で共有する枝が捨てられにくくなる）。
+        """
+        sequences = [s.split() if isinstance(s, str) else list(s) for s in sequences]
+        results: List[Optional[PackedCubeState]] = [None] * len(sequences)
+        for i in sorted(range(len(sequences)), key=sequences.__getitem__):
+            results[i] = self.evaluate(sequences[i])
+        return results
+
+    def _evict(self) -> None:
+        lru = self._lru
+        while len(lru) > self.max_nodes:
+            node, _ = lru.popitem(last=False)
+            # 最も古いノードは葉（親は常に子より新しい）
+            del node.parent.children[node.move]
+            node.parent = None
+            self.evictions += 1
@@ -0,0 +1,54 @@
+# 接頭辞を共有するトライ木のテスト
+import random
+
+import pytest
+
+import instrument
+from move_trie import MoveTrie
+from operation import scramble2state
+from packed import MOVE_NAMES, PackedCubeState
+
+
+def test_matches_scramble2state_and_shares_prefixes():
+    rng = random.Random(0)
+    path = [rng.choice(MOVE_NAMES) for _ in range(20)]
+    sequences = [path + [m] for m in MOVE_NAMES] + [" ".join(path[:5]), path[:10]]
+    trie = MoveTrie()
+    with instrument.recording() as rec:
+        states = trie.evaluate_many(sequences)
+    for sequence, state in zip(sequences, states):
+        scramble = sequence if isinstance(sequence, str) else " ".join(sequence)
+        assert state == PackedCubeState.from_state(scramble2state(scramble))
+    # 共有する 20 手は 1 回だけ適用する
+    assert trie.counters["applied"] == 20 + len(MOVE_NAMES)
+    assert rec.counters["move_applications"] == trie.counters["applied"]
+    assert len(trie) == 20 + len(MOVE_NAMES)
+    with pytest.raises(KeyError):
+        trie.evaluate("R Q")
+
+
+def test_failed_evaluate_keeps_nodes_counted():
+    trie = MoveTrie(max_nodes=2)
+    with pytest.raises(KeyError):
+        trie.evaluate("R U Q")
+    # 失敗する前に作った R と R U は木に残り、LRU と max_nodes の対象になる
+    assert len(trie) == 2
+    trie.evaluate("F")
+    assert len(trie) == 2 and trie.counters["evictions"] == 1
+
+
+def test_evicts_cold_leaves_first():
+    trie = MoveTrie(max_nodes=6)
+    trie.evaluate("R U F")
+    trie.evaluate("L D B")
+    assert len(trie) == 6
+    # R U F の枝を使い直してから新しい枝を足すと、古い L D B の葉から消える
+    trie.evaluate("R U F")
+    trie.evaluate("R U F2")
+    assert len(trie) == 6 and trie.counters["evictions"] == 1
+    applied = trie.counters["applied"]
+    trie.evaluate("L D")
+    assert trie.counters["applied"] == applied
+    trie.evaluate("L D B")
+    assert trie.counters["applied"] == applied + 1
+    assert trie.evaluate("R U F2") == PackedCubeState.from_state(scramble2state("R U F2"))
@@ -1,5 +1,7 @@
 from state import RubiksCubeState
-from typing import Tuple, Dict, List, Optional
+from functools import lru_cache
+from instrument import current
+from typing import Tuple, Dict, List, Optional, Sequence
 
 # 完成状態
 SOLVED_STATE = RubiksCubeState(
@@ -56,16 +58,32 @@ def build_moves() -> Tuple[Dict[str, RubiksCubeState], List[str]]:
     return moves, move_names
 
 
+@lru_cache(maxsize=1)
+def _cached_moves() -> Tuple[Dict[str, RubiksCubeState], List[str]]:
+    return build_moves()
+
+
+def get_moves() -> Tuple[Dict[str, RubiksCubeState], List[str]]:
+    """
+    build_moves() の結果をモジュール内で 1 回だけ作って共有したものを返す。
+    共有しているので、返り値の state を書き換えないこと。
+    """
+    return _cached_moves()
+
+
 def apply_single_move(state: RubiksCubeState, move_name: str, moves: Optional[Dict[str, RubiksCubeState]] = None) -> RubiksCubeState:
     """
     指定した1手を state に適用して新しい state を返す。
-    moves を渡さなければ内部で build_moves() を呼ぶ。
+    moves を渡さなければキャッシュ済みの get_moves() を使う。
     """
     if moves is None:
-        moves, _ = build_moves()
+        moves, _ = get_moves()
     if move_name not in moves:
         raise KeyError(f"Unknown move name: {move_name}")
     move_state = moves[move_name]
+    rec = current()
+    if rec is not None:
+        rec.count("move_applications")
     return state.apply_move(move_state)
 
 
@@ -73,15 +91,20 @@ def scramble2state(scramble: str, base_state: Optional[RubiksCubeState] = None,
     """
     スクランブル文字列（例: "R U R' U'"）を base_state に適用した state を返す。
     空文字列を渡すと base_state をそのまま返す。
+    moves を渡さなければ compile_scramble() で 1 つの操作に合成してから 1 回だけ適用する。
     """
     if base_state is None:
         base_state = SOLVED_STATE
-    if moves is None:
-        moves, _ = build_moves()
 
     state = base_state
     if scramble.strip() == "":
         return state
+    rec = current()
+    if moves is None:
+        if rec is not None:
+            # compile_scramble はキャッシュされるので、キャッシュに当たった呼び出しも数えられるようここで数える
+            rec.count("move_applications", len(simplify_scramble(scramble)))
+        return base_state.apply_move(compile_scramble(scramble))
 
     for move_name in scramble.split():
         if move_name == "":
@@ -89,12 +112,98 @@ def scramble2state(scramble: str, base_state: Optional[RubiksCubeState] = None,
         if move_name not in moves:
             raise KeyError(f"Unknown move in scramble: {move_name}")
         state = state.apply_move(moves[move_name])
+        if rec is not None:
+            rec.count("move_applications")
     return state
 
 # 互換性のための旧関数名エイリアス（typo の修正）
 scamble2state = scramble2state
 
 
+# 面の順番。build_moves() と同じで、向かい合う面は index // 2 が同じになる
+FACES = ['U', 'D', 'L', 'R', 'F', 'B']
+_SUFFIX_TURNS = {'': 1, '2': 2, "'": 3}
+_TURN_SUFFIX = {1: '', 2: '2', 3: "'"}
+
+
+def _parse_move(move_name: str) -> Tuple[int, int]:
+    """
+    'R2' などの手を (面の番号, 90 度回転の回数) に変換する。
+    """
+    face, suffix = move_name[:1], move_name[1:]
+    if face not in FACES or suffix not in _SUFFIX_TURNS:
+        raise KeyError(f"Unknown move in scramble: {move_name}")
+    return FACES.index(face), _SUFFIX_TURNS[suffix]
+
+
+def simplify_scramble(scramble: str) -> List[str]:
+    """
+    スクランブルを同じ状態になる短い手順に簡約する。
+    - 同じ面の連続はまとめる（R R -> R2, U U' -> 消える）
+    - 向かい合う面は可換なので、間に挟まった同じ面もまとめる（U D U -> U2 D）
+    - 向かい合う面の並びは FACES の順にそろえる（D U -> U D）
+    """
+    # [面の番号, 回転数] のスタック
+    stack: List[List[int]] = []
+    for move_name in scramble.split():
+        face, turns = _parse_move(move_name)
+        target = None
+        if stack and stack[-1][0] == face:
+            target = len(stack) - 1
+        elif stack and stack[-1][0] // 2 == face // 2 and len(stack) >= 2 and stack[-2][0] == face:
+            target = len(stack) - 2
+        if target is not None:
+            stack[target][1] = (stack[target][1] + turns) % 4
+            if stack[target][1] == 0:
+                del stack[target]
+        elif stack and stack[-1][0] // 2 == face // 2 and face < stack[-1][0]:
+            stack.insert(len(stack) - 1, [face, turns])
+        else:
+            stack.append([face, turns])
+    return [FACES[face] + _TURN_SUFFIX[turns] for face, turns in stack]
+
+
+@lru_cache(maxsize=4096)
+def compile_scramble(scramble: str) -> RubiksCubeState:
+    """
+    スクランブルを簡約し、1 つの操作（state）に合成して返す。
+    base_state.apply_move(compile_scramble(s)) は scramble2state(s, base_state) と同じ結果になる。
+    結果は LRU キャッシュで共有しているので、返り値を書き換えないこと。
+    """
+    moves, _ = get_moves()
+    state = SOLVED_STATE
+    simplified = simplify_scramble(scramble)
+    for move_name in simplified:
+        state = state.apply_move(moves[move_name])
+    return state
+
+
+def scrambles2states(scrambles: Sequence[str], base_state: Optional[RubiksCubeState] = None) -> List[RubiksCubeState]:
+    """
+    複数のスクランブルをまとめて base_state に適用し、state のリストを返す。
+    簡約した手順を batch の配列演算で全スクランブルに 1 手ずつ同時に適用する。
+    """
+    # batch は build_moves を使うため、循環 import にならないようここで読み込む
+    import numpy as np
+    from batch import MOVE_INDEX, BatchCubeState, apply_move_array
+
+    if base_state is None:
+        base_state = SOLVED_STATE
+    sequences = [[MOVE_INDEX[m] for m in simplify_scramble(s)] for s in scrambles]
+    lengths = np.array([len(seq) for seq in sequences], dtype=np.intp)
+    padded = np.zeros((len(sequences), int(lengths.max(initial=0))), dtype=np.intp)
+    for i, seq in enumerate(sequences):
+        padded[i, :len(seq)] = seq
+    states = BatchCubeState.from_states([base_state] * len(sequences)).array
+    for step in range(padded.shape[1]):
+        active = np.flatnonzero(lengths > step)
+        states[active] = apply_move_array(states[active], padded[active, step])
+    rec = current()
+    if rec is not None:
+        rec.count("move_applications", int(lengths.sum()))
+    return BatchCubeState(states).to_states()
+
+
 if __name__ == '__main__':
     # スクリプトとして実行したときのデモ
     moves, move_names = build_moves()
@@ -0,0 +1,54 @@
+# 手の適用とスクランブルの簡約・合成のテスト
+import random
+
+import pytest
+
+from operation import (SOLVED_STATE, build_moves, compile_scramble, scramble2state, scrambles2states,
+                       simplify_scramble)
+
+
+def _apply_one_by_one(scramble, base):
+    moves, _ = build_moves()
+    state = base
+    for name in scramble.split():
+        state = state.apply_move(moves[name])
+    return state
+
+
+def _as_tuple(state):
+    return (list(state.cp), list(state.co), list(state.ep), list(state.eo))
+
+
+@pytest.mark.parametrize("scramble, expected", [
+    ("R R", ["R2"]),
+    ("U U'", []),
+    ("R U U' R'", []),
+    ("D U", ["U", "D"]),
+    ("U D U", ["U2", "D"]),
+    ("R U D U' R'", ["R", "D", "R'"]),
+    ("F2 F2 B", ["B"]),
+])
+def test_simplify(scramble, expected):
+    assert simplify_scramble(scramble) == expected
+
+
+def test_compiled_matches_move_by_move():
+    rng = random.Random(0)
+    _, names = build_moves()
+    base = scramble2state("R U F' L2")
+    for _ in range(20):
+        scramble = " ".join(rng.choice(names) for _ in range(rng.randrange(0, 40)))
+        want = _as_tuple(_apply_one_by_one(scramble, base))
+        assert _as_tuple(scramble2state(scramble, base)) == want
+        assert _as_tuple(base.apply_move(compile_scramble(scramble))) == want
+
+
+def test_batched_scrambles():
+    scrambles = ["", "R", "R U R' U'", "F2 B2 L D' D' U"]
+    states = scrambles2states(scrambles)
+    assert [_as_tuple(s) for s in states] == [_as_tuple(_apply_one_by_one(s, SOLVED_STATE)) for s in scrambles]
+
+
+def test_unknown_move():
+    with pytest.raises(KeyError):
+        scramble2state("R X")
@@ -0,0 +1,198 @@
+"""
+ルービックキューブの状態を 2 つの整数に詰めた、不変でハッシュ可能な表現。
+
+  - corners: 8 個のコーナーを 5 bit ずつ（cp 3 bit + co 2 bit）= 40 bit
+  - edges  : 12 個のエッジを 5 bit ずつ（ep 4 bit + eo 1 bit）= 60 bit
+
+位置 i の情報は下位から 5 * i bit 目に置く。
+corners も edges も 64 bit に収まり、両方を合わせた key（100 bit の整数）で O(1) のハッシュと比較ができる。
+何千万もの状態を set / dict に入れるときは、PackedCubeState ではなく key を入れるとさらに小さくなる。
+PackedCubeState は (corners, edges) の tuple のサブクラスなので、不変で __dict__ も持たない。
+"""
+from operator import itemgetter
+from typing import Dict, List, Sequence, Tuple, Union
+
+from state import RubiksCubeState
+from operation import build_moves
+
+FIELD_BITS = 5
+FIELD_MASK = (1 << FIELD_BITS) - 1
+CORNER_BITS = 8 * FIELD_BITS
+EDGE_BITS = 12 * FIELD_BITS
+KEY_BYTES = (CORNER_BITS + EDGE_BITS + 7) // 8
+
+
+def _pack(perm: Sequence[int], ori: Sequence[int], perm_bits: int) -> int:
+    value = 0
+    for i, (p, o) in enumerate(zip(perm, ori)):
+        value |= (p | (o << perm_bits)) << (FIELD_BITS * i)
+    return value
+
+
+def _unpack(value: int, n: int, perm_bits: int) -> Tuple[List[int], List[int]]:
+    perm = []
+    ori = []
+    perm_mask = (1 << perm_bits) - 1
+    for i in range(n):
+        field = (value >> (FIELD_BITS * i)) & FIELD_MASK
+        perm.append(field & perm_mask)
+        ori.append(field >> perm_bits)
+    return perm, ori
+
+
+class PackedCubeState(tuple):
+    """
+    corners / edges の 2 つの整数で表した不変のキューブの状態。
+    (corners, edges) の tuple なので、ハッシュと比較は tuple の C 実装がそのまま使われる。
+    """
+    __slots__ = ()
+
+    def __new__(cls, corners: int, edges: int):
+        """
+        :param corners: コーナー 8 個を 5 bit ずつ詰めた整数
+        :param edges: エッジ 12 個を 5 bit ずつ詰めた整数
+        """
+        return tuple.__new__(cls, (corners, edges))
+
+    corners = property(itemgetter(0))
+    edges = property(itemgetter(1))
+
+    @classmethod
+    def from_lists(cls, cp: Sequence[int], co: Sequence[int], ep: Sequence[int], eo: Sequence[int]
+                   ) -> "PackedCubeState":
+        return cls(_pack(cp, co, 3), _pack(ep, eo, 4))
+
+    @classmethod
+    def from_state(cls, state: RubiksCubeState) -> "PackedCubeState":
+        """
+        RubiksCubeState（リスト表現）から変換する。
+        """
+        return cls.from_lists(state.cp, state.co, state.ep, state.eo)
+
+    @classmethod
+    def from_key(cls, key: int) -> "PackedCubeState":
+        """
+        key から復元する。
+        """
+        return cls(key & ((1 << CORNER_BITS) - 1), key >> CORNER_BITS)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PackedCubeState":
+        """
+        to_bytes の逆変換。
+        """
+        return cls.from_key(int.from_bytes(data, "big"))
+
+    def to_state(self) -> RubiksCubeState:
+        """
+        RubiksCubeState（リスト表現）に戻す。
+        """
+        cp, co = _unpack(self.corners, 8, 3)
+        ep, eo = _unpack(self.edges, 12, 4)
+        return RubiksCubeState(cp, co, ep, eo)
+
+    @property
+    def key(self) -> int:
+        """
+        corners と edges を合わせた 100 bit の整数。
+        """
+        return self.corners | (self.edges << CORNER_BITS)
+
+    def to_bytes(self) -> bytes:
+        """
+        key を 13 バイトのビッグエンディアンで返す（ディスクに保存するキー向け）。
+        """
+        return self.key.to_bytes(KEY_BYTES, "big")
+
+    @property
+    def cp(self) -> List[int]:
+        return _unpack(self.corners, 8, 3)[0]
+
+    @property
+    def co(self) -> List[int]:
+        return _unpack(self.corners, 8, 3)[1]
+
+    @property
+    def ep(self) -> List[int]:
+        return _unpack(self.edges, 12, 4)[0]
+
+    @property
+    def eo(self) -> List[int]:
+        return _unpack(self.edges, 12, 4)[1]
+
+    def __repr__(self):
+        return f"PackedCubeState(cp={self.cp}, co={self.co}, ep={self.ep}, eo={self.eo})"
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    def apply_move(self, move: Union["PackedCubeState", str]) -> "PackedCubeState":
+        """
+        操作を適用し、新しい状態を返す。リストに戻さず、詰めた整数のまま計算する。
+        move には PackedCubeState か手の名前（'R' など）を渡せる。
+        """
+        if isinstance(move, str):
+            if move not in _NAMED_OPS:
+                raise KeyError(f"Unknown move name: {move}")
+            corner_keep, corner_ops, edge_keep, edge_ops = _NAMED_OPS[move]
+        else:
+            corner_keep, corner_ops, edge_keep, edge_ops = _move_ops(move)
+        c, e = self
+        # 動かない位置はマスクでそのまま写し、動く位置だけ表を引く
+        corners = c & corner_keep
+        for shift, table in corner_ops:
+            corners |= table[(c >> shift) & FIELD_MASK]
+        edges = e & edge_keep
+        for shift, table in edge_ops:
+            edges |= table[(e >> shift) & FIELD_MASK]
+        return tuple.__new__(PackedCubeState, (corners, edges))
+
+
+def _field_ops(perm: Sequence[int], ori: Sequence[int], perm_bits: int, base: int) -> Tuple[int, tuple]:
+    """
+    (動かない位置をそのまま写すマスク, 動く位置ごとの操作) を作る。
+    動く位置 i の操作は (元の位置 perm[i] のフィールドを取り出すシフト量,
+    元のフィールド値 -> 向きを足して位置 i にシフトした値 の表)。
+    new_perm[i] = perm_src[perm[i]], new_ori[i] = (ori_src[perm[i]] + ori[i]) % base
+    """
+    keep = 0
+    ops = []
+    perm_mask = (1 << perm_bits) - 1
+    for i, (p, o) in enumerate(zip(perm, ori)):
+        if p == i and o == 0:
+            keep |= FIELD_MASK << (FIELD_BITS * i)
+            continue
+        table = []
+        for field in range(1 << FIELD_BITS):
+            piece = field & perm_mask
+            twist = ((field >> perm_bits) + o) % base
+            table.append((piece | (twist << perm_bits)) << (FIELD_BITS * i))
+        ops.append((FIELD_BITS * p, table))
+    return keep, tuple(ops)
+
+
+_OPS_CACHE: Dict[PackedCubeState, Tuple[int, tuple, int, tuple]] = {}
+
+
+def _move_ops(move: PackedCubeState) -> Tuple[int, tuple, int, tuple]:
+    """
+    move を適用するための表を返す（同じ move については 1 回だけ作る）。
+    """
+    ops = _OPS_CACHE.get(move)
+    if ops is None:
+        cp, co = _unpack(move.corners, 8, 3)
+        ep, eo = _unpack(move.edges, 12, 4)
+        ops = _field_ops(cp, co, 3, 3) + _field_ops(ep, eo, 4, 2)
+        if len(_OPS_CACHE) < 4096:
+            _OPS_CACHE[move] = ops
+    return ops
+
+
+def _build_packed_moves() -> Tuple[Dict[str, PackedCubeState], List[str]]:
+    moves, move_names = build_moves()
+    return {name: PackedCubeState.from_state(moves[name]) for name in move_names}, move_names
+
+
+PACKED_MOVES, MOVE_NAMES = _build_packed_moves()
+_NAMED_OPS = {name: _move_ops(move) for name, move in PACKED_MOVES.items()}
+PACKED_SOLVED = PackedCubeState.from_lists(range(8), [0] * 8, range(12), [0] * 12)
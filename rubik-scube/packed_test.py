@@ -0,0 +1,46 @@
+# 詰めた整数表現の状態のテスト
+import pickle
+import random
+
+import pytest
+
+from operation import build_moves, scramble2state
+from packed import MOVE_NAMES, PACKED_MOVES, PACKED_SOLVED, PackedCubeState
+
+
+def _random_state(rng, length=20):
+    return scramble2state(" ".join(rng.choice(MOVE_NAMES) for _ in range(length)))
+
+
+def test_round_trip():
+    rng = random.Random(0)
+    for _ in range(20):
+        state = _random_state(rng)
+        packed = PackedCubeState.from_state(state)
+        back = packed.to_state()
+        assert (back.cp, back.co, back.ep, back.eo) == (state.cp, state.co, state.ep, state.eo)
+        assert PackedCubeState.from_key(packed.key) == packed
+        assert PackedCubeState.from_bytes(packed.to_bytes()) == packed
+        assert pickle.loads(pickle.dumps(packed)) == packed
+
+
+def test_apply_move_matches_list_form():
+    moves, _ = build_moves()
+    rng = random.Random(1)
+    for _ in range(20):
+        state = _random_state(rng)
+        packed = PackedCubeState.from_state(state)
+        for name in MOVE_NAMES:
+            assert packed.apply_move(name) == PackedCubeState.from_state(state.apply_move(moves[name]))
+        # 任意の状態を操作として合成することもできる
+        other = _random_state(rng)
+        assert packed.apply_move(PackedCubeState.from_state(other)) == \
+            PackedCubeState.from_state(state.apply_move(other))
+
+
+def test_hash_and_immutability():
+    a = PACKED_SOLVED.apply_move("R").apply_move("R'")
+    assert a == PACKED_SOLVED and hash(a) == hash(PACKED_SOLVED)
+    assert len({PACKED_SOLVED, a, PACKED_MOVES["U"]}) == 2
+    with pytest.raises(AttributeError):
+        a.corners = 0
@@ -0,0 +1,371 @@
+"""
+パターンデータベース（PDB）による許容的なヒューリスティック。
+
+一部のピース（コーナー全部、エッジ 6〜7 本など）の位置と向きだけに注目し、
+SOLVED_STATE からの最短手数を幅優先探索で全状態について求めて表にする。
+どのピースの部分集合の手数も実際の手数以下なので、max を取っても許容的になる。
+
+表は 1 状態 4 bit（ニブル）で詰めて保存し、mmap で読み込む。
+複数のソルバープロセスがページキャッシュ上の同じコピーを共有できる。
+
+表の構築は層ごとに全体を走査する幅優先探索で行う。
+  - 深さ d の状態を探して子を作る処理はプロセスプールで並列に行う
+  - 書き込みはメインプロセスだけが行う
+  - 1 層終わるごとにメタ情報（完了した深さ）を保存するので、中断しても再開できる
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch import NUM_MOVES, _GATHER, _ADD, CP, CO, EP, EO
+from coord import TABLE_DIR
+
+# 未訪問を表すニブル値
+UNVISITED = 0xF
+# 1 回に走査する表のバイト数（= 2 倍の状態数）
+DEFAULT_CHUNK_BYTES = 1 << 17
+
+
+def _inverse(perm: np.ndarray) -> np.ndarray:
+    inv = np.empty_like(perm)
+    inv[perm] = np.arange(perm.shape[0])
+    return inv
+
+
+class PatternSpec:
+    """
+    パターンデータベースが注目するピースの集合。
+    """
+    def __init__(self, name: str, kind: str, pieces: Sequence[int]):
+        """
+        :param name: 表の名前（ファイル名に使う）
+        :param kind: 'corner' または 'edge'
+        :param pieces: 注目するピース番号のリスト
+        """
+        if kind not in ("corner", "edge"):
+            raise ValueError(f"kind は 'corner' か 'edge' である必要があります: {kind}")
+        self.name = name
+        self.kind = kind
+        self.pieces = tuple(pieces)
+        self.n_positions = 8 if kind == "corner" else 12
+        self.base = 3 if kind == "corner" else 2
+        # 全ピースを含む場合、最後のピースの向きは他から決まる
+        self.n_free_ori = len(self.pieces) - 1 if len(self.pieces) == self.n_positions else len(self.pieces)
+        self.perm_size = math.perm(self.n_positions, len(self.pieces))
+        self.ori_size = self.base ** self.n_free_ori
+        self.size = self.perm_size * self.ori_size
+
+        k = len(self.pieces)
+        n = self.n_positions
+        self._perm_weights = np.array([math.perm(n - 1 - i, k - 1 - i) for i in range(k)], dtype=np.int64)
+        self._ori_weights = self.base ** np.arange(self.n_free_ori - 1, -1, -1, dtype=np.int64)
+
+        # ピースが位置 p にあるとき、手 m の後の位置 dest[m, p] と向きの加算値 twist[m, p]
+        perm_cols = CP if kind == "corner" else EP
+        ori_cols = CO if kind == "corner" else EO
+        self._dest = np.stack([_inverse(_GATHER[m, perm_cols] - perm_cols.start) for m in range(NUM_MOVES)])
+        self._twist = np.stack([_ADD[m, ori_cols][self._dest[m]] for m in range(NUM_MOVES)]).astype(np.int64)
+
+    def __repr__(self):
+        return f"PatternSpec({self.name!r}, {self.kind!r}, {self.pieces})"
+
+    def rank(self, pos: np.ndarray, ori: np.ndarray) -> np.ndarray:
+        """
+        ピースの位置 (N, k) と向き (N, k) を表のインデックスに変換する。
+        """
+        k = pos.shape[1]
+        smaller_before = (pos[:, None, :] < pos[:, :, None]) & np.tril(np.ones((k, k), dtype=bool), -1)
+        digits = pos - smaller_before.sum(axis=2)
+        ori_rank = ori[:, :self.n_free_ori] @ self._ori_weights
+        return (digits @ self._perm_weights) * self.ori_size + ori_rank
+
+    def unrank(self, index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        rank の逆変換。(pos, ori) を返す。
+        """
+        index = np.asarray(index, dtype=np.int64)
+        perm_rank, ori_rank = np.divmod(index, self.ori_size)
+        k = len(self.pieces)
+        rows = np.arange(index.shape[0])
+        available = np.ones((index.shape[0], self.n_positions), dtype=bool)
+        pos = np.empty((index.shape[0], k), dtype=np.int64)
+        for i in range(k):
+            digit, perm_rank = np.divmod(perm_rank, self._perm_weights[i])
+            choice = np.argmax((np.cumsum(available, axis=1) == digit[:, None] + 1) & available, axis=1)
+            pos[:, i] = choice
+            available[rows, choice] = False
+        ori = np.empty((index.shape[0], k), dtype=np.int64)
+        ori[:, :self.n_free_ori] = (ori_rank[:, None] // self._ori_weights) % self.base
+        if self.n_free_ori < k:
+            ori[:, -1] = (-ori[:, :-1].sum(axis=1)) % self.base
+        return pos, ori
+
+    def children(self, index: np.ndarray) -> np.ndarray:
+        """
+        インデックス (N,) の各状態に 18 手を適用した子のインデックス (N * 18,) を返す。
+        """
+        pos, ori = self.unrank(index)
+        out = []
+        for m in range(NUM_MOVES):
+            out.append(self.rank(self._dest[m][pos], (ori + self._twist[m][pos]) % self.base))
+        return np.concatenate(out)
+
+    def state_index(self, state) -> int:
+        """
+        RubiksCubeState から表のインデックスを求める。
+        """
+        perm = state.cp if self.kind == "corner" else state.ep
+        ori = state.co if self.kind == "corner" else state.eo
+        where = {piece: p for p, piece in enumerate(perm)}
+        pos = np.array([[where[piece] for piece in self.pieces]], dtype=np.int64)
+        return int(self.rank(pos, np.array([[ori[p] for p in pos[0]]], dtype=np.int64))[0])
+
+    def batch_index(self, states: np.ndarray) -> np.ndarray:
+        """
+        batch の (N, 40) 状態配列から表のインデックス (N,) を求める。
+        """
+        perm = states[:, CP if self.kind == "corner" else EP].astype(np.int64)
+        ori = states[:, CO if self.kind == "corner" else EO].astype(np.int64)
+        pos = np.stack([np.argmax(perm == piece, axis=1) for piece in self.pieces], axis=1)
+        return self.rank(pos, np.take_along_axis(ori, pos, axis=1))
+
+
+# 標準のパターン
+CORNERS = PatternSpec("corners", "corner", range(8))
+EDGES_A = PatternSpec("edges_a", "edge", range(0, 6))
+EDGES_B = PatternSpec("edges_b", "edge", range(6, 12))
+# メモリに余裕があるときの 7 本版（1 表あたり約 255MB）
+EDGES7_A = PatternSpec("edges7_a", "edge", range(0, 7))
+EDGES7_B = PatternSpec("edges7_b", "edge", range(5, 12))
+STANDARD_SPECS = {spec.name: spec for spec in (CORNERS, EDGES_A, EDGES_B, EDGES7_A, EDGES7_B)}
+
+
+# ------------------------------------------------------------
+# ニブル表の読み書き
+# ------------------------------------------------------------
+def read_nibbles(table: np.ndarray, index: np.ndarray) -> np.ndarray:
+    """
+    ニブル表から index (N,) の値を読む。
+    """
+    index = np.asarray(index, dtype=np.int64)
+    return (table[index >> 1] >> ((index & 1) << 2).astype(np.uint8)) & 0xF
+
+
+def write_nibbles(table: np.ndarray, index: np.ndarray, value: int) -> None:
+    """
+    ニブル表の index (N,)（重複なし） に value を書く。
+    同じバイトの上位・下位を同時に書かないよう、偶数と奇数に分けて書く。
+    """
+    for odd in (0, 1):
+        idx = index[(index & 1) == odd] >> 1
+        if odd:
+            table[idx] = (table[idx] & 0x0F) | np.uint8(value << 4)
+        else:
+            table[idx] = (table[idx] & 0xF0) | np.uint8(value)
+
+
+def _meta_path(path: str) -> str:
+    return path + ".json"
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    if not os.path.exists(_meta_path(path)):
+        return None
+    with open(_meta_path(path)) as f:
+        return json.load(f)
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    tmp_path = _meta_path(path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(path))
+
+
+# ------------------------------------------------------------
+# 構築
+# ------------------------------------------------------------
+_worker_spec = None
+_worker_table = None
+
+
+def _init_worker(spec: PatternSpec, path: str) -> None:
+    global _worker_spec, _worker_table
+    _worker_spec = spec
+    _worker_table = np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def _expand_chunk(args) -> np.ndarray:
+    """
+    表の [start, stop) バイトにある深さ depth の状態を展開し、
+    まだ未訪問の子のインデックスを重複なしで返す。
+    """
+    start, stop, depth = args
+    chunk = _worker_table[start:stop]
+    values = np.empty(2 * chunk.shape[0], dtype=np.uint8)
+    values[0::2] = chunk & 0xF
+    values[1::2] = chunk >> 4
+    frontier = np.flatnonzero(values == depth) + 2 * start
+    frontier = frontier[frontier < _worker_spec.size]
+    if frontier.shape[0] == 0:
+        return frontier
+    children = _worker_spec.children(frontier)
+    children = children[read_nibbles(_worker_table, children) == UNVISITED]
+    return np.unique(children)
+
+
+def build_pattern_database(spec: PatternSpec, path: Optional[str] = None, processes: Optional[int] = None,
+                           chunk_bytes: int = DEFAULT_CHUNK_BYTES, max_depth: Optional[int] = None,
+                           verbose: bool = False) -> str:
+    """
+    spec のパターンデータベースを構築して path に保存し、path を返す。
+
+    引数:
+    - spec: 注目するピースの集合
+    - path: 保存先。None なら TABLE_DIR/pdb_<name>.bin
+    - processes: 並列数。None なら CPU コア数
+    - chunk_bytes: 1 タスクが走査する表のバイト数
+    - max_depth: この深さまで進めたら（未完成でも）中断する。再度呼ぶと続きから再開する
+    - verbose: 層ごとの状態数を表示する
+    """
+    if path is None:
+        path = os.path.join(TABLE_DIR, f"pdb_{spec.name}.bin")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    n_bytes = (spec.size + 1) // 2
+    meta = _read_meta(path)
+    if meta is not None and (meta["spec"] != spec.name or meta["size"] != spec.size):
+        meta = None
+    if meta is not None and meta["complete"]:
+        return path
+
+    if meta is None or not os.path.exists(path):
+        # 新規に作る: 全て未訪問で初期化し、完成状態を深さ 0 にする
+        table = np.memmap(path, dtype=np.uint8, mode="w+", shape=(n_bytes,))
+        table[:] = 0xFF
+        solved_pos = np.array([spec.pieces], dtype=np.int64)
+        write_nibbles(table, spec.rank(solved_pos, np.zeros_like(solved_pos)), 0)
+        table.flush()
+        meta = {"spec": spec.name, "size": spec.size, "depth": 0, "complete": False, "histogram": [1]}
+        _write_meta(path, meta)
+    else:
+        table = np.memmap(path, dtype=np.uint8, mode="r+", shape=(n_bytes,))
+
+    processes = processes or os.cpu_count() or 1
+    pool = multiprocessing.Pool(processes, _init_worker, (spec, path)) if processes > 1 else None
+    if pool is None:
+        _init_worker(spec, path)
+    try:
+        while not meta["complete"]:
+            depth = meta["depth"]
+            if max_depth is not None and depth >= max_depth:
+                break
+            if depth + 1 >= UNVISITED:
+                raise ValueError("深さが 4 bit に収まりません")
+            tasks = [(start, min(start + chunk_bytes, n_bytes), depth) for start in range(0, n_bytes, chunk_bytes)]
+            results = pool.imap_unordered(_expand_chunk, tasks) if pool else map(_expand_chunk, tasks)
+            count = 0
+            for children in results:
+                if children.shape[0] == 0:
+                    continue
+                # 他のチャンクで既に書いた子を除いてから書く
+                children = children[read_nibbles(table, children) == UNVISITED]
+                write_nibbles(table, children, depth + 1)
+                count += children.shape[0]
+            table.flush()
+            meta["depth"] = depth + 1
+            meta["histogram"] = meta["histogram"][:depth + 1] + [count]
+            if count == 0:
+                meta["histogram"].pop()
+                meta["complete"] = True
+            _write_meta(path, meta)
+            if verbose:
+                print(f"{spec.name}: depth {depth + 1}: {count} states")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return path
+
+
+# ------------------------------------------------------------
+# 読み込みとヒューリスティック
+# ------------------------------------------------------------
+class PatternDatabase:
+    """
+    mmap で読み込んだパターンデータベース。
+    """
+    def __init__(self, spec: PatternSpec, path: str):
+        meta = _read_meta(path)
+        if meta is None or not meta["complete"]:
+            raise ValueError(f"パターンデータベースが未完成です: {path}")
+        self.spec = spec
+        self.path = path
+        self.table = np.memmap(path, dtype=np.uint8, mode="r")
+        self.histogram = meta["histogram"]
+
+    def lookup(self, state) -> int:
+        """
+        RubiksCubeState の下界（手数）を返す。
+        """
+        index = self.spec.state_index(state)
+        return (int(self.table[index >> 1]) >> ((index & 1) * 4)) & 0xF
+
+    def lookup_batch(self, states: np.ndarray) -> np.ndarray:
+        """
+        (N, 40) の状態配列の下界 (N,) を返す。
+        """
+        return read_nibbles(self.table, self.spec.batch_index(states))
+
+
+def load_pattern_database(spec: PatternSpec, path: Optional[str] = None) -> PatternDatabase:
+    """
+    構築済みのパターンデータベースを mmap で読み込む。
+    """
+    if path is None:
+        path = os.path.join(TABLE_DIR, f"pdb_{spec.name}.bin")
+    return PatternDatabase(spec, path)
+
+
+class PatternHeuristic:
+    """
+    複数のパターンデータベースの max を取るヒューリスティック。
+    """
+    def __init__(self, databases: Iterable[PatternDatabase]):
+        self.databases = list(databases)
+
+    def __call__(self, state) -> int:
+        return max(db.lookup(state) for db in self.databases)
+
+    def batch(self, states: np.ndarray) -> np.ndarray:
+        return np.max([db.lookup_batch(states) for db in self.databases], axis=0)
+
+
+def load_heuristic(names: Sequence[str] = ("corners", "edges_a", "edges_b"),
+                   table_dir: Optional[str] = None) -> PatternHeuristic:
+    """
+    標準のパターンデータベースを読み込んでヒューリスティックを作る。
+    """
+    table_dir = table_dir or TABLE_DIR
+    return PatternHeuristic(
+        load_pattern_database(STANDARD_SPECS[name], os.path.join(table_dir, f"pdb_{name}.bin")) for name in names
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="パターンデータベースを構築する")
+    parser.add_argument("names", nargs="*", default=["corners", "edges_a", "edges_b"],
+                        help=f"構築する表の名前 {sorted(STANDARD_SPECS)}")
+    parser.add_argument("--processes", "-p", type=int, default=None, help="並列数（デフォルトは CPU コア数）")
+    parser.add_argument("--table-dir", default=TABLE_DIR, help="保存先のディレクトリ")
+    args = parser.parse_args()
+
+    for name in args.names:
+        spec = STANDARD_SPECS[name]
+        path = os.path.join(args.table_dir, f"pdb_{name}.bin")
+        build_pattern_database(spec, path, processes=args.processes, verbose=True)
+        print(f"{name}: {path}")
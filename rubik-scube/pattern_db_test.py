@@ -0,0 +1,50 @@
+# パターンデータベースの構築と読み込みのテスト
+import random
+
+import numpy as np
+
+import pattern_db
+from batch import BatchCubeState, MOVE_NAMES
+from operation import SOLVED_STATE, scramble2state
+
+# テスト用の小さなパターン（528 状態と 504 状態）
+SMALL_EDGES = pattern_db.PatternSpec("test_edges", "edge", (4, 6))
+SMALL_CORNERS = pattern_db.PatternSpec("test_corners", "corner", (0, 2))
+
+
+def test_rank_unrank_round_trip():
+    for spec in (SMALL_EDGES, SMALL_CORNERS, pattern_db.CORNERS):
+        index = np.arange(0, spec.size, max(1, spec.size // 1000))
+        pos, ori = spec.unrank(index)
+        assert np.array_equal(spec.rank(pos, ori), index)
+
+
+def test_build_and_lookup(tmp_path):
+    databases = []
+    for spec in (SMALL_EDGES, SMALL_CORNERS):
+        path = pattern_db.build_pattern_database(spec, str(tmp_path / f"{spec.name}.bin"), processes=1)
+        db = pattern_db.load_pattern_database(spec, path)
+        assert sum(db.histogram) == spec.size
+        databases.append(db)
+    heuristic = pattern_db.PatternHeuristic(databases)
+    assert heuristic(SOLVED_STATE) == 0
+
+    rng = random.Random(0)
+    states = []
+    for length in range(8):
+        scramble = " ".join(rng.choice(MOVE_NAMES) for _ in range(length))
+        state = scramble2state(scramble)
+        # 許容的: 手数以下
+        assert heuristic(state) <= length
+        states.append(state)
+    batch = BatchCubeState.from_states(states).array
+    assert list(heuristic.batch(batch)) == [heuristic(s) for s in states]
+
+
+def test_resume(tmp_path):
+    full = pattern_db.build_pattern_database(SMALL_EDGES, str(tmp_path / "full.bin"), processes=1)
+    partial = str(tmp_path / "partial.bin")
+    pattern_db.build_pattern_database(SMALL_EDGES, partial, processes=1, max_depth=1)
+    assert pattern_db._read_meta(partial)["complete"] is False
+    pattern_db.build_pattern_database(SMALL_EDGES, partial, processes=1)
+    assert np.array_equal(np.fromfile(full, dtype=np.uint8), np.fromfile(partial, dtype=np.uint8))
@@ -0,0 +1,116 @@
+"""
+到達可能な 4.3 * 10^19 個の状態から一様に状態を選ぶサンプラーと、状態が解けるかどうかの判定。
+
+ランダムウォーク（scramble_dataset.random_walk）は完成状態に近い状態ほど出やすいが、
+random_states は次のように作るので、到達可能な状態のどれもが同じ確率で出る。
+  - cp, ep: 一様な順列（8!, 12!）
+  - cp と ep の偶奇が違えば ep の最後の 2 つを入れ替える（偶奇だけを反転する 1 対 1 の写像なので一様のまま）
+  - co, eo: 最後の 1 つ以外を一様に選び、最後の 1 つで向きの和を 0 (mod 3, mod 2) にそろえる
+
+is_solvable は任意の cp/co/ep/eo（drawing_cube.py の test_value のような手入力の値も）について
+  - cp, ep が 0..7, 0..11 の順列になっている
+  - co, eo が 0..2, 0..1 の範囲にある
+  - co の和が 3 の倍数、eo の和が 2 の倍数
+  - cp と ep の偶奇が一致する
+をまとめて調べる。
+"""
+from typing import Optional, Union
+
+import numpy as np
+
+from batch import CP, CO, EP, EO, STATE_DTYPE, STATE_WIDTH, row_to_state
+from state import RubiksCubeState
+
+
+def _columns(a: np.ndarray) -> np.ndarray:
+    """
+    (N, n) の配列を列ごとに連続した (n, N) にする。列ごとのループで 1 回の演算が N 要素の連続した配列になる。
+    """
+    return np.ascontiguousarray(np.asarray(a).T)
+
+
+def _parity_of_columns(columns: np.ndarray) -> np.ndarray:
+    n = columns.shape[0]
+    parity = np.zeros(columns.shape[1], dtype=bool)
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            parity ^= columns[i] > columns[j]
+    return parity
+
+
+def permutation_parity(perm: np.ndarray) -> np.ndarray:
+    """
+    (N, n) の順列の偶奇（転倒数 mod 2）を (N,) で返す。
+    """
+    return _parity_of_columns(_columns(perm)).astype(np.uint8)
+
+
+def _is_permutation(columns: np.ndarray) -> np.ndarray:
+    """
+    (n, N) の各列が 0..n-1 の順列かどうか。
+    範囲内の n 個の値のビットの OR がすべて立つのは、値がすべて異なるときだけ。
+    """
+    n = columns.shape[0]
+    in_range = np.all(columns < n, axis=0)
+    bits = np.zeros(columns.shape[1], dtype=np.uint16)
+    for c in columns:
+        bits |= np.left_shift(np.uint16(1), np.minimum(c, n).astype(np.uint16))
+    return in_range & (bits == (1 << n) - 1)
+
+
+def is_solvable(cp, co, ep, eo) -> Union[bool, np.ndarray]:
+    """
+    状態が解けるかどうかを返す。1 状態分のリストなら bool、(N, 8) などの配列なら (N,) の bool 配列。
+    形が合わないときは ValueError を送出する。
+    """
+    single = np.ndim(cp) == 1
+    parts = [np.atleast_2d(np.asarray(a)) for a in (cp, co, ep, eo)]
+    n = parts[0].shape[0]
+    columns = []
+    for name, a, width in zip(("cp", "co", "ep", "eo"), parts, (8, 8, 12, 12)):
+        if a.ndim != 2 or a.shape != (n, width):
+            raise ValueError(f"{name} の形は ({n}, {width}) である必要があります: {a.shape}")
+        if a.dtype != np.uint8:
+            # 負の値や 256 以上の値は、範囲外として扱われるよう 255 にしてから uint8 にする
+            a = np.where((a < 0) | (a > 255), 255, a).astype(np.uint8)
+        columns.append(_columns(a))
+    cp, co, ep, eo = columns
+    ok = _is_permutation(cp) & _is_permutation(ep)
+    ok &= np.all(co < 3, axis=0) & np.all(eo < 2, axis=0)
+    ok &= (co.sum(axis=0, dtype=np.int64) % 3 == 0) & (eo.sum(axis=0, dtype=np.int64) % 2 == 0)
+    ok &= _parity_of_columns(cp) == _parity_of_columns(ep)
+    return bool(ok[0]) if single else ok
+
+
+def is_solvable_rows(states: np.ndarray) -> np.ndarray:
+    """
+    batch の (N, 40) 状態配列の各行が解けるかどうかを (N,) で返す。
+    """
+    states = np.asarray(states).reshape(-1, STATE_WIDTH)
+    return is_solvable(states[:, CP], states[:, CO], states[:, EP], states[:, EO])
+
+
+def random_states(n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    到達可能な状態から一様に選んだ n 個の状態を batch の (n, 40) 配列で返す。
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    states = np.empty((n, STATE_WIDTH), dtype=STATE_DTYPE)
+    cp = rng.permuted(np.broadcast_to(np.arange(8, dtype=STATE_DTYPE), (n, 8)), axis=1)
+    ep = rng.permuted(np.broadcast_to(np.arange(12, dtype=STATE_DTYPE), (n, 12)), axis=1)
+    # 偶奇が合わない行は ep の最後の 2 つを入れ替える
+    odd = _parity_of_columns(_columns(cp)) != _parity_of_columns(_columns(ep))
+    ep[odd, 10], ep[odd, 11] = ep[odd, 11], ep[odd, 10]
+    co = rng.integers(0, 3, size=(n, 8), dtype=STATE_DTYPE)
+    co[:, 7] = (3 - co[:, :7].sum(axis=1, dtype=np.int64) % 3) % 3
+    eo = rng.integers(0, 2, size=(n, 12), dtype=STATE_DTYPE)
+    eo[:, 11] = eo[:, :11].sum(axis=1, dtype=np.int64) % 2
+    states[:, CP], states[:, CO], states[:, EP], states[:, EO] = cp, co, ep, eo
+    return states
+
+
+def random_state(rng: Optional[np.random.Generator] = None) -> RubiksCubeState:
+    """
+    到達可能な状態から一様に選んだ 1 つの状態を返す。
+    """
+    return row_to_state(random_states(1, rng)[0])
@@ -0,0 +1,37 @@
+# 一様な状態のサンプラーと解けるかどうかの判定のテスト
+import numpy as np
+
+import random_state
+import two_phase
+from scramble_dataset import random_walk
+
+
+def test_is_solvable():
+    # drawing_cube.py の test_value（R2 した状態）
+    cp, co, ep, eo = ([0, 6, 5, 3, 4, 2, 1, 7], [0] * 8, [0, 2, 1, 3, 4, 9, 6, 7, 8, 5, 10, 11], [0] * 12)
+    assert random_state.is_solvable(cp, co, ep, eo) is True
+    assert not random_state.is_solvable(cp, [1] + [0] * 7, ep, eo)  # コーナーを 1 つだけひねる
+    assert not random_state.is_solvable(cp, co, ep, [1] + [0] * 11)  # エッジを 1 つだけ反転
+    assert not random_state.is_solvable([1, 0, 2, 3, 4, 5, 6, 7], co, list(range(12)), eo)  # 偶奇が違う
+    assert not random_state.is_solvable([0, 0, 2, 3, 4, 5, 6, 7], co, list(range(12)), eo)  # 順列でない
+    assert not random_state.is_solvable(cp, [3] + [0] * 7, ep, eo)  # 向きの範囲外
+    assert not random_state.is_solvable([-1, 1, 2, 3, 4, 5, 6, 7], co, list(range(12)), eo)
+
+    states, _ = random_walk(1000, 0, 30, np.random.default_rng(0))
+    assert random_state.is_solvable_rows(states).all()
+
+
+def test_random_states_are_uniform_and_solvable():
+    rng = np.random.default_rng(0)
+    states = random_state.random_states(60000, rng)
+    assert random_state.is_solvable_rows(states).all()
+    # 各位置に各ピース・各向きがほぼ同じ回数ずつ現れる
+    for columns, values in ((slice(0, 8), 8), (slice(8, 16), 3), (slice(16, 28), 12), (slice(28, 40), 2)):
+        counts = np.stack([(states[:, columns] == v).sum(axis=0) for v in range(values)])
+        expected = states.shape[0] / values
+        assert np.abs(counts - expected).max() < 6 * np.sqrt(expected)
+    # 偶奇は半々
+    assert abs(random_state.permutation_parity(states[:, 0:8]).mean() - 0.5) < 0.02
+
+    result = two_phase.solve(random_state.random_state(rng), target_length=30)
+    assert result.status == "solved" and len(result.solution) <= 30
@@ -0,0 +1,188 @@
+"""
+SOLVED_STATE からのランダムウォークで (状態, スクランブル手数) の例を作り、
+固定長のバイナリレコードとしてシャードファイルに書き出す。
+
+レコードは 41 バイト:
+  - state: batch の列レイアウトの 40 バイト（cp, co, ep, eo）
+  - depth: スクランブル手数 1 バイト
+
+シャードごとに (seed, split, シャード番号) から乱数の種を決めるので、
+プロセス数を変えても同じデータができる。
+split ごとに生成の設定を {split}.manifest.json に書いておき、設定が変わったらその split のシャードを作り直す。
+例はチャンクごとに作ってすぐ書き出すため、何億例でもメモリに全部載せることはない。
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from batch import STATE_WIDTH, BatchCubeState, apply_move_array
+
+RECORD_DTYPE = np.dtype([("state", np.uint8, (STATE_WIDTH,)), ("depth", np.uint8)])
+# 1 回に作ってファイルに書き出す例の数
+CHUNK_SIZE = 1 << 16
+
+
+class SplitSpec(NamedTuple):
+    """
+    1 つの split の設定。スクランブル手数は [min_depth, max_depth] から一様に選ぶ。
+    """
+    num_examples: int
+    min_depth: int
+    max_depth: int
+
+
+def random_walk(n: int, min_depth: int, max_depth: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    完成状態から n 本のランダムウォークを行い、(状態 (n, 40), 手数 (n,)) を返す。
+    同じ面を続けて回さないので、手数はほぼそのまま完成までの距離の上界になる。
+    """
+    depths = rng.integers(min_depth, max_depth + 1, size=n)
+    states = BatchCubeState.solved(n).array
+    prev_face = np.full(n, -1)
+    for step in range(int(depths.max(initial=0))):
+        active = np.flatnonzero(depths > step)
+        # 直前と違う面を選ぶ: 直前の面 + 1..5（初手は 0..5 から）
+        offset = rng.integers(1, 6, size=active.shape[0])
+        face = np.where(prev_face[active] < 0, rng.integers(0, 6, size=active.shape[0]),
+                        (prev_face[active] + offset) % 6)
+        move = face * 3 + rng.integers(0, 3, size=active.shape[0])
+        states[active] = apply_move_array(states[active], move)
+        prev_face[active] = face
+    return states, depths
+
+
+def shard_seed(seed: int, split: str, shard: int) -> np.random.SeedSequence:
+    """
+    シャードごとの乱数の種。プロセスの割り当てに依存しない。
+    """
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(split.encode()), shard))
+
+
+def shard_path(out_dir: str, split: str, shard: int, num_shards: int) -> str:
+    return os.path.join(out_dir, f"{split}-{shard:05d}-of-{num_shards:05d}.bin")
+
+
+def manifest_path(out_dir: str, split: str) -> str:
+    return os.path.join(out_dir, f"{split}.manifest.json")
+
+
+def _sync_manifest(out_dir: str, split: str, manifest: Dict[str, object]) -> None:
+    """
+    split の書き出し済みの設定が manifest と違えば（無ければ）既存のシャードを消し、manifest を書く。
+    """
+    path = manifest_path(out_dir, split)
+    try:
+        with open(path) as f:
+            if json.load(f) == manifest:
+                return
+    except (OSError, ValueError):
+        pass
+    pattern = os.path.join(glob.escape(out_dir), f"{glob.escape(split)}-*-of-*.bin")
+    for stale in glob.glob(pattern) + glob.glob(f"{pattern}.tmp"):
+        os.remove(stale)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def write_shard(path: str, num_examples: int, min_depth: int, max_depth: int,
+                seed: np.random.SeedSequence) -> str:
+    """
+    num_examples 個の例を 1 つのシャードに書き出す。完成したファイルだけが path に現れる。
+    """
+    rng = np.random.default_rng(seed)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for start in range(0, num_examples, CHUNK_SIZE):
+            n = min(CHUNK_SIZE, num_examples - start)
+            states, depths = random_walk(n, min_depth, max_depth, rng)
+            records = np.empty(n, dtype=RECORD_DTYPE)
+            records["state"] = states
+            records["depth"] = depths
+            records.tofile(f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _write_shard_task(args) -> str:
+    path, num_examples, min_depth, max_depth, seed = args
+    if os.path.exists(path):
+        return path
+    return write_shard(path, num_examples, min_depth, max_depth, seed)
+
+
+def write_split(out_dir: str, split: str, spec: SplitSpec, seed: int = 0, examples_per_shard: int = 1 << 20,
+                processes: Optional[int] = None) -> List[str]:
+    """
+    split を examples_per_shard ごとのシャードに分けてプロセスプールで書き出し、シャードのパスを返す。
+    既に書き終わったシャードは作り直さないので、中断しても続きから再開できる。
+    ただし manifest の設定（例の数、手数の範囲、seed、シャードの大きさ）が前回と違えば、その split は作り直す。
+    例が 0 個の split はシャードを作らず、空のリストを返す。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    _sync_manifest(out_dir, split, {"num_examples": spec.num_examples, "min_depth": spec.min_depth,
+                                    "max_depth": spec.max_depth, "seed": seed,
+                                    "examples_per_shard": examples_per_shard, "record_size": RECORD_DTYPE.itemsize})
+    num_shards = -(-spec.num_examples // examples_per_shard)
+    tasks = []
+    for shard in range(num_shards):
+        n = min(examples_per_shard, spec.num_examples - shard * examples_per_shard)
+        tasks.append((shard_path(out_dir, split, shard, num_shards), n, spec.min_depth, spec.max_depth,
+                      shard_seed(seed, split, shard)))
+    processes = min(processes or os.cpu_count() or 1, max(1, num_shards))
+    if processes <= 1:
+        return [_write_shard_task(t) for t in tasks]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(_write_shard_task, tasks)
+
+
+def write_dataset(out_dir: str, splits: Dict[str, SplitSpec], seed: int = 0, examples_per_shard: int = 1 << 20,
+                  processes: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    すべての split を書き出し、{split: シャードのパスのリスト} を返す。
+    """
+    return {split: write_split(out_dir, split, spec, seed, examples_per_shard, processes)
+            for split, spec in splits.items()}
+
+
+def read_shard(path: str) -> np.ndarray:
+    """
+    シャードを mmap で読み込み、RECORD_DTYPE の構造化配列として返す。
+    """
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r")
+
+
+def iter_records(paths: List[str]) -> Iterator[Tuple[str, np.ndarray, int]]:
+    """
+    シャードのレコードを (キー, 状態, 手数) として順に返す。
+    """
+    for path in paths:
+        records = read_shard(path)
+        name = os.path.basename(path)
+        for i in range(records.shape[0]):
+            yield f"{name}-{i}", np.array(records["state"][i]), int(records["depth"][i])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ランダムウォークのデータセットを書き出す")
+    parser.add_argument("out_dir")
+    parser.add_argument("--train", type=int, default=1_000_000, help="train の例の数")
+    parser.add_argument("--test", type=int, default=10_000, help="test の例の数")
+    parser.add_argument("--train-depth", type=int, nargs=2, default=(1, 30), metavar=("MIN", "MAX"))
+    parser.add_argument("--test-depth", type=int, nargs=2, default=(1, 30), metavar=("MIN", "MAX"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", "-p", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = write_dataset(args.out_dir, {
+        "train": SplitSpec(args.train, *args.train_depth),
+        "test": SplitSpec(args.test, *args.test_depth),
+    }, seed=args.seed, processes=args.processes)
+    for split, split_paths in paths.items():
+        print(f"{split}: {len(split_paths)} shards")
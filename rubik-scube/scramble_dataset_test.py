@@ -0,0 +1,60 @@
+# ランダムウォークのデータセット生成のテスト
+import os
+from pathlib import Path
+
+import numpy as np
+
+import scramble_dataset
+from batch import BatchCubeState
+
+
+def test_depth_range_and_solved_depth_zero():
+    rng = np.random.default_rng(0)
+    states, depths = scramble_dataset.random_walk(1000, 0, 5, rng)
+    assert depths.min() >= 0 and depths.max() <= 5
+    solved = BatchCubeState.solved(1).array[0]
+    assert (states[depths == 0] == solved).all()
+
+
+def test_shards_are_deterministic(tmp_path):
+    splits = {"train": scramble_dataset.SplitSpec(100, 1, 20), "test": scramble_dataset.SplitSpec(10, 21, 30)}
+    a = scramble_dataset.write_dataset(str(tmp_path / "a"), splits, seed=3, examples_per_shard=30, processes=1)
+    b = scramble_dataset.write_dataset(str(tmp_path / "b"), splits, seed=3, examples_per_shard=30, processes=2)
+    assert len(a["train"]) == 4
+    for pa, pb in zip(a["train"] + a["test"], b["train"] + b["test"]):
+        assert Path(pa).read_bytes() == Path(pb).read_bytes()
+    test_depths = [depth for _, _, depth in scramble_dataset.iter_records(a["test"])]
+    assert len(test_depths) == 10 and min(test_depths) >= 21
+    records = scramble_dataset.read_shard(a["train"][0])
+    assert records.shape == (30,) and records.itemsize == 41
+
+
+def test_empty_split_has_no_shards(tmp_path):
+    paths = scramble_dataset.write_dataset(str(tmp_path), {"test": scramble_dataset.SplitSpec(0, 1, 20)},
+                                           processes=1)
+    assert paths == {"test": []}
+    assert [p.name for p in tmp_path.iterdir()] == ["test.manifest.json"]
+
+
+def test_changed_settings_regenerate_shards(tmp_path):
+    out_dir = str(tmp_path / "data")
+    spec = scramble_dataset.SplitSpec(50, 1, 20)
+    first = scramble_dataset.write_split(out_dir, "train", spec, seed=3, examples_per_shard=20, processes=1)
+    mtimes = [os.stat(p).st_mtime_ns for p in first]
+    # 同じ設定なら書き終わったシャードをそのまま使う
+    assert scramble_dataset.write_split(out_dir, "train", spec, seed=3, examples_per_shard=20, processes=1) == first
+    assert [os.stat(p).st_mtime_ns for p in first] == mtimes
+
+    # seed や手数の範囲を変えたら作り直し、新しい設定で最初から作ったものと同じになる
+    for seed, changed in ((4, spec), (4, scramble_dataset.SplitSpec(50, 21, 30)),
+                          (4, scramble_dataset.SplitSpec(30, 21, 30))):
+        paths = scramble_dataset.write_split(out_dir, "train", changed, seed=seed, examples_per_shard=20,
+                                             processes=1)
+        fresh = scramble_dataset.write_split(str(tmp_path / f"fresh-{changed.num_examples}-{changed.min_depth}"),
+                                             "train", changed, seed=seed, examples_per_shard=20, processes=1)
+        assert [Path(p).read_bytes() for p in paths] == [Path(p).read_bytes() for p in fresh]
+    # シャードの数が変わっても古いシャードは残らない
+    assert sorted(p.name for p in Path(out_dir).iterdir()) == [
+        "train-00000-of-00002.bin", "train-00001-of-00002.bin", "train.manifest.json"]
+    depths = [depth for _, _, depth in scramble_dataset.iter_records(paths)]
+    assert len(depths) == 30 and min(depths) >= 21
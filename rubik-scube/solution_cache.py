@@ -0,0 +1,187 @@
+"""
+解いた状態の手順を保存しておく永続キャッシュ。
+
+- キーは packed の 13 バイトの表現（PackedCubeState.to_bytes）
+- 保存先は sqlite の 1 ファイル（WITHOUT ROWID の主キーで引くので 1 回の B 木の探索で見つかる）
+- その上にプロセス内の LRU（OrderedDict）を置き、よく引く状態は sqlite まで行かない
+
+解を 1 つ保存すると、その手順の途中のすべての状態にも残りの手順を保存するので、
+同じ解の途中の局面は何もしなくてもヒットする。同じ状態に既に短い解があれば上書きしない。
+
+canonical=True にすると symmetry の代表元をキーにするので、対称な状態どうしでも解を共有できる
+（取り出すときに map_moves_back で元の状態の手順に戻す）。
+"""
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import instrument
+from operation import get_moves, scramble2state
+from packed import PackedCubeState
+from solver import SolveResult
+from state import RubiksCubeState
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS solutions (
+    key BLOB PRIMARY KEY,
+    length INTEGER NOT NULL,
+    solution TEXT NOT NULL
+) WITHOUT ROWID
+"""
+# 既にある解より短いときだけ上書きする
+_UPSERT = """
+INSERT INTO solutions (key, length, solution) VALUES (?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET length = excluded.length, solution = excluded.solution
+WHERE excluded.length < solutions.length
+"""
+
+
+class SolutionCache:
+    """
+    状態 -> 解の手順 の永続キャッシュ。
+    """
+    def __init__(self, path: str = ":memory:", lru_size: int = 100_000, canonical: bool = False):
+        """
+        :param path: sqlite のファイルパス（":memory:" ならメモリ上だけ）
+        :param lru_size: プロセス内の LRU に置く状態数
+        :param canonical: 対称性の代表元をキーにする
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lru_size = lru_size
+        self.canonical = canonical
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+        self._lru: "OrderedDict[bytes, Tuple[str, ...]]" = OrderedDict()
+        self.hits = 0
+        self.lru_hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """
+        {'hits', 'lru_hits', 'misses'}。hits は LRU と sqlite のどちらかで見つかった回数。
+        """
+        return {"hits": self.hits, "lru_hits": self.lru_hits, "misses": self.misses}
+
+    # ------------------------------------------------------------
+    # キー
+    # ------------------------------------------------------------
+    def _key(self, state: RubiksCubeState) -> Tuple[bytes, int]:
+        """
+        (キー, 代表元を得るのに使った対称性の番号)。canonical でなければ対称性は 0（恒等変換）。
+        """
+        if self.canonical:
+            from symmetry import canonicalize
+            state, symmetry = canonicalize(state)
+            return PackedCubeState.from_state(state).to_bytes(), symmetry
+        return PackedCubeState.from_state(state).to_bytes(), 0
+
+    def _remember(self, key: bytes, solution: Tuple[str, ...]) -> None:
+        self._lru[key] = solution
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    # ------------------------------------------------------------
+    # 読み書き
+    # ------------------------------------------------------------
+    def get(self, target: Union[RubiksCubeState, str]) -> Optional[List[str]]:
+        """
+        target の解の手順を返す。無ければ None。
+        """
+        if isinstance(target, str):
+            target = scramble2state(target)
+        key, symmetry = self._key(target)
+        solution = self._lru.get(key)
+        if solution is not None:
+            self._lru.move_to_end(key)
+            self.lru_hits += 1
+        else:
+            row = self._db.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                rec = instrument.current()
+                if rec is not None:
+                    rec.count("cache_misses")
+                return None
+            solution = tuple(row[0].split())
+            self._remember(key, solution)
+        self.hits += 1
+        rec = instrument.current()
+        if rec is not None:
+            rec.count("cache_hits")
+        if self.canonical:
+            from symmetry import map_moves_back
+            return map_moves_back(solution, symmetry)
+        return list(solution)
+
+    def _path_rows(self, state: RubiksCubeState, solution: Sequence[str]) -> List[Tuple[bytes, int, str]]:
+        """
+        解の途中の状態すべての (キー, 残りの手数, 残りの手順) を作る。
+        """
+        moves, _ = get_moves()
+        rows = []
+        for i in range(len(solution) + 1):
+            key, symmetry = self._key(state)
+            rest = list(solution[i:])
+            if self.canonical:
+                from symmetry import MOVE_CONJUGATE, MOVE_NAMES
+                rest = [MOVE_NAMES[MOVE_CONJUGATE[symmetry, MOVE_NAMES.index(m)]] for m in rest]
+            rows.append((key, len(rest), " ".join(rest)))
+            if i < len(solution):
+                state = state.apply_move(moves[solution[i]])
+        return rows
+
+    def put(self, target: Union[RubiksCubeState, str], solution: Sequence[str]) -> int:
+        """
+        target の解を保存する。書き込んだ状態の数（途中の状態を含む）を返す。
+        """
+        return self.put_many([(target, solution)])
+
+    def put_many(self, items: Iterable[Tuple[Union[RubiksCubeState, str], Sequence[str]]]) -> int:
+        """
+        (状態, 解) の列をまとめて 1 つのトランザクションで保存し、書き込んだ状態の数を返す。
+        """
+        rows = []
+        for target, solution in items:
+            if isinstance(target, str):
+                target = scramble2state(target)
+            rows.extend(self._path_rows(target, solution))
+        with self._db:
+            self._db.executemany(_UPSERT, rows)
+        # LRU の古い解を残さないよう、書いたキーは捨てて次に引くときに読み直す
+        for key, _, _ in rows:
+            self._lru.pop(key, None)
+        return len(rows)
+
+    def get_or_solve(self, target: Union[RubiksCubeState, str],
+                     solve: Callable[[RubiksCubeState], SolveResult]) -> Optional[List[str]]:
+        """
+        キャッシュに解があればそれを返し、無ければ solve で解いて保存してから返す。
+        """
+        if isinstance(target, str):
+            target = scramble2state(target)
+        solution = self.get(target)
+        if solution is None:
+            result = solve(target)
+            if result.solution is not None:
+                self.put(target, result.solution)
+            solution = result.solution
+        return solution
@@ -0,0 +1,68 @@
+# 解の永続キャッシュのテスト
+import random
+
+import pytest
+
+import symmetry
+from batch import MOVE_NAMES
+from operation import scramble2state
+from solution_cache import SolutionCache
+from solver import is_solved
+
+
+def _inverse(scramble):
+    return [m[0] if m.endswith("'") else m if m.endswith("2") else m + "'" for m in reversed(scramble.split())]
+
+
+@pytest.mark.parametrize("canonical", [False, True])
+def test_put_get_and_intermediate_hits(tmp_path, canonical):
+    path = str(tmp_path / "cache.sqlite")
+    scramble = "R U F' L2 D B'"
+    with SolutionCache(path, canonical=canonical) as cache:
+        assert cache.get(scramble) is None
+        assert cache.put(scramble, _inverse(scramble)) == 7
+        assert len(cache) == 7
+    with SolutionCache(path, lru_size=2, canonical=canonical) as cache:
+        # 途中の状態（スクランブルの途中まで）もヒットする
+        for n in range(7):
+            prefix = " ".join(scramble.split()[:n])
+            solution = cache.get(prefix)
+            assert solution is not None and len(solution) == n
+            assert is_solved(scramble2state(" ".join(solution), scramble2state(prefix)))
+        assert cache.get("R U R' U'") is None
+        assert cache.counters == {"hits": 7, "lru_hits": 0, "misses": 1}
+        cache.get(scramble)
+        assert cache.counters["lru_hits"] == 1
+
+
+def test_keeps_shorter_solution():
+    with SolutionCache() as cache:
+        cache.put("R", ["R", "R", "R"])
+        cache.put("R", ["R'"])
+        cache.put("R", ["R2", "R"])
+        assert cache.get("R") == ["R'"]
+
+
+def test_canonical_shares_symmetric_states():
+    rng = random.Random(0)
+    scramble = " ".join(rng.choice(MOVE_NAMES) for _ in range(10))
+    with SolutionCache(canonical=True) as cache:
+        cache.put(scramble, _inverse(scramble))
+        other = symmetry.conjugate(scramble2state(scramble), 30)
+        solution = cache.get(other)
+        assert solution is not None and is_solved(scramble2state(" ".join(solution), other))
+
+
+def test_bulk_insert_and_get_or_solve():
+    rng = random.Random(1)
+    scrambles = [" ".join(rng.choice(MOVE_NAMES) for _ in range(5)) for _ in range(10)]
+    with SolutionCache() as cache:
+        assert cache.put_many((s, _inverse(s)) for s in scrambles) == 60
+        calls = []
+
+        def never(state):
+            calls.append(state)
+            raise AssertionError("キャッシュにある状態で solve を呼ばない")
+
+        assert all(cache.get_or_solve(s, never) is not None for s in scrambles)
+        assert calls == []
@@ -0,0 +1,398 @@
+"""
+ローカルの HTTP/JSON でキューブを解くサービス（asyncio）。
+
+    python solve_service.py --port 8080 --workers 2
+    curl -d '{"scramble": "R U R2 F"}' localhost:8080/solve
+    curl -d '{"cp": [...], "co": [...], "ep": [...], "eo": [...]}' localhost:8080/solve
+    curl localhost:8080/metrics
+
+リクエストごとに bwas.search_steps のジェネレータを 1 つ作り、イベントループの上で並行に進める。
+各探索が h を求めたい状態の配列を yield すると MicroBatcher に預け、
+  - 預かった行数が max_batch に達したとき
+  - 進行中の探索がすべて h を待っているとき
+  - 最初の預かりから max_wait 秒たったとき
+のどれかで、すべての探索の状態を 1 つのバッチにつなげてワーカープールでヒューリスティックを 1 回だけ呼ぶ。
+結果は探索ごとに切り分けて返すので、同時に来たリクエストの評価が 1 回の呼び出しにまとまる
+（学習したモデルのように 1 回の呼び出しが重く、バッチが大きいほど効率の良いヒューリスティック向け）。
+ジェネレータを進める（batch_size 個のノードを展開する）処理もスレッドプールで行い、
+大きな batch_size のリクエストがあってもイベントループは他のリクエストや /metrics, /health に応答できる。
+
+/solve の入力:
+  - {"scramble": "R U R' U'"}
+  - {"cp": [...], "co": [...], "ep": [...], "eo": [...]} か {"state": [cp, co, ep, eo]}（draw_cube の value と同じ形）
+  - 任意で weight, batch_size, node_limit, time_limit（bwas.solve と同じ意味）
+/metrics はレイテンシの p50 / p99 と、バッチの埋まり具合（max_batch に対する行数の割合）を返す。
+HTTP は 1 リクエスト 1 接続の最小限の実装で、外部のパッケージは使わない。
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import bwas
+from batch import STATE_DTYPE, STATE_WIDTH, state_to_row
+from operation import scramble2state
+from random_state import is_solvable
+
+# /metrics のレイテンシの集計に使う直近のリクエスト数
+LATENCY_WINDOW = 10_000
+# 受け付ける本文の最大バイト数
+MAX_BODY = 1 << 16
+# リクエストで指定できる batch_size の上限。time_limit は展開の 1 段ごとにしか確かめないので、
+# 1 段（batch_size 個の展開）が数十ミリ秒で終わる大きさに抑える
+MAX_BATCH_SIZE = 2_000
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class MicroBatcher:
+    """
+    複数の探索のヒューリスティックの評価を 1 つのバッチにまとめて executor で実行する。
+    """
+    def __init__(self, heuristic: bwas.BatchHeuristic, executor: Executor, max_batch: int = 8192,
+                 max_wait: float = 0.002):
+        """
+        :param heuristic: (M, 40) の状態配列 -> (M,) の推定手数。ProcessPoolExecutor なら pickle できる関数
+        :param executor: heuristic を実行するプール
+        :param max_batch: この行数以上たまったらすぐに実行する
+        :param max_wait: 最初に預かってからこの秒数たったら、max_batch に満たなくても実行する
+        """
+        self.heuristic = heuristic
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        # h を求めている最中の探索の数（全員が待っていれば待つ意味がない）
+        self.active = 0
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._pending_rows = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+
+    async def evaluate(self, states: np.ndarray) -> np.ndarray:
+        """
+        states (M, 40) の h (M,) を返す。他の探索の状態と一緒のバッチで評価される。
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((states, future))
+        self._pending_rows += states.shape[0]
+        if self._pending_rows >= self.max_batch or len(self._pending) >= self.active:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        items, self._pending, self._pending_rows = self._pending, [], 0
+        asyncio.get_running_loop().create_task(self._dispatch(items))
+
+    async def _dispatch(self, items: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        batch = np.concatenate([states for states, _ in items])
+        self.batches += 1
+        self.rows += batch.shape[0]
+        self.requests += len(items)
+        try:
+            h = await asyncio.get_running_loop().run_in_executor(self.executor, self.heuristic, batch)
+            h = np.asarray(h, dtype=np.float64).reshape(-1)
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        offset = 0
+        for states, future in items:
+            if not future.done():
+                future.set_result(h[offset:offset + states.shape[0]])
+            offset += states.shape[0]
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_rows": self.rows / self.batches if self.batches else 0.0,
+            "mean_fill": self.rows / (self.batches * self.max_batch) if self.batches else 0.0,
+            "mean_searches": self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+def _advance(steps, h: Optional[np.ndarray] = None) -> Tuple[bool, object]:
+    """
+    search_steps のジェネレータを 1 段進め、(終わったか, 次に評価する状態の配列か BWASResult) を返す。
+    StopIteration は Future に入れられないので、ここで値に変える。
+    """
+    try:
+        return False, next(steps) if h is None else steps.send(h)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+def parse_target(payload: dict) -> np.ndarray:
+    """
+    /solve の本文から長さ 40 の開始状態を作る。読めないか解けない状態なら BadRequest を送出する。
+    """
+    if "scramble" in payload:
+        try:
+            return state_to_row(scramble2state(str(payload["scramble"])))
+        except KeyError as e:
+            raise BadRequest(e.args[0])
+    if "state" in payload:
+        parts = payload["state"]
+    else:
+        parts = [payload.get(name) for name in ("cp", "co", "ep", "eo")]
+    try:
+        ok = (len(parts) == 4 and all(isinstance(p, list) and all(type(v) is int for v in p) for p in parts)
+              and is_solvable(*parts))
+    except (ValueError, TypeError):
+        ok = False
+    if not ok:
+        raise BadRequest("scramble か、解ける cp/co/ep/eo を指定してください")
+    return np.array([v for p in parts for v in p], dtype=STATE_DTYPE).reshape(STATE_WIDTH)
+
+
+def _number(payload: dict, name: str, integer: bool) -> Optional[float]:
+    value = payload[name]
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)) or value != value:
+        raise BadRequest(f"{name} は{'整数' if integer else '数値'}で指定してください")
+    return value
+
+
+def parse_options(payload: dict, defaults: dict) -> dict:
+    """
+    /solve の本文から bwas の引数を作る。型や範囲が違えば BadRequest を送出する。
+    node_limit と time_limit はサーバーの既定値を上限にする（null や大きな値でも上限は外せない）。
+    """
+    options = dict(defaults)
+    if payload.get("weight") is not None:
+        weight = _number(payload, "weight", False)
+        if not 0 <= weight < float("inf"):
+            raise BadRequest("weight は 0 以上の有限の数値で指定してください")
+        options["weight"] = float(weight)
+    if payload.get("batch_size") is not None:
+        batch_size = _number(payload, "batch_size", True)
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise BadRequest(f"batch_size は 1 以上 {MAX_BATCH_SIZE} 以下で指定してください")
+        options["batch_size"] = batch_size
+    for name, integer in (("node_limit", True), ("time_limit", False)):
+        if name not in payload:
+            continue
+        value = _number(payload, name, integer)
+        if value is None:
+            continue
+        if not value > 0:
+            raise BadRequest(f"{name} は正の数で指定してください")
+        options[name] = value if defaults[name] is None else min(value, defaults[name])
+    return options
+
+
+class SolveService:
+    """
+    BWAS の探索をまとめて進め、ヒューリスティックの評価を MicroBatcher でまとめる HTTP サーバー。
+    """
+    def __init__(self, heuristic: Optional[bwas.BatchHeuristic] = None, workers: int = 1, max_batch: int = 8192,
+                 max_wait: float = 0.002, weight: float = 0.6, batch_size: int = 100,
+                 node_limit: Optional[int] = 200_000, time_limit: Optional[float] = 10.0,
+                 search_threads: int = 4):
+        """
+        :param heuristic: バッチのヒューリスティック。None なら bwas.misplaced_heuristic
+        :param workers: ヒューリスティックを実行するプロセス数。0 ならイベントループとは別のスレッド 1 つで実行する
+        :param search_threads: 探索のノードの展開を行うスレッドの数
+        :param max_batch / max_wait: MicroBatcher を参照
+        :param weight / batch_size / node_limit / time_limit: リクエストで指定が無いときの bwas の引数
+        """
+        self.heuristic = heuristic or bwas.misplaced_heuristic
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.defaults = {"weight": weight, "batch_size": batch_size, "node_limit": node_limit,
+                         "time_limit": time_limit}
+        self.search_threads = search_threads
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.solved = 0
+        self.failed = 0
+        self.executor: Optional[Executor] = None
+        self.search_executor: Optional[ThreadPoolExecutor] = None
+        self.batcher: Optional[MicroBatcher] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        サーバーを起動する。port=0 なら空いているポートを使う（port プロパティで分かる）。
+        """
+        # イベントループが動いているプロセスを fork するとワーカーが止まることがあるので spawn で起動する
+        self.executor = (ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+                         if self.workers > 0 else ThreadPoolExecutor(1))
+        # 最初のリクエストがワーカーの起動を待たないよう、先に 1 回呼んでおく
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.heuristic, bwas.SOLVED_ROW[None])
+        self.search_executor = ThreadPoolExecutor(self.search_threads)
+        self.batcher = MicroBatcher(self.heuristic, self.executor, self.max_batch, self.max_wait)
+        self.server = await asyncio.start_server(self._handle, host, port)
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        if self.search_executor is not None:
+            self.search_executor.shutdown(wait=True)
+
+    async def solve(self, payload: dict) -> dict:
+        """
+        /solve の 1 件を解いて応答の dict を返す。
+        """
+        t0 = time.perf_counter()
+        start = parse_target(payload)
+        options = parse_options(payload, self.defaults)
+        deadline = t0 + options["time_limit"] if options["time_limit"] is not None else None
+        steps = bwas.search_steps(start, options["weight"], options["batch_size"],
+                                  node_limit=options["node_limit"], deadline=deadline)
+        loop = asyncio.get_running_loop()
+        self.batcher.active += 1
+        try:
+            # ノードの展開はイベントループを止めないようにスレッドで行う
+            done, value = await loop.run_in_executor(self.search_executor, _advance, steps)
+            while not done:
+                h = await self.batcher.evaluate(value)
+                done, value = await loop.run_in_executor(self.search_executor, _advance, steps, h)
+            result: bwas.BWASResult = value
+        finally:
+            self.batcher.active -= 1
+        latency = time.perf_counter() - t0
+        self.latencies.append(latency)
+        if result.solution is not None:
+            self.solved += 1
+        else:
+            self.failed += 1
+        return {"status": result.status,
+                "solution": " ".join(result.solution) if result.solution is not None else None,
+                "length": len(result.solution) if result.solution is not None else None,
+                "nodes": result.nodes, "heuristic_calls": result.heuristic_calls, "latency": latency}
+
+    def metrics(self) -> dict:
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            "solved": self.solved,
+            "failed": self.failed,
+            "in_flight": self.batcher.active if self.batcher is not None else 0,
+            "latency_p50": float(np.percentile(latencies, 50)),
+            "latency_p99": float(np.percentile(latencies, 99)),
+            "batching": self.batcher.metrics() if self.batcher is not None else {},
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            status, body = await self._respond(reader)
+        except Exception as e:
+            status, body = 500, {"error": str(e)}
+        data = json.dumps(body).encode()
+        writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, reader: asyncio.StreamReader) -> Tuple[int, dict]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            return 400, {"error": "リクエスト行が読めません"}
+        method, path = request_line[0], request_line[1]
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                try:
+                    length = int(value)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    return 400, {"error": "Content-Length が読めません"}
+        if length > MAX_BODY:
+            return 413, {"error": "本文が大きすぎます"}
+        body = await reader.readexactly(length) if length else b""
+
+        if path == "/metrics":
+            return 200, self.metrics()
+        if path == "/health":
+            return 200, {"ok": True}
+        if path != "/solve":
+            return 404, {"error": f"{path} はありません"}
+        if method != "POST":
+            return 405, {"error": "/solve は POST で送ってください"}
+        try:
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict):
+                raise BadRequest("本文は JSON のオブジェクトにしてください")
+            return 200, await self.solve(payload)
+        except (BadRequest, json.JSONDecodeError) as e:
+            return 400, {"error": str(e)}
+
+
+async def request(port: int, path: str, payload: Optional[dict] = None, host: str = "127.0.0.1") -> Tuple[int, dict]:
+    """
+    サービスに 1 回リクエストを送り、(ステータスコード, 応答の JSON) を返す（テストやスクリプト用）。
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    data = json.dumps(payload).encode() if payload is not None else b""
+    method = "POST" if payload is not None else "GET"
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    service = SolveService(workers=args.workers, max_batch=args.max_batch, max_wait=args.max_wait / 1000,
+                           batch_size=args.batch_size, node_limit=args.node_limit, time_limit=args.time_limit)
+    await service.start(args.host, args.port)
+    print(f"listening on http://{args.host}:{service.port}")
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BWAS でキューブを解くローカルの HTTP/JSON サービス")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1, help="ヒューリスティックを実行するプロセス数")
+    parser.add_argument("--max-batch", type=int, default=8192, help="1 回の評価にまとめる最大の行数")
+    parser.add_argument("--max-wait", type=float, default=2.0, help="バッチを待つ最長の時間（ミリ秒）")
+    parser.add_argument("--batch-size", type=int, default=100, help="1 回に展開するノード数（リクエストで上書きできる）")
+    parser.add_argument("--node-limit", type=int, default=200_000)
+    parser.add_argument("--time-limit", type=float, default=10.0, help="1 リクエストの探索時間の上限（秒）")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,125 @@
+# HTTP の解くサービスのテスト（localhost だけで完結する）
+import asyncio
+import threading
+
+import solve_service
+from operation import scramble2state
+from solver import is_solved
+
+SCRAMBLES = ["R U F' L2 D", "R U R' U'", "F2 D' B", "L U2 R'", "D F R2", "B' L D2 U"]
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def _solve_all(service):
+    port = service.port
+    state = scramble2state("R U2 F")
+    payloads = [{"scramble": s} for s in SCRAMBLES]
+    payloads.append({"cp": state.cp, "co": state.co, "ep": state.ep, "eo": state.eo})
+    payloads.append({"state": [state.cp, state.co, state.ep, state.eo]})
+    return await asyncio.gather(*(solve_service.request(port, "/solve", p) for p in payloads))
+
+
+def test_concurrent_requests_share_batches():
+    async def main():
+        service = solve_service.SolveService(workers=0, max_batch=100_000, max_wait=0.05)
+        await service.start()
+        try:
+            responses = await _solve_all(service)
+            metrics = (await solve_service.request(service.port, "/metrics"))[1]
+        finally:
+            await service.stop()
+        return responses, metrics
+
+    responses, metrics = _run(main())
+    for (status, body), scramble in zip(responses, SCRAMBLES + ["R U2 F", "R U2 F"]):
+        assert status == 200 and body["status"] == "solved"
+        assert is_solved(scramble2state(body["solution"], scramble2state(scramble)))
+    batching = metrics["batching"]
+    calls = sum(body["heuristic_calls"] for _, body in responses)
+    # 同時に来た探索の評価がまとまるので、バッチ数は探索ごとの呼び出し回数の合計より少ない
+    assert batching["batches"] < calls and batching["mean_searches"] > 1
+    assert metrics["solved"] == len(responses) and 0 < metrics["latency_p50"] <= metrics["latency_p99"]
+
+
+def test_bad_requests_and_process_pool():
+    async def main():
+        service = solve_service.SolveService(workers=1)
+        await service.start()
+        try:
+            port = service.port
+            bad_move = await solve_service.request(port, "/solve", {"scramble": "R Q"})
+            twisted = await solve_service.request(port, "/solve", {"state": [list(range(8)), [1] + [0] * 7,
+                                                                             list(range(12)), [0] * 12]})
+            missing = await solve_service.request(port, "/nothing")
+            solved = await solve_service.request(port, "/solve", {"scramble": "R U", "batch_size": 10})
+        finally:
+            await service.stop()
+        return bad_move, twisted, missing, solved
+
+    bad_move, twisted, missing, solved = _run(main())
+    assert bad_move[0] == 400 and twisted[0] == 400 and missing[0] == 404
+    assert solved[0] == 200 and solved[1]["length"] == 2
+
+
+def test_invalid_options_are_rejected_and_limits_capped():
+    defaults = {"weight": 0.6, "batch_size": 100, "node_limit": 1000, "time_limit": 1.0}
+    options = solve_service.parse_options({"node_limit": None, "time_limit": 100, "batch_size": 5}, defaults)
+    assert options == {"weight": 0.6, "batch_size": 5, "node_limit": 1000, "time_limit": 1.0}
+
+    async def main():
+        service = solve_service.SolveService(workers=0, **{k: v for k, v in defaults.items()})
+        await service.start()
+        try:
+            port = service.port
+            results = [await solve_service.request(port, "/solve", dict(scramble="R U", **bad))
+                       for bad in ({"time_limit": "x"}, {"batch_size": 0}, {"node_limit": 1.5},
+                                   {"weight": True}, {"time_limit": -1})]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /solve HTTP/1.1\r\nContent-Length: abc\r\n\r\n")
+            await writer.drain()
+            raw = await reader.read()
+            writer.close()
+        finally:
+            await service.stop()
+        return results, raw
+
+    results, raw = _run(main())
+    assert [status for status, _ in results] == [400] * 5
+    assert raw.startswith(b"HTTP/1.1 400")
+
+
+def test_search_steps_run_off_the_event_loop(monkeypatch):
+    threads = []
+    search_steps = solve_service.bwas.search_steps
+
+    def recording_steps(*args, **kwargs):
+        # ジェネレータの中の処理（ノードの展開）がどのスレッドで動いたかを記録する
+        steps = search_steps(*args, **kwargs)
+        threads.append(threading.get_ident())
+        h = yield next(steps)
+        while True:
+            threads.append(threading.get_ident())
+            try:
+                states = steps.send(h)
+            except StopIteration as stop:
+                return stop.value
+            h = yield states
+
+    monkeypatch.setattr(solve_service.bwas, "search_steps", recording_steps)
+
+    async def main():
+        service = solve_service.SolveService(workers=0)
+        await service.start()
+        try:
+            response = await solve_service.request(service.port, "/solve", {"scramble": "R U F' L2 D"})
+        finally:
+            await service.stop()
+        return response, threading.get_ident()
+
+    (status, body), loop_thread = _run(main())
+    assert status == 200 and body["status"] == "solved"
+    assert len(threads) == body["heuristic_calls"] + 1
+    assert loop_thread not in threads
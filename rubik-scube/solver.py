@@ -0,0 +1,194 @@
+"""
+IDA* による最適解ソルバー。
+
+- 同じ面を 2 回続けて回さない
+- 可換な向かい合う面（U/D, L/R, F/B）は決まった順番でしか回さない
+の 2 つの枝刈りで、分岐数を 18 から約 13.35 に減らす。
+
+ヒューリスティックは state -> 手数の下界 を返す関数なら何でも差し替えられる
+（pattern_db.PatternHeuristic など）。
+"""
+import argparse
+import time
+from typing import Callable, List, NamedTuple, Optional, Union
+
+import coord
+import instrument
+from batch import MOVE_NAMES, NUM_MOVES
+from operation import SOLVED_STATE, build_moves, scramble2state
+from state import RubiksCubeState
+
+Heuristic = Callable[[RubiksCubeState], int]
+
+# 面の番号（MOVE_NAMES は面ごとに X, X2, X' の順で並んでいる）
+# U=0, D=1, L=2, R=3, F=4, B=5。向かい合う面は face // 2 が同じになる
+MOVE_FACE = [m // 3 for m in range(NUM_MOVES)]
+
+
+def _allowed_moves(prev_face: int) -> List[int]:
+    """
+    直前に prev_face を回したあとに続けてよい手番号のリスト（prev_face = -1 は初手）。
+    """
+    allowed = []
+    for m in range(NUM_MOVES):
+        face = MOVE_FACE[m]
+        if prev_face >= 0:
+            if face == prev_face:
+                continue
+            # 向かい合う面は番号の小さい面 -> 大きい面の順だけを許す（例: U D は良いが D U は不可）
+            if face // 2 == prev_face // 2 and face < prev_face:
+                continue
+        allowed.append(m)
+    return allowed
+
+
+# ALLOWED_MOVES[prev_face + 1] = 続けてよい手番号
+ALLOWED_MOVES = [_allowed_moves(f) for f in range(-1, 6)]
+
+
+class SolveResult(NamedTuple):
+    """
+    探索の結果。
+    - solution: 解の手順（MOVE_NAMES の表記）。見つからなければ None
+    - status: 'solved', 'not_found', 'node_limit', 'time_limit' のどれか
+    - nodes: 展開したノード数
+    - elapsed: 経過時間（秒）
+    """
+    solution: Optional[List[str]]
+    status: str
+    nodes: int
+    elapsed: float
+
+    @property
+    def nodes_per_sec(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class CoordinateHeuristic:
+    """
+    座標の枝刈り表（co x ud_slice, eo x ud_slice, cp）の max を取る許容的なヒューリスティック。
+    パターンデータベースが無くても数秒で用意できる。
+    """
+    def __init__(self, table_dir: Optional[str] = None):
+        self.co_slice = coord.load_pruning_table(["co", "ud_slice"], table_dir=table_dir)
+        self.eo_slice = coord.load_pruning_table(["eo", "ud_slice"], table_dir=table_dir)
+        self.cp = coord.load_pruning_table(["cp"], table_dir=table_dir)
+
+    def __call__(self, state: RubiksCubeState) -> int:
+        ud_slice = coord.ud_slice_to_index(state.ep)
+        return max(
+            int(self.co_slice[coord.co_to_index(state.co) * 495 + ud_slice]),
+            int(self.eo_slice[coord.eo_to_index(state.eo) * 495 + ud_slice]),
+            int(self.cp[coord.cp_to_index(state.cp)]),
+        )
+
+
+def is_solved(state: RubiksCubeState) -> bool:
+    """
+    state が完成状態かどうか。
+    """
+    return (list(state.cp) == SOLVED_STATE.cp and list(state.co) == SOLVED_STATE.co
+            and list(state.ep) == SOLVED_STATE.ep and list(state.eo) == SOLVED_STATE.eo)
+
+
+class _Budget(Exception):
+    """
+    ノード数・時間の上限に達したことを探索の外に伝える。
+    """
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+def solve(target: Union[RubiksCubeState, str], heuristic: Optional[Heuristic] = None, max_depth: int = 20,
+          node_limit: Optional[int] = None, time_limit: Optional[float] = None) -> SolveResult:
+    """
+    IDA* で target を完成状態に戻す最短手順を探す。
+
+    引数:
+    - target: RubiksCubeState またはスクランブル文字列（例: "R U R' U'"）
+    - heuristic: state -> 手数の下界。None なら CoordinateHeuristic
+    - max_depth: 探索する最大の手数
+    - node_limit: 展開ノード数の上限。超えたら status='node_limit' で打ち切る
+    - time_limit: 秒数の上限。超えたら status='time_limit' で打ち切る
+    """
+    if isinstance(target, str):
+        target = scramble2state(target)
+    if heuristic is None:
+        heuristic = CoordinateHeuristic()
+    moves, _ = build_moves()
+    move_states = [moves[name] for name in MOVE_NAMES]
+    rec = instrument.current()
+    if rec is not None:
+        heuristic = rec.wrap("heuristic_evals", heuristic)
+
+    start = time.perf_counter()
+    deadline = start + time_limit if time_limit is not None else None
+    nodes = 0
+    path: List[int] = []
+
+    def search(state: RubiksCubeState, g: int, bound: int, prev_face: int) -> int:
+        nonlocal nodes
+        h = heuristic(state)
+        f = g + h
+        if f > bound:
+            return f
+        if h == 0 and is_solved(state):
+            return -1
+        nodes += 1
+        if rec is not None:
+            rec.observe("ida_depth", g)
+            rec.count("move_applications", len(ALLOWED_MOVES[prev_face + 1]))
+        if node_limit is not None and nodes > node_limit:
+            raise _Budget("node_limit")
+        if deadline is not None and nodes & 0x3FF == 0 and time.perf_counter() > deadline:
+            raise _Budget("time_limit")
+        best = None
+        for m in ALLOWED_MOVES[prev_face + 1]:
+            path.append(m)
+            t = search(state.apply_move(move_states[m]), g + 1, bound, MOVE_FACE[m])
+            if t < 0:
+                return t
+            path.pop()
+            if best is None or t < best:
+                best = t
+        return best if best is not None else float("inf")
+
+    status = "not_found"
+    solution = None
+    try:
+        bound = heuristic(target)
+        while bound <= max_depth:
+            t0 = time.perf_counter()
+            t = search(target, 0, bound, -1)
+            if rec is not None:
+                rec.add_time(f"ida_bound_{bound}", time.perf_counter() - t0)
+            if t < 0:
+                status = "solved"
+                solution = [MOVE_NAMES[m] for m in path]
+                break
+            bound = t
+    except _Budget as e:
+        status = e.status
+    if rec is not None:
+        rec.count("node_expansions", nodes)
+    return SolveResult(solution, status, nodes, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IDA* でスクランブルの最短解を探す")
+    parser.add_argument("scramble", help="スクランブル文字列（例: \"R U R' U'\"）")
+    parser.add_argument("--max-depth", type=int, default=20)
+    parser.add_argument("--node-limit", type=int, default=None)
+    parser.add_argument("--time-limit", type=float, default=None)
+    parser.add_argument("--pdb", action="store_true", help="構築済みのパターンデータベースを使う")
+    args = parser.parse_args()
+
+    h = None
+    if args.pdb:
+        import pattern_db
+        h = pattern_db.load_heuristic()
+    result = solve(args.scramble, h, args.max_depth, args.node_limit, args.time_limit)
+    print("status   :", result.status)
+    print("solution :", " ".join(result.solution) if result.solution is not None else None)
+    print(f"nodes    : {result.nodes} ({result.nodes_per_sec:.0f} nodes/s, {result.elapsed:.3f} s)")
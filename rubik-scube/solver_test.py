@@ -0,0 +1,37 @@
+# IDA* ソルバーのテスト
+import random
+
+import pytest
+
+import solver
+from batch import MOVE_NAMES
+from operation import scramble2state
+
+
+@pytest.fixture(scope="module")
+def heuristic(tmp_path_factory):
+    return solver.CoordinateHeuristic(str(tmp_path_factory.mktemp("tables")))
+
+
+def test_solves_random_scrambles(heuristic):
+    rng = random.Random(0)
+    for length in range(7):
+        scramble = " ".join(rng.choice(MOVE_NAMES) for _ in range(length))
+        result = solver.solve(scramble, heuristic)
+        assert result.status == "solved"
+        assert len(result.solution) <= length
+        assert solver.is_solved(scramble2state(" ".join(result.solution), scramble2state(scramble)))
+
+
+def test_pruned_sequences():
+    # 同じ面の連続と、向かい合う面の逆順は許さない
+    u, d = MOVE_NAMES.index("U"), MOVE_NAMES.index("D")
+    assert u not in solver.ALLOWED_MOVES[solver.MOVE_FACE[u] + 1]
+    assert d in solver.ALLOWED_MOVES[solver.MOVE_FACE[u] + 1]
+    assert u not in solver.ALLOWED_MOVES[solver.MOVE_FACE[d] + 1]
+
+
+def test_node_limit(heuristic):
+    result = solver.solve("R U F' D2 L B' R2 U' F2 L'", heuristic, node_limit=5)
+    assert result.status == "node_limit"
+    assert result.solution is None
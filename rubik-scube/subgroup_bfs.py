@@ -0,0 +1,281 @@
+"""
+キューブの部分群を幅優先探索で全列挙し、深さごとの状態数と（任意で）全状態の正確な距離の表を作る。
+
+部分群は coord の座標の組と使う手で決める。状態は座標の混合基数で密なインデックスにし、
+  - visited（訪問済み）、frontier（今の層）、next（次の層）はそれぞれ 1 状態 1 bit のビット集合
+  - 距離の表は 1 状態 1 バイトの .npy（未到達は UNREACHED）で、mmap で読み込んでデータセットのラベルに使える
+にする。Python の set は使わない。
+
+ビット集合は共有メモリに置き、各層をインデックスの範囲ごとにプロセスプールで分けて処理する。
+  - 上から（frontier が小さい層）: ワーカーが frontier の状態の子のうち未訪問のものを返し、メインが書き込む
+  - 下から（frontier が大きい層）: ワーカーが自分の範囲の未訪問の状態について、
+    どれかの手で frontier に行けるかを調べ、next の自分の範囲に直接書き込む（範囲が重ならないので競合しない）
+使う手の集合は逆手について閉じているので、「frontier から 1 手で来られる」と「1 手で frontier に行ける」は同じ。
+
+    python subgroup_bfs.py corners_urf --distance tables/dist_corners_urf.npy
+"""
+import argparse
+import math
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+import coord
+from batch import CP, CO, EP, EO, MOVE_NAMES
+
+# 距離の表で未到達を表す値
+UNREACHED = 0xFF
+# ワーカー 1 タスクが受け持つ状態数（8 の倍数にしてビット集合のバイト境界にそろえる）
+DEFAULT_CHUNK_STATES = 1 << 22
+# 列挙できるインデックス空間の上限。ビット集合 3 つで 768 MiB、距離の表で 2 GiB になる
+MAX_INDEX_STATES = 1 << 31
+
+
+# 座標名 -> (batch の状態配列の列, 座標を求める関数)
+_BATCH_COORDINATES = {
+    "co": (CO, coord.co_to_index),
+    "eo": (EO, coord.eo_to_index),
+    "cp": (CP, coord.cp_to_index),
+    "ud_slice": (EP, coord.ud_slice_to_index),
+    "slice_perm": (EP, coord.slice_perm_to_index),
+    "ud_edge_perm": (EP, coord.ud_edge_perm_to_index),
+}
+
+
+class Subgroup:
+    """
+    列挙する部分群。座標 coords の直積の上で、手 moves だけを使って完成状態から到達できる状態の集合。
+    """
+    def __init__(self, name: str, coords: Sequence[str], moves: Sequence[str]):
+        """
+        :param name: 部分群の名前
+        :param coords: coord.COORDINATES の座標名のリスト（インデックスは coords[0] が最上位の混合基数）
+        :param moves: 使う手の名前のリスト。逆手について閉じている必要がある
+        """
+        self.name = name
+        self.coords = tuple(coords)
+        self.moves = [MOVE_NAMES.index(m) for m in moves]
+        inverse = {m - m % 3 + 2 - m % 3 for m in self.moves}
+        if inverse != set(self.moves):
+            raise ValueError(f"手の集合が逆手について閉じていません: {moves}")
+        self.sizes = tuple(coord.COORDINATES[name][0] for name in self.coords)
+        self.size = int(np.prod(self.sizes, dtype=np.int64))
+
+    def __repr__(self):
+        return f"Subgroup({self.name!r}, {self.coords}, {[MOVE_NAMES[m] for m in self.moves]})"
+
+    def load_tables(self, table_dir: Optional[str] = None) -> List[np.ndarray]:
+        return [coord.load_move_table(name, table_dir) for name in self.coords]
+
+    def children(self, tables: List[np.ndarray], index: np.ndarray, move: int) -> np.ndarray:
+        """
+        インデックス (N,) の各状態に手 move を適用した状態のインデックス (N,) を返す。
+        """
+        digits = np.unravel_index(index, self.sizes)
+        return np.ravel_multi_index([t[d, move] for t, d in zip(tables, digits)], self.sizes)
+
+    def batch_index(self, states: np.ndarray) -> np.ndarray:
+        """
+        batch の (N, 40) 状態配列から部分群のインデックス (N,) を求める（距離の表を引くとき用）。
+        """
+        states = np.asarray(states).astype(np.int64)
+        digits = [_BATCH_COORDINATES[name][1](states[:, _BATCH_COORDINATES[name][0]]) for name in self.coords]
+        return np.ravel_multi_index(digits, self.sizes)
+
+
+# U, R, F だけを回すと DBL のコーナーが動かないので、コーナーだけ見れば 2x2x2 キューブと同じ（3,674,160 状態）
+CORNERS_URF = Subgroup("corners_urf", ["cp", "co"], ["U", "U2", "U'", "R", "R2", "R'", "F", "F2", "F'"])
+# エッジの向きだけ（2,048 状態）
+EDGE_ORIENTATION = Subgroup("eo", ["eo"], MOVE_NAMES)
+# G1 = <U, D, R2, L2, F2, B2> はインデックス空間が 8! x 8! x 4! で MAX_INDEX_STATES を大きく超えるので登録しない
+SUBGROUPS = {group.name: group for group in (CORNERS_URF, EDGE_ORIENTATION)}
+
+
+# ------------------------------------------------------------
+# ビット集合
+# ------------------------------------------------------------
+def _bits_to_index(bits: np.ndarray, offset: int) -> np.ndarray:
+    """
+    ビット集合の一部 bits（offset 番目の状態から始まる）で立っているビットの状態インデックスを返す。
+    """
+    return np.flatnonzero(np.unpackbits(bits, bitorder="little")) + offset
+
+
+def _set_bits(bits: np.ndarray, index: np.ndarray) -> None:
+    np.bitwise_or.at(bits, index >> 3, (1 << (index & 7)).astype(np.uint8))
+
+
+def _test_bits(bits: np.ndarray, index: np.ndarray) -> np.ndarray:
+    return (bits[index >> 3] >> (index & 7).astype(np.uint8)) & 1 == 1
+
+
+# ------------------------------------------------------------
+# ワーカー
+# ------------------------------------------------------------
+_worker = {}
+
+
+def _attach(name: str, n_bytes: int):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((n_bytes,), dtype=np.uint8, buffer=shm.buf)
+
+
+def _init_worker(group: Subgroup, table_dir: Optional[str], names: Sequence[str], n_bytes: int) -> None:
+    _worker["group"] = group
+    _worker["tables"] = group.load_tables(table_dir)
+    _worker["shm"] = [_attach(name, n_bytes) for name in names]
+
+
+def _top_down(args) -> np.ndarray:
+    """
+    状態 [start, stop) のうち frontier にあるものを展開し、未訪問の子を重複なしで返す。
+    """
+    start, stop = args
+    group, tables = _worker["group"], _worker["tables"]
+    (_, visited), (_, frontier), _ = _worker["shm"]
+    index = _bits_to_index(frontier[start >> 3:(stop + 7) >> 3], start)
+    index = index[index < stop]
+    if index.shape[0] == 0:
+        return index
+    children = np.concatenate([group.children(tables, index, m) for m in group.moves])
+    children = children[~_test_bits(visited, children)]
+    return np.unique(children)
+
+
+def _bottom_up(args) -> int:
+    """
+    状態 [start, stop) のうち未訪問で、どれかの手で frontier に行けるものを next に書き、その数を返す。
+    start は 8 の倍数なので、next のこのタスクのバイト範囲は他のタスクと重ならない。
+    """
+    start, stop = args
+    group, tables = _worker["group"], _worker["tables"]
+    (_, visited), (_, frontier), (_, next_bits) = _worker["shm"]
+    index = _bits_to_index(~visited[start >> 3:(stop + 7) >> 3], start)
+    index = index[index < stop]
+    found = []
+    for m in group.moves:
+        if index.shape[0] == 0:
+            break
+        hit = _test_bits(frontier, group.children(tables, index, m))
+        found.append(index[hit])
+        index = index[~hit]
+    if found:
+        found = np.concatenate(found)
+        _set_bits(next_bits, found)
+        return int(found.shape[0])
+    return 0
+
+
+# ------------------------------------------------------------
+# 列挙
+# ------------------------------------------------------------
+def enumerate_subgroup(group: Subgroup, distance_path: Optional[str] = None, processes: Optional[int] = None,
+                       chunk_states: int = DEFAULT_CHUNK_STATES, table_dir: Optional[str] = None,
+                       verbose: bool = False) -> List[int]:
+    """
+    group を完成状態から幅優先探索で全列挙し、深さごとの状態数のリスト（histogram[d] = 深さ d の状態数）を返す。
+
+    引数:
+    - group: 列挙する部分群
+    - distance_path: 指定すると全インデックスの距離の表（uint8、未到達は UNREACHED）を .npy で保存する
+    - processes: 並列数。None なら CPU コア数
+    - chunk_states: 1 タスクが受け持つ状態数（8 の倍数）
+    - table_dir: 移動表の保存先
+    - verbose: 層ごとの状態数と処理の向きを表示する
+
+    インデックス空間が MAX_INDEX_STATES を超える部分群は、メモリを確保する前に ValueError を送出する。
+    """
+    if chunk_states % 8:
+        raise ValueError("chunk_states は 8 の倍数である必要があります")
+    if group.size > MAX_INDEX_STATES:
+        raise ValueError(f"{group.name} のインデックス空間 {group.size:,} 状態は上限 {MAX_INDEX_STATES:,} を超えています")
+    n_bytes = (group.size + 7) // 8
+    segments = [shared_memory.SharedMemory(create=True, size=n_bytes) for _ in range(3)]
+    visited, frontier, next_bits = (np.ndarray((n_bytes,), dtype=np.uint8, buffer=s.buf) for s in segments)
+    distance = None
+    if distance_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(distance_path)), exist_ok=True)
+        tmp_path = f"{distance_path}.{os.getpid()}.tmp"
+        distance = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(group.size,))
+        distance[:] = UNREACHED
+
+    processes = processes or os.cpu_count() or 1
+    init_args = (group, table_dir, [s.name for s in segments], n_bytes)
+    pool = multiprocessing.Pool(processes, _init_worker, init_args) if processes > 1 else None
+    if pool is None:
+        _init_worker(*init_args)
+    tasks = [(start, min(start + chunk_states, group.size)) for start in range(0, group.size, chunk_states)]
+    try:
+        visited[:] = 0
+        frontier[:] = 0
+        next_bits[:] = 0
+        _set_bits(visited, np.array([0]))
+        _set_bits(frontier, np.array([0]))
+        if distance is not None:
+            distance[0] = 0
+        histogram = [1]
+        unvisited = group.size - 1
+        while True:
+            # frontier の子の数が未訪問の状態数より多くなったら、下から調べる方が速い
+            bottom_up = histogram[-1] * len(group.moves) > unvisited
+            mapper = pool.imap_unordered if pool is not None else map
+            if bottom_up:
+                count = sum(mapper(_bottom_up, tasks))
+            else:
+                count = 0
+                for children in mapper(_top_down, tasks):
+                    # 他のタスクが先に書いた子を除いてから書く
+                    children = children[~_test_bits(next_bits, children)]
+                    _set_bits(next_bits, children)
+                    count += children.shape[0]
+            if count == 0:
+                break
+            depth = len(histogram)
+            if distance is not None:
+                for start, stop in tasks:
+                    index = _bits_to_index(next_bits[start >> 3:(stop + 7) >> 3], start)
+                    distance[index[index < stop]] = depth
+            np.bitwise_or(visited, next_bits, out=visited)
+            frontier[:] = next_bits
+            next_bits[:] = 0
+            histogram.append(count)
+            unvisited -= count
+            if verbose:
+                print(f"{group.name}: depth {depth}: {count} states ({'bottom-up' if bottom_up else 'top-down'})")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        _worker.clear()
+        for s in segments:
+            s.close()
+            s.unlink()
+    if distance is not None:
+        distance.flush()
+        del distance
+        os.replace(tmp_path, distance_path)
+    return histogram
+
+
+def load_distance_table(path: str) -> np.ndarray:
+    """
+    enumerate_subgroup が保存した距離の表を mmap で読み込む。
+    """
+    return np.load(path, mmap_mode="r")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="部分群を幅優先探索で全列挙する")
+    parser.add_argument("group", choices=sorted(SUBGROUPS))
+    parser.add_argument("--distance", help="距離の表を保存するパス（.npy）")
+    parser.add_argument("--processes", "-p", type=int, default=None)
+    parser.add_argument("--chunk-states", type=int, default=DEFAULT_CHUNK_STATES)
+    args = parser.parse_args()
+
+    group = SUBGROUPS[args.group]
+    print(f"{group.name}: index space {group.size:,} states, bitset {math.ceil(group.size / 8):,} bytes")
+    hist = enumerate_subgroup(group, args.distance, args.processes, args.chunk_states, verbose=True)
+    print(f"total: {sum(hist):,} states, max depth {len(hist) - 1}")
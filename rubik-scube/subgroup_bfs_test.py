@@ -0,0 +1,43 @@
+# 部分群の全列挙のテスト
+import numpy as np
+import pytest
+
+import coord
+import subgroup_bfs
+from scramble_dataset import random_walk
+
+# 2x2x2 キューブ（HTM）の深さごとの状態数
+CORNERS_HISTOGRAM = [1, 9, 54, 321, 1847, 9992, 50136, 227536, 870072, 1887748, 623800, 2644]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_eo_distance_table(tmp_path, processes):
+    path = str(tmp_path / "dist_eo.npy")
+    hist = subgroup_bfs.enumerate_subgroup(subgroup_bfs.EDGE_ORIENTATION, path, processes=processes,
+                                           chunk_states=256, table_dir=str(tmp_path))
+    assert hist == [1, 2, 25, 202, 620, 900, 285, 13]
+    dist = subgroup_bfs.load_distance_table(path)
+    assert np.bincount(dist).tolist() == hist
+    # ランダムウォークの状態の距離は手数以下
+    states, depths = random_walk(1000, 1, 10, np.random.default_rng(0))
+    labels = dist[subgroup_bfs.EDGE_ORIENTATION.batch_index(states)]
+    assert (labels <= depths).all()
+
+
+def test_corners_histogram(tmp_path):
+    hist = subgroup_bfs.enumerate_subgroup(subgroup_bfs.CORNERS_URF, processes=2, table_dir=str(tmp_path))
+    assert hist == CORNERS_HISTOGRAM
+
+
+def test_too_large_subgroup_is_refused(tmp_path):
+    g1 = subgroup_bfs.Subgroup("g1", ["cp", "ud_edge_perm", "slice_perm"], coord.G1_MOVES)
+    assert "g1" not in subgroup_bfs.SUBGROUPS
+    # 共有メモリや距離の表を確保する前に断る
+    with pytest.raises(ValueError, match="上限"):
+        subgroup_bfs.enumerate_subgroup(g1, str(tmp_path / "dist_g1.npy"), processes=1, table_dir=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_moves_must_be_closed_under_inverse():
+    with pytest.raises(ValueError):
+        subgroup_bfs.Subgroup("bad", ["eo"], ["R", "U"])
@@ -0,0 +1,187 @@
+"""
+キューブの 48 個の対称性（24 個の回転と、それぞれに鏡映を合わせたもの）と、状態の正規化。
+
+対称性はシール（ピースの面）の 3 次元の位置から作る。座標系は drawing-cube と同じく
+  U = +y, D = -y, R = +x, L = -x, F = +z, B = -z
+で、各位置のシールの並び（向き 0 のときの idx 0, 1, 2）は README のナンバリングと build_moves に合わせて
+  コーナー: 0 ULB, 1 UBR, 2 URF, 3 UFL, 4 DBL, 5 DRB, 6 DFR, 7 DLF
+  エッジ  : 0 BL, 1 BR, 2 FR, 3 FL, 4 UB, 5 UR, 6 UF, 7 UL, 8 DB, 9 DR, 10 DF, 11 DL
+とする。
+
+状態 X は「位置 p の idx 番目のシールに、どのピースのどのシールがあるか」の写像とみなせる:
+  X(p, idx) = (cp[p], (idx - co[p]) % 3)
+この見方では apply_move は写像の合成になる（X.apply_move(M) = X ∘ M）。
+対称性 σ（シールの位置の置換）による共役 Y = σ ∘ X ∘ σ^-1 は
+  Y(σ(t)) = σ(X(t))
+で、完成状態は完成状態に、手は手に移る（鏡映では R が L' になるなど向きも反転する）。
+
+canonicalize は 48 個の共役のうち batch の 40 バイトの行が辞書順で最小のものを代表元として返す。
+代表元を解いた手順 m1 .. mk は map_moves_back で元の状態の手順に戻せる。
+"""
+import itertools
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from batch import CP, CO, EP, EO, MOVE_NAMES, NUM_MOVES, STATE_DTYPE, STATE_WIDTH, row_to_state, state_to_row
+from operation import build_moves
+from state import RubiksCubeState
+
+FACE_NORMALS = {"U": (0, 1, 0), "D": (0, -1, 0), "R": (1, 0, 0), "L": (-1, 0, 0), "F": (0, 0, 1), "B": (0, 0, -1)}
+CORNER_SLOTS = ["ULB", "UBR", "URF", "UFL", "DBL", "DRB", "DFR", "DLF"]
+EDGE_SLOTS = ["BL", "BR", "FR", "FL", "UB", "UR", "UF", "UL", "DB", "DR", "DF", "DL"]
+
+NUM_SYMMETRIES = 48
+# SYMMETRY_MATRICES の先頭 24 個が回転（行列式 +1）、残りが鏡映を含むもの。0 番は恒等変換
+NUM_ROTATIONS = 24
+
+
+def _symmetry_matrices() -> np.ndarray:
+    """
+    符号付きの置換行列 48 個（立方体を自分自身に移す直交変換のすべて）。回転を先に並べる。
+    """
+    matrices = []
+    for axes in itertools.permutations(range(3)):
+        for signs in itertools.product((1, -1), repeat=3):
+            m = np.zeros((3, 3), dtype=np.int64)
+            m[range(3), axes] = signs
+            matrices.append(m)
+    matrices.sort(key=lambda m: round(np.linalg.det(m)) < 0)
+    return np.array(matrices)
+
+
+def _slot_vectors(slots: Sequence[str]) -> List[Tuple[tuple, tuple]]:
+    """
+    シール t = len(name) * p + idx の (ピースの中心, シールの法線)。
+    """
+    vectors = []
+    for name in slots:
+        center = tuple(int(v) for v in np.sum([FACE_NORMALS[f] for f in name], axis=0))
+        for face in name:
+            vectors.append((center, FACE_NORMALS[face]))
+    return vectors
+
+
+def _slot_permutation(matrix: np.ndarray, slots: Sequence[str]) -> np.ndarray:
+    """
+    変換 matrix でシール t が移る先のシール番号の配列。
+    """
+    vectors = _slot_vectors(slots)
+    where = {v: t for t, v in enumerate(vectors)}
+    return np.array([where[(tuple(int(x) for x in matrix @ c), tuple(int(x) for x in matrix @ n))]
+                     for c, n in vectors], dtype=np.intp)
+
+
+SYMMETRY_MATRICES = _symmetry_matrices()
+# SYM_CORNER[s, t]: 対称性 s でコーナーのシール t（= 3 * 位置 + idx）が移る先。エッジも同様（2 * 位置 + idx）
+SYM_CORNER = np.array([_slot_permutation(m, CORNER_SLOTS) for m in SYMMETRY_MATRICES])
+SYM_EDGE = np.array([_slot_permutation(m, EDGE_SLOTS) for m in SYMMETRY_MATRICES])
+_SYM_CORNER_INV = np.argsort(SYM_CORNER, axis=1)
+_SYM_EDGE_INV = np.argsort(SYM_EDGE, axis=1)
+# INVERSE_SYMMETRY[s]: s の逆変換の番号（直交行列なので転置）
+INVERSE_SYMMETRY = np.array([next(j for j, n in enumerate(SYMMETRY_MATRICES) if (n == m.T).all())
+                             for m in SYMMETRY_MATRICES])
+
+
+def _conjugate_part(perm: np.ndarray, ori: np.ndarray, sym: np.ndarray, sym_inv: np.ndarray,
+                    symmetries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    位置 (N, n) と向き (N, n) の部分（コーナーかエッジ）を、symmetries (K,) のそれぞれで共役にする。
+    戻り値は (N, K, n) の位置と向き。
+    """
+    n = perm.shape[1]
+    base = sym.shape[1] // n
+    idx = np.arange(base)
+    # X をシールの写像 (N, n * base) にする
+    x = (perm[:, :, None] * base + (idx - ori[:, :, None]) % base).reshape(perm.shape[0], n * base)
+    # Y[s] = σ(X(σ^-1(s)))
+    k = np.arange(len(symmetries))[None, :, None]
+    y = sym[symmetries][k, x[:, sym_inv[symmetries]]]
+    head = y[:, :, 0::base]
+    return head // base, (-head) % base
+
+
+def conjugate_rows(states: np.ndarray, symmetries: Sequence[int] = range(NUM_SYMMETRIES)) -> np.ndarray:
+    """
+    batch の (N, 40) 状態配列を symmetries (K,) のそれぞれで共役にした (N, K, 40) 配列を返す。
+    """
+    states = np.asarray(states).reshape(-1, STATE_WIDTH).astype(np.intp)
+    symmetries = np.asarray(symmetries, dtype=np.intp)
+    out = np.empty((states.shape[0], symmetries.shape[0], STATE_WIDTH), dtype=STATE_DTYPE)
+    out[..., CP], out[..., CO] = _conjugate_part(states[:, CP], states[:, CO], SYM_CORNER, _SYM_CORNER_INV,
+                                                 symmetries)
+    out[..., EP], out[..., EO] = _conjugate_part(states[:, EP], states[:, EO], SYM_EDGE, _SYM_EDGE_INV, symmetries)
+    return out
+
+
+def conjugate(state: RubiksCubeState, symmetry: int) -> RubiksCubeState:
+    """
+    state を対称性 symmetry で共役にした状態を返す。
+    """
+    return row_to_state(conjugate_rows(state_to_row(state)[None], [symmetry])[0, 0])
+
+
+def _move_conjugates() -> np.ndarray:
+    """
+    MOVE_CONJUGATE[s, m]: 手 m を対称性 s で共役にした手の番号。
+    """
+    moves, _ = build_moves()
+    rows = np.stack([state_to_row(moves[name]) for name in MOVE_NAMES])
+    index = {row.tobytes(): m for m, row in enumerate(rows)}
+    conjugated = conjugate_rows(rows)
+    table = np.empty((NUM_SYMMETRIES, NUM_MOVES), dtype=np.intp)
+    for m in range(NUM_MOVES):
+        for s in range(NUM_SYMMETRIES):
+            table[s, m] = index[conjugated[m, s].tobytes()]
+    return table
+
+
+MOVE_CONJUGATE = _move_conjugates()
+
+# 行を 4 bit ずつ 16 列ごとに詰めた整数で辞書順に比べる（値はすべて 16 未満）
+_PACK_SHIFTS = np.arange(60, -4, -4, dtype=np.uint64)
+
+
+def _lexicographic_argmin(candidates: np.ndarray) -> np.ndarray:
+    """
+    (N, K, 40) の候補のうち、行が辞書順で最小のものの番号 (N,) を返す。
+    """
+    n, k, _ = candidates.shape
+    alive = np.ones((n, k), dtype=bool)
+    for start in range(0, STATE_WIDTH, 16):
+        part = candidates[..., start:start + 16].astype(np.uint64)
+        key = (part << _PACK_SHIFTS[16 - part.shape[-1]:]).sum(axis=-1)
+        key = np.where(alive, key, np.iinfo(np.uint64).max)
+        alive &= key == key.min(axis=1, keepdims=True)
+    return np.argmax(alive, axis=1)
+
+
+def canonicalize_rows(states: np.ndarray, mirror: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    batch の (N, 40) 状態配列の代表元 (N, 40) と、代表元を得るのに使った対称性の番号 (N,) を返す。
+    代表元 = conjugate_rows(states, [symmetry]) で、対称な状態はすべて同じ代表元になる。
+
+    引数:
+    - mirror: False なら回転 24 個だけで正規化する
+    """
+    count = NUM_SYMMETRIES if mirror else NUM_ROTATIONS
+    candidates = conjugate_rows(states, range(count))
+    best = _lexicographic_argmin(candidates)
+    return candidates[np.arange(candidates.shape[0]), best], best
+
+
+def canonicalize(state: RubiksCubeState, mirror: bool = True) -> Tuple[RubiksCubeState, int]:
+    """
+    state の代表元と、代表元を得るのに使った対称性の番号を返す。
+    """
+    rows, symmetries = canonicalize_rows(state_to_row(state)[None], mirror)
+    return row_to_state(rows[0]), int(symmetries[0])
+
+
+def map_moves_back(moves: Sequence[str], symmetry: int) -> List[str]:
+    """
+    代表元 conjugate(state, symmetry) に対する手順を、state に対する手順に戻す。
+    （σ X σ^-1 に m1 .. mk を適用して完成するなら、X には σ^-1 m1 σ .. σ^-1 mk σ を適用すればよい）
+    """
+    inverse = INVERSE_SYMMETRY[symmetry]
+    return [MOVE_NAMES[MOVE_CONJUGATE[inverse, MOVE_NAMES.index(m)]] for m in moves]
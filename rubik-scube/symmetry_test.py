@@ -0,0 +1,65 @@
+# 48 個の対称性と正規化のテスト
+import random
+
+import numpy as np
+
+import symmetry
+from batch import MOVE_NAMES, state_to_row
+from operation import SOLVED_STATE, build_moves, scramble2state
+from solver import is_solved
+
+
+def _random_state(rng, length=20):
+    return scramble2state(" ".join(rng.choice(MOVE_NAMES) for _ in range(length)))
+
+
+def _row(state):
+    return state_to_row(state).tolist()
+
+
+def test_solved_is_fixed_and_moves_map_to_moves():
+    for s in range(symmetry.NUM_SYMMETRIES):
+        assert _row(symmetry.conjugate(SOLVED_STATE, s)) == _row(SOLVED_STATE)
+    # 各対称性は 18 手の置換になる
+    assert all(sorted(row) == list(range(18)) for row in symmetry.MOVE_CONJUGATE.tolist())
+    # U を U に移す回転は y 軸まわりの 4 個。鏡映は回す向きが反転する
+    assert sum(MOVE_NAMES[symmetry.MOVE_CONJUGATE[s, 0]] == "U" for s in range(24)) == 4
+    assert MOVE_NAMES[symmetry.MOVE_CONJUGATE[24, 0]] == "U'"
+
+
+def test_conjugation_is_a_homomorphism():
+    rng = random.Random(0)
+    moves, _ = build_moves()
+    for s in range(symmetry.NUM_SYMMETRIES):
+        state = _random_state(rng)
+        move = moves[rng.choice(MOVE_NAMES)]
+        left = symmetry.conjugate(state.apply_move(move), s)
+        right = symmetry.conjugate(state, s).apply_move(symmetry.conjugate(move, s))
+        assert _row(left) == _row(right)
+        back = symmetry.conjugate(symmetry.conjugate(state, s), symmetry.INVERSE_SYMMETRY[s])
+        assert _row(back) == _row(state)
+
+
+def test_canonicalize_is_invariant():
+    rng = random.Random(1)
+    for _ in range(20):
+        state = _random_state(rng)
+        canonical, _ = symmetry.canonicalize(state)
+        other, _ = symmetry.canonicalize(symmetry.conjugate(state, rng.randrange(48)))
+        assert _row(canonical) == _row(other)
+    # 1 手の状態は 90 度回しと 180 度回しの 2 種類にまとまる
+    one_move = np.stack([state_to_row(scramble2state(m)) for m in MOVE_NAMES])
+    rows, _ = symmetry.canonicalize_rows(one_move)
+    assert len({r.tobytes() for r in rows}) == 2
+
+
+def test_map_moves_back():
+    rng = random.Random(2)
+    scramble = [rng.choice(MOVE_NAMES) for _ in range(15)]
+    state = scramble2state(" ".join(scramble))
+    canonical, s = symmetry.canonicalize(state)
+    # 元の状態の解（スクランブルの逆手順）を代表元の解に移し、map_moves_back で戻す
+    solution = [m[0] if m.endswith("'") else m if m.endswith("2") else m + "'" for m in reversed(scramble)]
+    canonical_solution = [MOVE_NAMES[symmetry.MOVE_CONJUGATE[s, MOVE_NAMES.index(m)]] for m in solution]
+    assert is_solved(scramble2state(" ".join(canonical_solution), canonical))
+    assert symmetry.map_moves_back(canonical_solution, s) == solution
@@ -0,0 +1,350 @@
+"""
+2 フェーズ法（Kociemba 法）による高速な準最適ソルバー。
+
+- フェーズ 1: co, eo, ud_slice をすべて 0 にして <U, D, R2, L2, F2, B2> (G1) に入れる
+- フェーズ 2: G1 の 10 手だけで cp, ud_edge_perm, slice_perm を揃える
+
+各フェーズは coord の移動表と枝刈り表だけを引いて探索する。
+最初の解が見つかった後も、締め切りまでフェーズ 1 を深くしながらより短い解を探し続ける。
+
+既知の限界: 純粋な Python なので 1 コアで 1 問 0.1 秒ほどかかる（ミリ秒単位にはならない）。
+`python two_phase.py --bench 10000 --time-limit 1.0`（25 手のランダムなスクランブル 10,000 問、
+target_length 22）で 10,000 問すべて解け、111.5 ms/cube（9.0 cubes/s）、平均 21.34 手、最長 23 手。
+時間の大半は、フェーズ 2 の距離が MAX_PHASE2_DEPTH を超えるフェーズ 1 の解で失敗するフェーズ 2 の探索にかかる。
+スループットが必要なら batch_solve でプロセスを並べる。
+"""
+import argparse
+import random
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Union
+
+import coord
+import instrument
+from batch import MOVE_NAMES, NUM_MOVES
+from operation import build_moves, scramble2state
+from solver import ALLOWED_MOVES, MOVE_FACE, SolveResult
+from state import RubiksCubeState
+
+N_SLICE = 495
+N_SLICE_PERM = 24
+N_UD_EDGE_PERM = 40320
+# フェーズ 2 で使う手（G1 を生成する 10 手）
+PHASE2_MOVES = set(coord.G1_MOVE_INDICES)
+PHASE2_ALLOWED = [[m for m in moves if m in PHASE2_MOVES] for moves in ALLOWED_MOVES]
+# フェーズ 2 の手数の上限。G1 の直径は 18 だが、深いフェーズ 2 は探索が重いので
+# 短いフェーズ 2 で済むフェーズ 1 の解を優先する
+MAX_PHASE2_DEPTH = 12
+# 完成状態からこの手数以内の G1 の状態は距離を辞書で持ち、フェーズ 2 の探索の末端を表引きで済ませる。
+# 6 手以内は約 15 万状態（作るのに 0.5 秒ほど）。失敗するフェーズ 2 の探索の大半は末端の数手で占められる
+PHASE2_TABLE_DEPTH = 6
+
+
+def _flat(table, typecode: str) -> array:
+    """
+    NumPy の表を Python の array に詰め直す。1 要素ずつ引くときは NumPy より速い。
+    """
+    return array(typecode, table.tobytes())
+
+
+class _Timeout(Exception):
+    pass
+
+
+class TwoPhaseSolver:
+    """
+    移動表と枝刈り表を読み込んだ 2 フェーズ法ソルバー。
+    表の読み込みは生成時の 1 回だけなので、プロセスごとに 1 つ作って使い回す。
+    """
+    def __init__(self, table_dir: Optional[str] = None):
+        tables = coord.load_move_tables(table_dir)
+        self.co_move = _flat(tables["co"], "H")
+        self.eo_move = _flat(tables["eo"], "H")
+        self.slice_move = _flat(tables["ud_slice"], "H")
+        self.cp_move = _flat(tables["cp"], "H")
+        self.ep8_move = _flat(tables["ud_edge_perm"], "H")
+        self.sp_move = _flat(tables["slice_perm"], "H")
+        self.co_slice_prune = _flat(coord.load_pruning_table(["co", "ud_slice"], table_dir=table_dir), "b")
+        self.eo_slice_prune = _flat(coord.load_pruning_table(["eo", "ud_slice"], table_dir=table_dir), "b")
+        g1 = coord.G1_MOVE_INDICES
+        self.cp_sp_prune = _flat(coord.load_pruning_table(["cp", "slice_perm"], g1, table_dir), "b")
+        self.ep8_sp_prune = _flat(coord.load_pruning_table(["ud_edge_perm", "slice_perm"], g1, table_dir), "b")
+        moves, _ = build_moves()
+        self.move_states = [moves[name] for name in MOVE_NAMES]
+        self.phase2_near = self._build_phase2_near(PHASE2_TABLE_DEPTH)
+
+    def _build_phase2_near(self, depth: int) -> Dict[int, int]:
+        """
+        完成状態から depth 手以内の G1 の状態の {(cp, ud_edge_perm, slice_perm) のキー: 手数} を幅優先探索で作る。
+        キーは (cp * N_UD_EDGE_PERM + ep8) * N_SLICE_PERM + sp。
+        """
+        cp_move, ep8_move, sp_move = self.cp_move, self.ep8_move, self.sp_move
+        near = {0: 0}
+        frontier = [0]
+        for d in range(1, depth + 1):
+            next_frontier = []
+            for key in frontier:
+                cp, rest = divmod(key, N_UD_EDGE_PERM * N_SLICE_PERM)
+                ep8, sp = divmod(rest, N_SLICE_PERM)
+                for m in coord.G1_MOVE_INDICES:
+                    child = ((cp_move[cp * NUM_MOVES + m] * N_UD_EDGE_PERM + ep8_move[ep8 * NUM_MOVES + m])
+                             * N_SLICE_PERM + sp_move[sp * NUM_MOVES + m])
+                    if child not in near:
+                        near[child] = d
+                        next_frontier.append(child)
+            frontier = next_frontier
+        return near
+
+    def _phase1_h(self, co: int, eo: int, sl: int) -> int:
+        a = self.co_slice_prune[co * N_SLICE + sl]
+        b = self.eo_slice_prune[eo * N_SLICE + sl]
+        return a if a > b else b
+
+    def _phase2_h(self, cp: int, ep8: int, sp: int) -> int:
+        a = self.cp_sp_prune[cp * N_SLICE_PERM + sp]
+        b = self.ep8_sp_prune[ep8 * N_SLICE_PERM + sp]
+        return a if a > b else b
+
+    def solve(self, target: Union[RubiksCubeState, str], time_limit: Optional[float] = None,
+              deadline: Optional[float] = None, target_length: Optional[int] = None,
+              max_length: int = 30) -> SolveResult:
+        """
+        target を解く手順を探す。
+
+        引数:
+        - target: RubiksCubeState またはスクランブル文字列
+        - time_limit: 探索時間の上限（秒）
+        - deadline: 探索を打ち切る時刻（time.perf_counter() の値）。time_limit と両方あれば早い方
+        - target_length: この手数以下の解が見つかった時点で終了する
+        - max_length: 受け付ける解の最大手数
+
+        締め切りも target_length も無い場合は、2 フェーズ法で見つかる最短の解まで探し続ける。
+        status は締め切りで探索を打ち切ったら 'time_limit'（solution はそれまでに見つかった最良の解か None）、
+        打ち切らずに終えて解があれば 'solved'、max_length 以内に無ければ 'not_found'。
+        """
+        if isinstance(target, str):
+            target = scramble2state(target)
+        start = time.perf_counter()
+        if time_limit is not None:
+            limit = start + time_limit
+            deadline = limit if deadline is None else min(deadline, limit)
+
+        co_move, eo_move, slice_move = self.co_move, self.eo_move, self.slice_move
+        cp_move, ep8_move, sp_move = self.cp_move, self.ep8_move, self.sp_move
+        move_states = self.move_states
+        co_slice_prune, eo_slice_prune = self.co_slice_prune, self.eo_slice_prune
+        cp_sp_prune, ep8_sp_prune = self.cp_sp_prune, self.ep8_sp_prune
+        phase1_h = self._phase1_h
+        phase2_h = self._phase2_h
+        near = self.phase2_near
+        rec = instrument.current()
+        phase2_seconds = 0.0
+
+        path: List[int] = []
+        best: Optional[List[int]] = None
+        best_len = max_length + 1
+        nodes = 0
+
+        def check_deadline():
+            if deadline is not None and time.perf_counter() > deadline:
+                raise _Timeout()
+
+        def finish_phase2(cp: int, ep8: int, sp: int, dist: int, prev_face: int) -> bool:
+            # 表の距離が 1 ずつ減る手をたどる。前の手と同じ面の手しか無ければ失敗にする
+            depth = len(path)
+            while dist > 0:
+                for m in PHASE2_ALLOWED[prev_face + 1]:
+                    ncp = cp_move[cp * NUM_MOVES + m]
+                    nep8 = ep8_move[ep8 * NUM_MOVES + m]
+                    nsp = sp_move[sp * NUM_MOVES + m]
+                    if near.get((ncp * N_UD_EDGE_PERM + nep8) * N_SLICE_PERM + nsp) == dist - 1:
+                        path.append(m)
+                        cp, ep8, sp, dist, prev_face = ncp, nep8, nsp, dist - 1, MOVE_FACE[m]
+                        break
+                else:
+                    del path[depth:]
+                    return False
+            return True
+
+        def phase2(cp: int, ep8: int, sp: int, togo: int, prev_face: int) -> bool:
+            nonlocal nodes
+            if togo <= PHASE2_TABLE_DEPTH:
+                # 残りが表の手数以内なら、探索せずに表の距離で決める
+                dist = near.get((cp * N_UD_EDGE_PERM + ep8) * N_SLICE_PERM + sp)
+                return dist is not None and dist <= togo and finish_phase2(cp, ep8, sp, dist, prev_face)
+            nodes += 1
+            if nodes & 0x3FF == 0:
+                check_deadline()
+            for m in PHASE2_ALLOWED[prev_face + 1]:
+                ncp = cp_move[cp * NUM_MOVES + m]
+                nep8 = ep8_move[ep8 * NUM_MOVES + m]
+                nsp = sp_move[sp * NUM_MOVES + m]
+                # 枝刈り表の引き方は _phase2_h と同じ（呼び出しを省くために展開している）
+                if (cp_sp_prune[ncp * N_SLICE_PERM + nsp] >= togo
+                        or ep8_sp_prune[nep8 * N_SLICE_PERM + nsp] >= togo):
+                    continue
+                path.append(m)
+                if phase2(ncp, nep8, nsp, togo - 1, MOVE_FACE[m]):
+                    return True
+                path.pop()
+            return False
+
+        def start_phase2(depth1: int) -> None:
+            nonlocal best, best_len
+            # フェーズ 1 の手順を実際に適用して、フェーズ 2 の座標を求める
+            state = target
+            for m in path:
+                state = state.apply_move(move_states[m])
+            cp = coord.cp_to_index(state.cp)
+            ep8 = coord.ud_edge_perm_to_index(state.ep)
+            sp = coord.slice_perm_to_index(state.ep)
+            prev_face = MOVE_FACE[path[-1]] if path else -1
+            limit = min(best_len - 1 - depth1, MAX_PHASE2_DEPTH)
+            togo = phase2_h(cp, ep8, sp)
+            while togo <= limit:
+                if phase2(cp, ep8, sp, togo, prev_face):
+                    best = list(path)
+                    best_len = len(best)
+                    del path[depth1:]
+                    return
+                togo += 1
+
+        if rec is not None:
+            # 計測するときだけ時間を測る版に差し替える（計測しないときは呼び出しが増えない）
+            untimed_phase2 = start_phase2
+
+            def start_phase2(depth1: int) -> None:
+                nonlocal phase2_seconds
+                t0 = time.perf_counter()
+                try:
+                    untimed_phase2(depth1)
+                finally:
+                    phase2_seconds += time.perf_counter() - t0
+                    rec.count("move_applications", depth1)
+                    rec.observe("phase1_depth", depth1)
+
+        def phase1(co: int, eo: int, sl: int, togo: int, prev_face: int) -> bool:
+            """
+            戻り値が True なら探索を終了する（target_length 以下の解が見つかった）。
+            """
+            nonlocal nodes
+            if togo == 0:
+                # G1 の手で終わるフェーズ 1 は、より短いフェーズ 1 で既に試している
+                if path and path[-1] in PHASE2_MOVES:
+                    return False
+                start_phase2(len(path))
+                return target_length is not None and best_len <= target_length
+            nodes += 1
+            if nodes & 0x3FF == 0:
+                check_deadline()
+            for m in ALLOWED_MOVES[prev_face + 1]:
+                nco = co_move[co * NUM_MOVES + m]
+                neo = eo_move[eo * NUM_MOVES + m]
+                nsl = slice_move[sl * NUM_MOVES + m]
+                h = co_slice_prune[nco * N_SLICE + nsl]
+                h2 = eo_slice_prune[neo * N_SLICE + nsl]
+                if h2 > h:
+                    h = h2
+                if h >= togo or (h == 0 and togo > 1):
+                    continue
+                path.append(m)
+                if phase1(nco, neo, nsl, togo - 1, MOVE_FACE[m]):
+                    return True
+                path.pop()
+            return False
+
+        co = coord.co_to_index(target.co)
+        eo = coord.eo_to_index(target.eo)
+        sl = coord.ud_slice_to_index(target.ep)
+        timed_out = False
+        try:
+            # 締め切りを過ぎていれば 1 ノードも展開しない
+            check_deadline()
+            depth1 = phase1_h(co, eo, sl)
+            while depth1 < best_len:
+                if phase1(co, eo, sl, depth1, -1):
+                    break
+                depth1 += 1
+        except _Timeout:
+            timed_out = True
+        if rec is not None:
+            rec.count("node_expansions", nodes)
+            rec.add_time("phase1", time.perf_counter() - start - phase2_seconds)
+            rec.add_time("phase2", phase2_seconds)
+            if best is not None:
+                rec.observe("solution_length", len(best))
+        if timed_out:
+            status = "time_limit"
+        else:
+            status = "solved" if best is not None else "not_found"
+        solution = [MOVE_NAMES[m] for m in best] if best is not None else None
+        return SolveResult(solution, status, nodes, time.perf_counter() - start)
+
+    def solve_batch(self, targets: Iterable[Union[RubiksCubeState, str]], time_limit: Optional[float] = None,
+                    target_length: Optional[int] = 22, max_length: int = 30) -> List[SolveResult]:
+        """
+        複数の状態をまとめて解く。time_limit は 1 状態あたりの上限。
+        """
+        return [self.solve(t, time_limit=time_limit, target_length=target_length, max_length=max_length)
+                for t in targets]
+
+
+_default_solver: Optional[TwoPhaseSolver] = None
+_default_table_dir: Optional[str] = None
+
+
+def get_solver(table_dir: Optional[str] = None) -> TwoPhaseSolver:
+    """
+    プロセス内で共有する TwoPhaseSolver を返す（初回と、前回と違う table_dir を渡したときだけ表を読み込む）。
+    """
+    global _default_solver, _default_table_dir
+    if _default_solver is None or (table_dir is not None and table_dir != _default_table_dir):
+        _default_solver = TwoPhaseSolver(table_dir)
+        _default_table_dir = table_dir
+    return _default_solver
+
+
+def solve(target: Union[RubiksCubeState, str], time_limit: Optional[float] = 1.0,
+          deadline: Optional[float] = None, target_length: Optional[int] = 22,
+          max_length: int = 30) -> SolveResult:
+    """
+    共有の TwoPhaseSolver で target を解く。引数は TwoPhaseSolver.solve と同じだが、
+    既定では 1 秒か 22 手以下の解が見つかった時点で終わる（どちらも None にすると探し尽くすまで終わらない）。
+    """
+    return get_solver().solve(target, time_limit, deadline, target_length, max_length)
+
+
+def random_scrambles(n: int, length: int = 25, seed: int = 0) -> List[str]:
+    """
+    固定シードのランダムなスクランブル文字列を n 個作る。
+    """
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(MOVE_NAMES) for _ in range(length)) for _ in range(n)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="2 フェーズ法でスクランブルを解く")
+    parser.add_argument("scramble", nargs="?", help="スクランブル文字列。省略すると --bench を実行する")
+    parser.add_argument("--time-limit", type=float, default=None, help="1 問あたりの探索時間の上限（秒）")
+    parser.add_argument("--target-length", type=int, default=22, help="この手数以下の解で探索を終える")
+    parser.add_argument("--bench", type=int, default=10000, help="ランダムなスクランブルを解く個数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    solver = get_solver()
+    if args.scramble:
+        result = solver.solve(args.scramble, time_limit=args.time_limit, target_length=args.target_length)
+        print("status   :", result.status)
+        print("solution :", " ".join(result.solution) if result.solution is not None else None)
+        print(f"length   : {len(result.solution) if result.solution else None} ({result.elapsed * 1000:.1f} ms)")
+    else:
+        scrambles = random_scrambles(args.bench, seed=args.seed)
+        t0 = time.perf_counter()
+        results = solver.solve_batch(scrambles, time_limit=args.time_limit, target_length=args.target_length)
+        elapsed = time.perf_counter() - t0
+        lengths = [len(r.solution) for r in results if r.solution is not None]
+        print(f"solved   : {len(lengths)} / {len(results)}")
+        print(f"time     : {elapsed:.2f} s ({len(results) / elapsed:.1f} cubes/s, "
+              f"{elapsed / len(results) * 1000:.2f} ms/cube)")
+        if lengths:
+            print(f"length   : mean {sum(lengths) / len(lengths):.2f}, max {max(lengths)}")
@@ -0,0 +1,65 @@
+# 2 フェーズ法ソルバーのテスト
+import inspect
+
+import pytest
+
+import two_phase
+from operation import scramble2state
+from solver import is_solved
+
+
+@pytest.fixture(scope="module")
+def solver(tmp_path_factory):
+    return two_phase.TwoPhaseSolver(str(tmp_path_factory.mktemp("tables")))
+
+
+def test_solves_random_scrambles(solver):
+    for scramble in two_phase.random_scrambles(5, seed=1):
+        result = solver.solve(scramble, target_length=22)
+        assert result.status == "solved"
+        assert len(result.solution) <= 22
+        assert is_solved(scramble2state(" ".join(result.solution), scramble2state(scramble)))
+
+
+def test_short_scramble_is_solved_short(solver):
+    result = solver.solve("R U2 F'")
+    assert result.solution == ["F", "U2", "R'"]
+
+
+def test_solved_state(solver):
+    result = solver.solve("")
+    assert result.status == "solved"
+    assert result.solution == []
+
+
+def test_deadline_before_any_solution(solver):
+    # 締め切りを過ぎていれば探索せずに 'time_limit' で、解は無い
+    result = solver.solve(two_phase.random_scrambles(1, seed=2)[0], time_limit=0.0)
+    assert result.status == "time_limit"
+    assert result.solution is None and result.nodes == 0
+
+
+def test_deadline_returns_best_solution_so_far(solver):
+    # target_length が無いので最短の解まで探し続け、その前に締め切りで打ち切られる
+    scramble = two_phase.random_scrambles(1, seed=2)[0]
+    result = solver.solve(scramble, time_limit=2.0)
+    assert result.status == "time_limit"
+    assert result.solution is not None
+    assert is_solved(scramble2state(" ".join(result.solution), scramble2state(scramble)))
+
+
+def test_module_solve_has_finite_defaults():
+    defaults = inspect.signature(two_phase.solve).parameters
+    assert defaults["time_limit"].default is not None
+    assert defaults["target_length"].default is not None
+
+
+def test_phase2_near_table_matches_pruning(solver):
+    near = solver.phase2_near
+    assert near[0] == 0
+    assert max(near.values()) == two_phase.PHASE2_TABLE_DEPTH
+    for key, dist in list(near.items())[::997]:
+        cp, rest = divmod(key, two_phase.N_UD_EDGE_PERM * two_phase.N_SLICE_PERM)
+        ep8, sp = divmod(rest, two_phase.N_SLICE_PERM)
+        # 枝刈り表は下界なので、表の距離を超えない
+        assert solver._phase2_h(cp, ep8, sp) <= dist
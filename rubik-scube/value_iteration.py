@@ -0,0 +1,196 @@
+"""
+近似価値反復（DeepCubeA の DAVI）の学習データを作るパイプライン。
+
+  1. 生成: ワーカープロセスがランダムウォークでスクランブルされた状態のバッチを作り、上限付きのキューに入れる
+  2. 展開: メインプロセスがバッチの全状態の 18 手分の子を batch.expand_array でまとめて作る
+  3. 評価: 差し替え可能な価値関数 V を子のバッチに対して 1 回だけ呼ぶ
+  4. 目標: target = min_m (1 + V(child_m))。完成状態の子は V = 0、完成状態自身の target は 0
+
+(状態, target) のバッチを順に返し、各段の処理速度（states/sec）を PipelineStats に記録する。
+生成がボトルネックならメインのキュー待ちの時間が、評価がボトルネックならキューが満杯の時間が増える。
+GPU は使わず CPU だけで動く。
+"""
+import argparse
+import multiprocessing
+import queue
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+import instrument
+from batch import NUM_MOVES, STATE_WIDTH, expand_array
+from bwas import SOLVED_ROW, misplaced_heuristic
+from scramble_dataset import random_walk
+
+ValueFunction = Callable[[np.ndarray], np.ndarray]
+
+# 段の名前（表示順）
+STAGES = ("generate", "queue_wait", "expand", "evaluate", "target")
+
+
+class PipelineStats:
+    """
+    段ごとの処理時間と状態数。generate はワーカーの処理時間の合計をワーカー数で割って並列の速度にする。
+    """
+    def __init__(self, workers: int = 1):
+        self.workers = max(workers, 1)
+        self.seconds: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self.states = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] += seconds
+
+    def rates(self) -> Dict[str, float]:
+        """
+        {段: states/sec}。queue_wait はメインがキューを待った時間に対する値（大きいほど待っていない）。
+        """
+        rates = {}
+        for stage, seconds in self.seconds.items():
+            if stage == "generate":
+                seconds /= self.workers
+            rates[stage] = self.states / seconds if seconds > 0 else float("inf")
+        rates["total"] = self.states / (time.perf_counter() - self.started)
+        return rates
+
+    def report(self) -> str:
+        lines = [f"{self.states} states in {self.batches} batches"]
+        for stage, rate in self.rates().items():
+            seconds = self.seconds.get(stage, time.perf_counter() - self.started)
+            lines.append(f"  {stage:<10} {rate:>14,.0f} states/s  ({seconds:.2f} s)")
+        return "\n".join(lines)
+
+
+def bellman_targets(states: np.ndarray, value_fn: ValueFunction,
+                    stats: Optional[PipelineStats] = None) -> np.ndarray:
+    """
+    (N, 40) の状態のベルマン目標 min_m (1 + V(child_m)) を (N,) で返す。value_fn は 1 回だけ呼ぶ。
+    """
+    t0 = time.perf_counter()
+    children = expand_array(states)
+    t1 = time.perf_counter()
+    values = np.asarray(value_fn(children), dtype=np.float32).reshape(-1)
+    t2 = time.perf_counter()
+    values[(children == SOLVED_ROW).all(axis=1)] = 0.0
+    targets = (1.0 + values.reshape(-1, NUM_MOVES)).min(axis=1)
+    targets[(states == SOLVED_ROW).all(axis=1)] = 0.0
+    rec = instrument.current()
+    if rec is not None:
+        rec.count("move_applications", children.shape[0])
+        rec.count("heuristic_evals", children.shape[0])
+        rec.add_time("expand", t1 - t0)
+        rec.add_time("evaluate", t2 - t1)
+    if stats is not None:
+        stats.add("expand", t1 - t0)
+        stats.add("evaluate", t2 - t1)
+        stats.add("target", time.perf_counter() - t2)
+    return targets
+
+
+def _generate(out: multiprocessing.Queue, num_batches: int, batch_size: int, min_depth: int, max_depth: int,
+              seed: np.random.SeedSequence) -> None:
+    """
+    ワーカー: num_batches 個のバッチを作って (状態, 生成にかかった秒数) をキューに入れ、最後に None を入れる。
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(num_batches):
+        t0 = time.perf_counter()
+        states, _ = random_walk(batch_size, min_depth, max_depth, rng)
+        out.put((states, time.perf_counter() - t0))
+    out.put(None)
+
+
+def run_pipeline(value_fn: Optional[ValueFunction] = None, num_batches: int = 10, batch_size: int = 10000,
+                 min_depth: int = 1, max_depth: int = 30, processes: Optional[int] = None, queue_size: int = 8,
+                 seed: int = 0, stats: Optional[PipelineStats] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (状態 (batch_size, 40), target (batch_size,)) のバッチを num_batches 個返すジェネレータ。
+
+    引数:
+    - value_fn: (M, 40) の状態 -> (M,) の推定手数。None なら bwas.misplaced_heuristic
+    - batch_size: 1 バッチの状態数。value_fn は 1 バッチにつき batch_size * 18 状態で 1 回呼ばれる
+    - min_depth / max_depth: スクランブル手数の範囲
+    - processes: 生成ワーカーの数。0 ならメインプロセスで生成する。None なら CPU コア数 - 1（最低 1）
+    - queue_size: ワーカーとメインの間のキューに溜めるバッチ数の上限
+    - seed: 乱数の種（ワーカーごとに SeedSequence.spawn で分ける）
+    - stats: 段ごとの速度を記録する PipelineStats
+    """
+    value_fn = value_fn or misplaced_heuristic
+    if processes is None:
+        processes = max((multiprocessing.cpu_count() or 1) - 1, 1)
+    if stats is None:
+        stats = PipelineStats(processes)
+    seeds = np.random.SeedSequence(seed).spawn(max(processes, 1))
+
+    if processes == 0:
+        rng = np.random.default_rng(seeds[0])
+        for _ in range(num_batches):
+            t0 = time.perf_counter()
+            states, _ = random_walk(batch_size, min_depth, max_depth, rng)
+            stats.add("generate", time.perf_counter() - t0)
+            targets = bellman_targets(states, value_fn, stats)
+            stats.states += states.shape[0]
+            stats.batches += 1
+            yield states, targets
+        return
+
+    # バッチをワーカーに均等に割り振る
+    shares = [num_batches // processes + (i < num_batches % processes) for i in range(processes)]
+    channel = multiprocessing.Queue(maxsize=queue_size)
+    workers = [multiprocessing.Process(target=_generate, daemon=True,
+                                       args=(channel, n, batch_size, min_depth, max_depth, s))
+               for n, s in zip(shares, seeds)]
+    for w in workers:
+        w.start()
+    try:
+        remaining = processes
+        while remaining:
+            t0 = time.perf_counter()
+            while True:
+                try:
+                    item = channel.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    if not any(w.is_alive() for w in workers) and channel.empty():
+                        raise RuntimeError("生成ワーカーが途中で終了しました")
+            stats.add("queue_wait", time.perf_counter() - t0)
+            if item is None:
+                remaining -= 1
+                continue
+            states, seconds = item
+            stats.add("generate", seconds)
+            targets = bellman_targets(states, value_fn, stats)
+            stats.states += states.shape[0]
+            stats.batches += 1
+            yield states, targets
+    finally:
+        for w in workers:
+            if w.is_alive():
+                w.terminate()
+            w.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="近似価値反復の学習データを作り、各段の速度を表示する")
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--depth", type=int, nargs=2, default=(1, 30), metavar=("MIN", "MAX"))
+    parser.add_argument("--processes", "-p", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", help="(状態, target) を保存する .npz のパス")
+    args = parser.parse_args()
+
+    stats = PipelineStats(args.processes if args.processes is not None else max(multiprocessing.cpu_count() - 1, 1))
+    all_states, all_targets = [], []
+    for states, targets in run_pipeline(None, args.batches, args.batch_size, *args.depth, args.processes,
+                                        args.queue_size, args.seed, stats):
+        if args.output:
+            all_states.append(states)
+            all_targets.append(targets)
+    if args.output:
+        np.savez(args.output, states=np.concatenate(all_states).reshape(-1, STATE_WIDTH),
+                 targets=np.concatenate(all_targets))
+    print(stats.report())
@@ -0,0 +1,34 @@
+# 近似価値反復のパイプラインのテスト
+import numpy as np
+import pytest
+
+from batch import BatchCubeState
+from value_iteration import PipelineStats, bellman_targets, run_pipeline
+
+
+def test_bellman_targets():
+    solved = BatchCubeState.solved(1)
+    states = np.concatenate([solved.array, solved.apply_move("R").array, solved.apply_move("R").apply_move("U").array])
+    calls = []
+
+    def constant(children):
+        calls.append(children.shape[0])
+        return np.full(children.shape[0], 5.0)
+
+    targets = bellman_targets(states, constant)
+    # 完成状態は 0、1 手の状態は完成状態の子があるので 1、それ以外は 1 + 5
+    assert targets.tolist() == [0.0, 1.0, 6.0]
+    assert calls == [3 * 18]
+
+
+@pytest.mark.parametrize("processes", [0, 2])
+def test_run_pipeline(processes):
+    stats = PipelineStats(max(processes, 1))
+    batches = list(run_pipeline(num_batches=5, batch_size=64, min_depth=1, max_depth=3, processes=processes,
+                                queue_size=2, stats=stats))
+    assert len(batches) == 5
+    for states, targets in batches:
+        assert states.shape == (64, 40) and targets.shape == (64,)
+        assert (targets >= 0).all()
+    assert stats.states == 5 * 64 and stats.batches == 5
+    assert set(stats.rates()) >= {"generate", "expand", "evaluate", "target", "total"}